@@ -0,0 +1,77 @@
+"""
+Micro-benchmark of the direct CDP backend against `page.evaluate`.
+
+Times the per-call latency of `ScrollHandler.get_scroll_top`, `ScrollHandler.scroll_by` and `JsQueryHandler.count`
+through both paths, on a local page.
+
+Usage::
+
+    python benchmarks/bench_cdp_fast_path.py --calls 500
+"""
+import time
+import asyncio
+import argparse
+import statistics
+
+import pyppeteer
+
+from zephyrion.pypp.data_extractor import DataExtractor
+from zephyrion.pypp.page_interactor import PageInteractor
+from zephyrion.pypp.js_util.cdp_backend import CdpBackend
+from zephyrion.pypp.js_util.helper_bundle import install_helper_bundle
+
+
+PAGE_HTML = "<html><body><ul>%s</ul></body></html>" % "".join(
+    f"<li class='item' style='height: 40px'>item {i}</li>" for i in range(2000))
+
+
+async def time_calls(call, n_calls: int):
+    for _ in range(min(20, n_calls)):
+        await call()
+    latencies = []
+    for _ in range(n_calls):
+        start = time.perf_counter()
+        await call()
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return {"mean_us": statistics.mean(latencies) * 1e6, "p50_us": latencies[len(latencies) // 2] * 1e6,
+            "p90_us": latencies[int(len(latencies) * .9)] * 1e6}
+
+
+async def main(n_calls: int, headless: bool):
+    browser = await pyppeteer.launch(headless=headless)
+    try:
+        page = await browser.newPage()
+        await page.setContent(PAGE_HTML)
+        await install_helper_bundle(page)
+        interactor = PageInteractor(page=page)
+        extractor = DataExtractor(page=page)
+        query_handler = extractor._query_handler
+        primitives = {
+            "get_scroll_top": lambda: interactor.scroll_handler.get_scroll_top(),
+            "scroll_by": lambda: interactor.scroll_handler.scroll_by(0, 1),
+            "count": lambda: query_handler.count("li.item"),
+        }
+        backend = await CdpBackend.open(page)
+        print(f"{'primitive':<16} {'path':<14} {'mean us':>9} {'p50 us':>9} {'p90 us':>9}")
+        for name, call in primitives.items():
+            results = {}
+            for path in ("page.evaluate", "cdp backend"):
+                for executor in (interactor, extractor):
+                    executor.set_cdp_backend(backend if path == "cdp backend" else None)
+                results[path] = await time_calls(call, n_calls)
+                stats = results[path]
+                print(f"{name:<16} {path:<14} {stats['mean_us']:>9.0f} {stats['p50_us']:>9.0f} {stats['p90_us']:>9.0f}")
+            speedup = results["page.evaluate"]["p50_us"] / results["cdp backend"]["p50_us"]
+            print(f"{name:<16} {'speedup':<14} {speedup:>9.2f}x")
+        await backend.close()
+    finally:
+        await browser.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=500, help="timed calls per primitive and path")
+    parser.add_argument("--headful", action="store_true", help="show the browser")
+    args = parser.parse_args()
+    asyncio.run(main(n_calls=args.calls, headless=not args.headful))
@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+import pyppeteer.page
+
+from zephyrion.pypp import browser_pool
+from zephyrion.pypp.browser_pool import BrowserPool
+from zephyrion._common.browser_manager import BrowserNotRunningError
+
+
+class _StubPage(pyppeteer.page.Page):
+    def __init__(self):
+        pass
+
+    @property
+    def url(self):
+        return "about:blank"
+
+
+class _StubContext:
+    def __init__(self, browser):
+        self._browser = browser
+
+    async def newPage(self):
+        if self._browser.n_failures > 0:
+            self._browser.n_failures -= 1
+            raise ConnectionError("stub newPage failure")
+        return _StubPage()
+
+    async def close(self):
+        pass
+
+
+class _StubBrowser:
+    def __init__(self):
+        self.n_failures = 0
+        """number of the next `newPage` calls to fail"""
+
+    async def createIncognitoBrowserContext(self):
+        return _StubContext(self)
+
+    async def close(self):
+        pass
+
+
+@pytest.fixture
+def stub_browser(monkeypatch):
+    browser = _StubBrowser()
+
+    async def launch(**kwargs):
+        return browser
+
+    monkeypatch.setattr(browser_pool, "launch", launch)
+    return browser
+
+
+def test_waiter_rebuilds_a_page_that_failed_to_be_replaced(stub_browser):
+    async def main():
+        async with BrowserPool(size=1) as pool:
+            leased = await pool.acquire()
+            waiter = asyncio.ensure_future(pool.acquire())
+            await asyncio.sleep(0)
+            assert not waiter.done()
+            stub_browser.n_failures = 1
+            await pool.release(leased)
+            pooled_page = await asyncio.wait_for(waiter, timeout=1)
+            return pool.n_missing, pool.n_leased, pooled_page is leased
+
+    assert asyncio.run(main()) == (0, 1, False)
+
+
+def test_failed_rebuild_keeps_the_page_missing(stub_browser):
+    async def main():
+        async with BrowserPool(size=1) as pool:
+            stub_browser.n_failures = 1
+            await pool.release(await pool.acquire())
+            assert pool.n_missing == 1
+            stub_browser.n_failures = 1
+            with pytest.raises(ConnectionError):
+                await pool.acquire()
+            assert pool.n_missing == 1
+            await pool.acquire()
+            return pool.n_missing
+
+    assert asyncio.run(main()) == 0
+
+
+def test_close_fails_waiters_and_release_after_close_does_nothing(stub_browser):
+    async def main():
+        pool = BrowserPool(size=1)
+        await pool.start()
+        leased = await pool.acquire()
+        waiter = asyncio.ensure_future(pool.acquire())
+        await asyncio.sleep(0)
+        await pool.close()
+        with pytest.raises(BrowserNotRunningError):
+            await asyncio.wait_for(waiter, timeout=1)
+        await pool.release(leased)
+        return pool.n_idle, pool.n_leased
+
+    assert asyncio.run(main()) == (0, 0)
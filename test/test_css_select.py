@@ -0,0 +1,49 @@
+import pytest
+
+from zephyrion._common.css_select import compile_selector
+
+
+class _Tree:
+    """Nodes are (tag, attrs, parent) tuples."""
+
+    @staticmethod
+    def tag(node):
+        return node[0]
+
+    @staticmethod
+    def attr(node, name):
+        return node[1].get(name)
+
+    @staticmethod
+    def parent_of(node):
+        return node[2]
+
+
+HTML = ("html", {}, None)
+BODY = ("body", {"class": "page dark"}, HTML)
+NAV = ("nav", {"id": "main-nav"}, BODY)
+LINK = ("a", {"href": "https://example.com/a", "lang": "en-US", "data-x": "1"}, NAV)
+TEXT = (None, {}, NAV)
+
+
+@pytest.mark.parametrize("selector, expected", [
+    ("a", True), ("A", True), ("*", True), ("span", False),
+    ("#main-nav a", True), ("nav > a", True), ("body > a", False), ("body a", True), ("html body nav a", True),
+    ("body.page a", True), (".dark a", True), (".light a", False),
+    ("a[href]", True), ("a[title]", False), ("a[data-x=1]", True), ('a[data-x="2"]', False),
+    ("a[href^='https://']", True), ("a[href$=/a]", True), ("a[href*=example]", True), ("a[href^='']", False),
+    ("a[lang|=en]", True), ("a[lang|=US]", False), ("body[class~=dark] a", True),
+    ("span, nav > a", True), ("span, p", False),
+])
+def test_matches(selector, expected):
+    assert compile_selector(selector).matches(_Tree(), LINK) is expected
+
+
+def test_non_elements_never_match():
+    assert not compile_selector("*").matches(_Tree(), TEXT)
+
+
+@pytest.mark.parametrize("selector", ["a:hover", "a + b", "a ~ b", "> a", "a >", "", "div span.x#", "a[href=]"])
+def test_unsupported_selectors_raise(selector):
+    with pytest.raises(ValueError):
+        compile_selector(selector)
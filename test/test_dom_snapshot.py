@@ -0,0 +1,89 @@
+from zephyrion.pypp.dom_snapshot import DomSnapshot
+
+
+def _capture(document, boxes=None):
+    """
+    Build a `DOMSnapshot.captureSnapshot` response from nested (tag, attrs, children) tuples, text nodes as str.
+
+    :param boxes: (dict) Layout box by element id attribute
+    """
+    strings, nodes, layout = [], {"parentIndex": [], "nodeType": [], "nodeName": [], "nodeValue": [],
+                                  "attributes": []}, {"nodeIndex": [], "bounds": []}
+
+    def string(value):
+        if value not in strings:
+            strings.append(value)
+        return strings.index(value)
+
+    def add(node, parent):
+        index = len(nodes["parentIndex"])
+        nodes["parentIndex"].append(parent)
+        if isinstance(node, str):
+            nodes["nodeType"].append(3)
+            nodes["nodeName"].append(string("#text"))
+            nodes["nodeValue"].append(string(node))
+            nodes["attributes"].append([])
+            return
+        tag, attrs, children = node
+        nodes["nodeType"].append(9 if tag == "#document" else 1)
+        nodes["nodeName"].append(string(tag.upper()))
+        nodes["nodeValue"].append(-1)
+        nodes["attributes"].append([string(v) for pair in attrs.items() for v in pair])
+        if boxes and attrs.get("id") in boxes:
+            layout["nodeIndex"].append(index)
+            layout["bounds"].append(list(boxes[attrs["id"]]))
+        for child in children:
+            add(child, index)
+
+    add(document, -1)
+    return {"strings": strings, "documents": [{"nodes": nodes, "layout": layout}]}
+
+
+def _product(pid, title, price):
+    return ("li", {"class": "product", "data-id": pid}, [("h2", {}, [title]), ("span", {"class": "price"}, [price])])
+
+
+DOCUMENT = ("#document", {}, [("html", {}, [("body", {}, [
+    ("ul", {"id": "list"}, [_product("1", "Tea", "$2"), _product("2", "Coffee & cake", "$3")]),
+    ("p", {"id": "hidden"}, ["<none>"]),
+    ("script", {}, ["if (a < b) {}"]),
+])])])
+
+
+def test_tables():
+    snapshot = DomSnapshot(_capture(DOCUMENT))
+    ul = snapshot.select_one("ul")
+    assert snapshot.tag(ul) == "ul" and snapshot.attrs(ul) == {"id": "list"}
+    assert [snapshot.tag(c) for c in snapshot.children(ul)] == ["li", "li"]
+    assert snapshot.parent_of(snapshot.document_element) == 0
+    assert snapshot.parent_of(0) is None
+    assert snapshot.text(ul) == "Tea$2Coffee & cake$3"
+
+
+def test_queries_and_html():
+    snapshot = DomSnapshot(_capture(DOCUMENT))
+    assert snapshot.get_texts("li > h2") == ["Tea", "Coffee & cake"]
+    assert snapshot.get_attrs("li", ["data-id"]) == [{"data-id": "1"}, {"data-id": "2"}]
+    assert snapshot.count("span.price") == 2 and not snapshot.exists("table")
+    assert snapshot.html(snapshot.select("li")[1]) == '<h2>Coffee &amp; cake</h2><span class="price">$3</span>'
+    assert snapshot.html(snapshot.select_one("p")) == "&lt;none&gt;"
+    # no escaping inside raw text elements
+    assert snapshot.html(snapshot.select_one("script")) == "if (a < b) {}"
+
+
+def test_extract_matches_item_relative_selectors_like_query_selector():
+    snapshot = DomSnapshot(_capture(DOCUMENT))
+    records = snapshot.extract({"selector": "li.product", "fields": {
+        "id": "@data-id", "title": "ul li h2", "price": {"selector": "span", "transform": "float"}}})
+    assert records == [{"id": "1", "title": "Tea", "price": 2.0}, {"id": "2", "title": "Coffee & cake", "price": 3.0}]
+    assert snapshot.extract({"fields": {"n": {"selector": "h2", "many": True}}}) == {"n": ["Tea", "Coffee & cake"]}
+
+
+def test_layout():
+    capture = _capture(DOCUMENT, boxes={"list": (0, 10, 100, 50)})
+    snapshot = DomSnapshot(capture)
+    assert snapshot.bounds_of(snapshot.select_one("#list")) == (0, 10, 100, 50)
+    assert snapshot.bounds_of(snapshot.select_one("#hidden")) is None
+    visible = snapshot.filter(lambda s, i: (s.bounds_of(i) or (0, 0, 0, 0))[2] > 0, selector="[id]")
+    assert visible == [snapshot.select_one("#list")]
+    assert DomSnapshot(capture, include_layout=False).bounds_of(snapshot.select_one("#list")) is None
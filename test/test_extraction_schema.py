@@ -0,0 +1,110 @@
+import pytest
+
+from zephyrion._common.css_select import compile_selector
+from zephyrion._common.extraction_schema import (apply_transforms, evaluate_schema, normalize_field, normalize_schema,
+                                                 schema_key)
+
+
+class _Node:
+    def __init__(self, tag, attrs=None, children=(), text=""):
+        self.tag, self.attrs, self.children, self.own_text, self.parent = tag, attrs or {}, list(children), text, None
+        for child in self.children:
+            child.parent = self
+
+
+class _Tree:
+    """Minimal tree for `evaluate_schema`, matching selectors with `css_select`."""
+
+    def descendants(self, node):
+        for child in node.children:
+            yield child
+            yield from self.descendants(child)
+
+    def query_all(self, node, selector):
+        compiled = compile_selector(selector)
+        return [n for n in self.descendants(node) if compiled.matches(self, n)]
+
+    def query_one(self, node, selector):
+        return next(iter(self.query_all(node, selector)), None)
+
+    def text(self, node):
+        return node.own_text + "".join(self.text(child) for child in node.children)
+
+    def html(self, node):
+        return "".join(f"<{c.tag}>{self.html(c) or c.own_text}</{c.tag}>" for c in node.children)
+
+    @staticmethod
+    def tag(node):
+        return node.tag
+
+    @staticmethod
+    def attr(node, name):
+        return node.attrs.get(name)
+
+    @staticmethod
+    def parent_of(node):
+        return node.parent
+
+
+def _document():
+    def product(pid, title, price, tags):
+        return _Node("li", {"class": "product", "data-id": pid}, [
+            _Node("h2", text=title), _Node("span", {"class": "price"}, text=price),
+            *[_Node("span", {"class": "tag"}, text=tag) for tag in tags]])
+    return _Node("#document", children=[_Node("html", children=[_Node("body", children=[
+        _Node("ul", children=[product("1", "Tea", " $1,200.50 ", ["hot", "new"]), product("2", "Coffee", "n/a", [])]),
+        _Node("h2", text="Footer")])])])
+
+
+def test_shorthands_expand_to_full_specs():
+    assert normalize_field("url", "a@href") == {"selector": "a", "type": "attr", "attr": "href", "transform": [],
+                                                "many": False, "fields": None, "default": None}
+    assert normalize_field("id", "@data-id")["selector"] is None
+    assert normalize_field("price", {"selector": ".price", "transform": "float"})["transform"] == ["float"]
+    assert normalize_schema({"selector": " li ", "fields": {"t": "h2"}})["selector"] == "li"
+
+
+@pytest.mark.parametrize("spec", [{"selector": "a", "type": "attr"}, {"selector": "a", "transform": "round"},
+                                  {"selector": "a", "color": "red"}, {"fields": {"a": "b"}, "attr": "href"}, 3])
+def test_invalid_fields_are_rejected(spec):
+    with pytest.raises(ValueError):
+        normalize_field("field", spec)
+
+
+def test_invalid_schemas_are_rejected():
+    for schema in ({"selector": "li"}, {"fields": {}}, {"fields": {"a": "b"}, "root": "li"}):
+        with pytest.raises(ValueError):
+            normalize_schema(schema)
+
+
+def test_schema_key_is_stable():
+    a = normalize_schema({"selector": "li", "fields": {"u": "a@href", "t": {"selector": "h2"}}})
+    b = normalize_schema({"fields": {"u": {"attr": "href", "selector": "a"}, "t": "h2"}, "selector": "li"})
+    assert schema_key(a) == schema_key(b)
+
+
+def test_transforms():
+    assert apply_transforms(" Tea ", ["strip", "upper"]) == "TEA"
+    assert apply_transforms("$1,200.50", ["float"]) == 1200.5
+    assert apply_transforms("1 234 items", ["int"]) == 1234
+    assert apply_transforms("n/a", ["int"]) is None
+    assert apply_transforms(None, ["strip"]) is None
+
+
+def test_evaluate_schema():
+    schema = normalize_schema({"selector": "li.product", "fields": {
+        "id": "@data-id",
+        "title": "h2",
+        "price": {"selector": ".price", "transform": ["strip", "float"]},
+        "tags": {"selector": ".tag", "many": True},
+        "first_tag": {"selector": ".tag", "default": "none"},
+        "info": {"selector": None, "fields": {"title": "h2"}},
+    }})
+    document = _document()
+    assert evaluate_schema(schema, _Tree(), document) == [
+        {"id": "1", "title": "Tea", "price": 1200.5, "tags": ["hot", "new"], "first_tag": "hot",
+         "info": {"title": "Tea"}},
+        {"id": "2", "title": "Coffee", "price": None, "tags": [], "first_tag": "none", "info": {"title": "Coffee"}},
+    ]
+    single = normalize_schema({"fields": {"n": {"selector": "li", "many": True, "attr": "data-id"}}})
+    assert evaluate_schema(single, _Tree(), document) == {"n": ["1", "2"]}
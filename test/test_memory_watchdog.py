@@ -0,0 +1,104 @@
+import asyncio
+
+from zephyrion.pypp.memory_watchdog import MemoryWatchdog, MemorySample
+
+
+class _StubPage:
+    def __init__(self):
+        self.listeners = {}
+        self.mainFrame = object()
+
+    def on(self, event, listener):
+        self.listeners[event] = listener
+
+    def remove_listener(self, event, listener):
+        self.listeners.pop(event, None)
+
+    async def metrics(self):
+        return {"JSHeapUsedSize": 64 * 1024 * 1024, "Nodes": 100}
+
+
+class _StubManager:
+    """Browser manager replacing its page on every recycle."""
+    browser_pid = None
+
+    def __init__(self):
+        self.page = _StubPage()
+        self.n_recycled = 0
+
+    async def get_page(self):
+        return self.page
+
+    async def recycle_page(self, keep_session):
+        await asyncio.sleep(0)
+        self.page = _StubPage()
+        self.n_recycled += 1
+        return self.page
+
+    async def restart_browser(self, keep_session):
+        self.page = _StubPage()
+
+
+def test_due_recycle_is_not_starved_by_back_to_back_holds():
+    async def main():
+        manager = _StubManager()
+        watchdog = MemoryWatchdog(manager)
+        recycled_at = []
+
+        async with watchdog.hold():
+            recycle = asyncio.ensure_future(watchdog.recycle("page"))
+            await asyncio.sleep(0)
+        for i in range(200):
+            async with watchdog.hold():
+                if recycle.done() and not recycled_at:
+                    recycled_at.append(i)
+                await asyncio.sleep(0)
+        await recycle
+        return manager, recycled_at
+
+    manager, recycled_at = asyncio.run(main())
+    assert manager.n_recycled == 1
+    # the recycle ran before the next block, not after the whole loop
+    assert recycled_at == [0]
+
+
+def test_recycle_waits_for_the_running_hold():
+    async def main():
+        manager = _StubManager()
+        watchdog = MemoryWatchdog(manager)
+        async with watchdog.hold():
+            recycle = asyncio.ensure_future(watchdog.recycle("page"))
+            await asyncio.sleep(0.01)
+            assert manager.n_recycled == 0
+        await recycle
+        return manager
+
+    assert asyncio.run(main()).n_recycled == 1
+
+
+def test_on_recycle_gets_the_new_page_and_navigations_reset():
+    async def main():
+        manager = _StubManager()
+        rebound = []
+        watchdog = MemoryWatchdog(manager, max_navigations=2, on_recycle=rebound.append)
+        await watchdog.sample()
+        page = manager.page
+        for _ in range(2):
+            page.listeners["framenavigated"](page.mainFrame)
+        action = await watchdog.check()
+        sample = await watchdog.sample()
+        return manager, rebound, action, sample
+
+    manager, rebound, action, sample = asyncio.run(main())
+    assert action == "page"
+    assert rebound == [manager.page]
+    assert sample.n_navigations == 0
+
+
+def test_rss_still_high_after_a_page_recycle_restarts_the_browser():
+    watchdog = MemoryWatchdog(_StubManager(), max_rss_mb=100)
+    high = MemorySample(js_heap_used=0, js_heap_total=0, nodes=0, documents=1, listeners=0, rss=200 * 1024 * 1024,
+                        n_navigations=0)
+    assert watchdog.decide(high)[0] == "page"
+    watchdog._last_action = "page"
+    assert watchdog.decide(high)[0] == "browser"
@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("lxml")
+pytest.importorskip("cssselect")
+
+from zephyrion._common.offline_extractor import OfflineExtractor
+
+
+HTML = """
+<html><body>
+  <ul id="products">
+    <li class="product new" data-id="1"><h2>Tea</h2><span class="price">$1,200.50</span><a href="/tea">more</a></li>
+    <li class="product" data-id="2"><h2>Coffee</h2><span class="price">$3</span></li>
+  </ul>
+  <div class="ad"><h2>Ad</h2></div>
+</body></html>
+"""
+
+
+def _run(coroutine_function):
+    async def main():
+        async with OfflineExtractor(max_workers=2) as offline:
+            return await coroutine_function(offline)
+    return asyncio.run(main())
+
+
+def test_queries():
+    async def queries(offline):
+        return await offline.run(HTML, {
+            "titles": ("get_texts", ("li h2",)),
+            "ids": ("get_attrs", ("li", "data-id")),
+            "attrs": ("get_attrs", ("a", ["href", "title"])),
+            "n": ("count", ("h2",)),
+            "missing": ("exists", ("table",)),
+            "new": ("has_cls_many", ("li", "new")),
+        })
+
+    assert _run(queries) == {"titles": ["Tea", "Coffee"], "ids": ["1", "2"], "attrs": [{"href": "/tea", "title": None}],
+                             "n": 3, "missing": False, "new": [True, False]}
+
+
+def test_extract():
+    schema = {"selector": "li.product", "fields": {
+        "id": "@data-id", "title": "h2", "price": {"selector": ".price", "transform": "float"}, "url": "a@href"}}
+    records = _run(lambda offline: offline.extract(HTML, schema))
+    assert records == [{"id": "1", "title": "Tea", "price": 1200.5, "url": "/tea"},
+                       {"id": "2", "title": "Coffee", "price": 3.0, "url": None}]
+
+
+def test_item_relative_selectors_follow_query_selector():
+    # the whole selector is matched against the document, ancestors of the item included, like `querySelector`
+    schema = {"selector": "li", "fields": {
+        "in_list": "ul li h2", "child": "li > h2", "from_body": {"selector": "body h2", "many": True},
+        "outside": "div h2"}}
+    records = _run(lambda offline: offline.extract(HTML, schema))
+    assert [r["in_list"] for r in records] == ["Tea", "Coffee"]
+    assert [r["child"] for r in records] == ["Tea", "Coffee"]
+    assert [r["from_body"] for r in records] == [["Tea"], ["Coffee"]]
+    assert [r["outside"] for r in records] == [None, None]
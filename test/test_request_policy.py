@@ -0,0 +1,75 @@
+import asyncio
+
+from zephyrion._common.request_policy import RequestPolicy, RequestRule, UrlPattern
+from zephyrion.pypp.browser_manager import SinglePageBrowser
+
+
+class _StubPage:
+    def __init__(self):
+        self.url = "https://www.example.com/"
+        self.intercepting = False
+        self.listeners = {}
+
+    async def setRequestInterception(self, value):
+        self.intercepting = value
+
+    def on(self, event, listener):
+        self.listeners[event] = listener
+
+    def remove_listener(self, event, listener):
+        self.listeners.pop(event, None)
+
+
+def test_first_matching_rule_wins():
+    policy = RequestPolicy().allow(url_patterns=["*/logo.png"]).block(resource_types=["image"])
+    assert policy.is_allowed("https://example.com/logo.png", "image")
+    assert not policy.is_allowed("https://example.com/photo.png", "Image")
+    assert policy.is_allowed("https://example.com/app.js", "script")
+    assert policy.is_allowed("data:image/png;base64,AAAA", "image")
+
+
+def test_third_party_compares_registrable_domains():
+    rule = RequestRule("block", third_party=True)
+    page_url = "https://www.example.co.uk/"
+    assert not rule.matches("https://cdn.example.co.uk/a.js", "script", page_url)
+    assert rule.matches("https://other.co.uk/a.js", "script", page_url)
+    assert not rule.matches("https://static.example-cdn.net/a.js", "script", page_url,
+                            first_party_domains=("example-cdn.net",))
+    # without a page url, third-party cannot be decided
+    assert not rule.matches("https://other.co.uk/a.js", "script")
+
+
+def test_url_pattern_wildcards():
+    assert UrlPattern("https://*.example.com/*").to_wildcard() == "*https://*.example.com/*"
+    assert UrlPattern("*.png").to_wildcard() == "*.png"
+    assert UrlPattern("re:\\.png$").to_wildcard() is None
+    assert UrlPattern("*.[ch]").to_wildcard() is None
+
+
+def test_bytes_saved_only_counts_observed_sizes():
+    policy = RequestPolicy().block(resource_types=["image"])
+    policy.stats.record_response("https://example.com/a.png", "image", 1000)
+    policy.is_allowed("https://example.com/a.png", "image")
+    policy.is_allowed("https://example.com/b.png", "image")
+    policy.is_allowed("https://example.com/", "document")
+    assert policy.stats.to_dict() == {"n_allowed": 1, "n_blocked": 2, "blocked_by_type": {"image": 2},
+                                      "bytes_saved": 1000, "n_unknown_size": 1}
+    policy.stats.reset()
+    assert policy.stats.n_blocked == policy.stats.n_unknown_size == policy.stats.bytes_saved == 0
+    # observed sizes outlive the reset
+    policy.is_allowed("https://example.com/a.png", "image")
+    assert policy.stats.bytes_saved == 1000
+
+
+def test_removing_the_policy_stops_interception():
+    async def main():
+        manager, page = SinglePageBrowser(), _StubPage()
+        await manager.set_request_policy(RequestPolicy.lightweight(), page=page)
+        intercepting_with_policy = page.intercepting, set(page.listeners)
+        await manager.set_request_policy(None, page=page)
+        return intercepting_with_policy, (page.intercepting, set(page.listeners)), manager.request_policy_stats
+
+    with_policy, without_policy, stats = asyncio.run(main())
+    assert with_policy == (True, {"request", "response"})
+    assert without_policy == (False, set())
+    assert stats is None
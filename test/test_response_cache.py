@@ -0,0 +1,82 @@
+import time
+
+import pytest
+
+from zephyrion._common.response_cache import DiskResponseCache
+
+
+def _headers(**headers):
+    return [{"name": name.replace("_", "-"), "value": value} for name, value in headers.items()]
+
+
+@pytest.fixture
+def cache(tmp_path):
+    with DiskResponseCache(tmp_path, max_bytes=100, rules=[("*.js", 60), ("re:/api/", 0)]) as cache:
+        yield cache
+
+
+def test_round_trip_drops_the_framing_headers(cache):
+    headers = _headers(Content_Type="text/javascript", Content_Encoding="gzip", Content_Length="3")
+    assert cache.put("GET", "https://example.com/a.js", 200, headers, b"abc")
+    response = cache.get("get", "https://example.com/a.js")
+    assert (response.status, response.body) == (200, b"abc")
+    assert response.headers == _headers(Content_Type="text/javascript")
+    assert cache.stats.n_hits == 1 and cache.stats.bytes_served == 3
+
+
+def test_only_fresh_shareable_responses_are_served(cache):
+    url = "https://example.com/a.js"
+    assert not cache.put("POST", url, 200, [], b"x")
+    assert not cache.put("GET", url, 404, [], b"x")
+    assert not cache.put("GET", "https://example.com/a.css", 200, [], b"x")
+    for headers in (_headers(Set_Cookie="a=1"), _headers(Cache_Control="no-store"),
+                    _headers(Cache_Control="max-age=60, Private"), _headers(Vary="Accept-Encoding, Cookie"),
+                    _headers(Vary="authorization")):
+        assert not cache.put("GET", url, 200, headers, b"x"), headers
+    assert cache.put("GET", url, 200, _headers(Cache_Control="public, max-age=60", Vary="Accept-Encoding"), b"x")
+    # a ttl of 0 is expired right away
+    assert cache.put("GET", "https://example.com/api/items", 200, [], b"y")
+    time.sleep(0.01)
+    assert cache.get("GET", "https://example.com/api/items") is None
+    assert cache.get("GET", url).body == b"x"
+
+
+def test_shared_bodies_are_counted_once_and_evicted_lru(cache):
+    body = b"x" * 40
+    cache.put("GET", "https://example.com/1.js", 200, [], body)
+    cache.put("GET", "https://example.com/2.js", 200, [], body)
+    assert cache.total_bytes == 40
+    cache.put("GET", "https://example.com/3.js", 200, [], b"y" * 50)
+    assert cache.total_bytes == 90
+    cache.get("GET", "https://example.com/1.js")
+    # 2.js is the least recently used, but its body is still used by 1.js, so 3.js goes too
+    cache.put("GET", "https://example.com/4.js", 200, [], b"z" * 30)
+    assert cache.get("GET", "https://example.com/2.js") is None
+    assert cache.get("GET", "https://example.com/3.js") is None
+    assert cache.get("GET", "https://example.com/1.js").body == body
+    assert cache.total_bytes == 70
+    assert cache.stats.n_evicted == 2
+
+
+def test_replacing_an_entry_releases_its_old_body(cache):
+    cache.put("GET", "https://example.com/a.js", 200, [], b"old")
+    cache.put("GET", "https://example.com/a.js", 200, [], b"newer")
+    assert cache.total_bytes == 5
+    assert len([p for p in cache.root.glob("blobs/*/*")]) == 1
+    cache.clear()
+    assert cache.total_bytes == 0
+    assert cache.get("GET", "https://example.com/a.js") is None
+
+
+def test_totals_survive_reopening(tmp_path):
+    with DiskResponseCache(tmp_path, rules=[("*", 60)]) as cache:
+        cache.put("GET", "https://example.com/a", 200, [], b"abc")
+    with DiskResponseCache(tmp_path, rules=[("*", 60)]) as cache:
+        assert cache.total_bytes == 3
+        assert cache.get("GET", "https://example.com/a").body == b"abc"
+
+
+def test_url_wildcards(tmp_path):
+    assert DiskResponseCache(tmp_path / "none").url_wildcards() is None
+    assert DiskResponseCache(tmp_path / "globs", rules=[("*.js", 1), ("*.js", 2)]).url_wildcards() == ["*.js"]
+    assert DiskResponseCache(tmp_path / "regex", rules=[("*.js", 1), ("re:x", 1)]).url_wildcards() == ["*"]
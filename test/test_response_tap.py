@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+
+from zephyrion._common.response_tap import ResponseTap
+
+
+def _body(text):
+    async def read_body():
+        return text
+    return read_body
+
+
+def _offer(tap, url, text='{"ok": true}', content_type="application/json", resource_type="xhr", status=200):
+    return tap.offer(url, status, content_type, resource_type, _body(text))
+
+
+def test_only_matching_responses_are_captured():
+    async def main():
+        tap = ResponseTap(url_patterns=["*/api/*"])
+        assert _offer(tap, "https://example.com/api/feed")
+        assert not _offer(tap, "https://example.com/feed")
+        assert not _offer(tap, "https://example.com/api/feed", content_type="text/html")
+        assert not _offer(tap, "https://example.com/api/feed", resource_type="script")
+        assert not _offer(tap, "https://example.com/api/feed", status=204)
+        assert _offer(tap, "https://example.com/api/broken", text="not json")
+        await asyncio.sleep(0)
+        return tap.drain(), tap
+
+    responses, tap = asyncio.run(main())
+    assert [(r.url, r.body) for r in responses] == [("https://example.com/api/feed", {"ok": True})]
+    assert (tap.n_matched, tap.n_errors) == (2, 1)
+
+
+def test_drain_leaves_the_end_marker_for_other_consumers():
+    async def main():
+        tap = ResponseTap()
+        consumer = asyncio.ensure_future(tap.__anext__())
+        await asyncio.sleep(0)
+        tap.close()
+        assert tap.drain() == []
+        # the waiting consumer ends instead of waiting forever
+        with pytest.raises(StopAsyncIteration):
+            await asyncio.wait_for(consumer, timeout=1)
+
+    asyncio.run(main())
+
+
+def test_until_yields_the_responses_then_raises_the_awaitable_error():
+    async def main():
+        tap = ResponseTap()
+        urls = []
+
+        async def load():
+            for i in range(3):
+                _offer(tap, f"https://example.com/{i}")
+                await asyncio.sleep(0.01)
+            raise RuntimeError("load failed")
+
+        with pytest.raises(RuntimeError, match="load failed"):
+            async for response in tap.until(load()):
+                urls.append(response.url)
+        return urls
+
+    assert asyncio.run(main()) == [f"https://example.com/{i}" for i in range(3)]
+
+
+def test_closing_the_tap_cancels_the_awaitable_and_surfaces_its_error():
+    async def main():
+        tap = ResponseTap()
+
+        async def load():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                raise RuntimeError("cleanup failed")
+
+        async def close_soon():
+            await asyncio.sleep(0.01)
+            tap.close()
+
+        closer = asyncio.ensure_future(close_soon())
+        with pytest.raises(RuntimeError, match="cleanup failed"):
+            async for _ in tap.until(load()):
+                pass
+        await closer
+
+    asyncio.run(main())
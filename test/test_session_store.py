@@ -0,0 +1,60 @@
+import pytest
+
+from zephyrion._common.session_store import SessionSnapshot, FileSessionStore, SqliteSessionStore
+from zephyrion.pypp.session import _cookie_param
+
+
+NOW = 1_000_000.
+
+
+def _snapshot(*expiries, saved_at=NOW):
+    cookies = [{"name": f"c{i}", "value": "v", "domain": "example.com", "path": "/", "expires": expires, "size": 2}
+               for i, expires in enumerate(expiries)]
+    return SessionSnapshot(origin="https://example.com", cookies=cookies, local_storage={"token": "t"},
+                           saved_at=saved_at)
+
+
+def test_the_session_lasts_until_its_last_cookie():
+    assert _snapshot(NOW - 10, NOW + 10).expires_at == NOW + 10
+    assert not _snapshot(NOW - 10, NOW + 10).is_expired(now=NOW)
+    assert _snapshot(NOW - 10, NOW - 5).is_expired(now=NOW)
+    # session cookies never expire, and a snapshot without cookies lives on its storage
+    assert _snapshot(NOW - 10, -1).expires_at is None
+    assert _snapshot().expires_at is None
+    assert _snapshot(-1, saved_at=NOW - 100).is_expired(max_age=50, now=NOW)
+
+
+def test_live_cookies_skip_the_expired_ones_and_keep_the_settable_keys():
+    cookies = _snapshot(NOW - 10, NOW + 10, -1).live_cookies(now=NOW)
+    assert [c["name"] for c in cookies] == ["c1", "c2"]
+    assert cookies[0] == {"name": "c1", "value": "v", "domain": "example.com", "path": "/", "expires": NOW + 10}
+    assert "expires" not in cookies[1]
+
+
+def test_host_only_cookies_are_restored_by_url():
+    host_only = _cookie_param({"name": "a", "value": "1", "domain": "www.example.com", "path": "/app", "secure": True})
+    assert host_only == {"name": "a", "value": "1", "path": "/app", "secure": True,
+                         "url": "https://www.example.com/app"}
+    domain = {"name": "a", "value": "1", "domain": ".example.com", "path": "/"}
+    assert _cookie_param(domain) == domain
+
+
+@pytest.mark.parametrize("store_class, path", [(FileSessionStore, "sessions"), (SqliteSessionStore, "sessions.db")])
+def test_stores_round_trip_and_drop_expired_snapshots(tmp_path, store_class, path):
+    store = store_class(tmp_path / path)
+    store.save("alice", _snapshot(-1))
+    loaded = store.load("alice")
+    assert (loaded.origin, loaded.local_storage, loaded.saved_at) == ("https://example.com", {"token": "t"}, NOW)
+    assert store.load("alice", max_age=1) is None
+    store.save("bob", _snapshot(NOW - 1))
+    assert store.load("bob") is None
+    store.delete("alice")
+    assert store.load("alice") is None
+    assert store.load("nobody") is None
+
+
+def test_file_store_rejects_keys_leaving_its_directory(tmp_path):
+    store = FileSessionStore(tmp_path)
+    for key in ("", "../alice", ".hidden", "a/b"):
+        with pytest.raises(ValueError):
+            store.save(key, _snapshot())
@@ -0,0 +1,60 @@
+import os
+import threading
+import http.server
+
+import pytest
+from pyppeteer.chromium_downloader import check_chromium
+
+from zephyrion.pypp import ShardedAgentRunner
+
+
+CHROMIUM_PATH = os.environ.get("ZEPHYRION_CHROMIUM")
+"""executable of the browser to test with, default to the chromium downloaded by pyppeteer"""
+
+pytestmark = pytest.mark.skipif(CHROMIUM_PATH is None and not check_chromium(),
+                                reason="no chromium, run `pyppeteer-install` or set ZEPHYRION_CHROMIUM")
+
+
+class _FixtureHandler(http.server.BaseHTTPRequestHandler):
+    """Serve a tiny page naming its own path."""
+
+    def do_GET(self):
+        body = f"<html><head><title>{self.path}</title></head><body><p id='path'>{self.path}</p></body></html>".encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def fixture_server():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _FixtureHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_two_shards_distribute_urls_and_collect_results(fixture_server):
+    urls = [f"{fixture_server}/page/{i}" for i in range(6)]
+    browser_options = {"args": ["--no-sandbox"]}
+    if CHROMIUM_PATH is not None:
+        browser_options["executablePath"] = CHROMIUM_PATH
+    runner = ShardedAgentRunner(n_workers=2, browser_options=browser_options)
+
+    results = list(runner.run(urls))
+
+    assert sorted(r.index for r in results) == list(range(len(urls)))
+    assert all(r.ok for r in results), [r.error for r in results if not r.ok]
+    for r in results:
+        assert r.job == urls[r.index]
+        assert r.result["url"] == urls[r.index]
+        assert f"<p id=\"path\">/page/{r.index}</p>" in r.result["content"]
+        # shards are split round-robin
+        assert r.worker_id == r.index % 2
+    assert {r.worker_id for r in results} == {0, 1}
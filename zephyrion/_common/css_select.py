@@ -0,0 +1,183 @@
+"""
+Browser-agnostic matcher for a subset of CSS selectors, over any tree.
+
+Supported:
+
+- type and universal selectors: `div`, `*`
+- `#id`, `.class`
+- attribute selectors: `[attr]`, `[attr=value]`, `[attr~=value]`, `[attr|=value]`, `[attr^=value]`, `[attr$=value]`,
+  `[attr*=value]`, values quoted or not
+- descendant (` `) and child (`>`) combinators
+- selector lists: `a, b`
+
+Pseudo-classes and sibling combinators are not supported, and raise a `ValueError`.
+
+Trees are accessed through three methods, so any node representation works:
+
+- `tag(node) -> str`: lower-case tag name, None for non-element nodes
+- `attr(node, name) -> str`: attribute value, None if missing
+- `parent_of(node) -> node`: parent node, None at the root
+"""
+import re
+from functools import lru_cache
+from typing import Any, List, Tuple, Union
+
+
+_TOKEN = re.compile(r'''
+    \s*(?P<combinator>>)\s*
+  | (?P<space>\s+)
+  | (?P<tag>[A-Za-z][-\w]*|\*)
+  | \#(?P<id>-?[_A-Za-z][-\w]*)
+  | \.(?P<cls>-?[_A-Za-z][-\w]*)
+  | \[\s*(?P<attr>[-\w:.]+)\s*(?:(?P<op>[~|^$*]?=)\s*(?:"(?P<dq>[^"]*)"|'(?P<sq>[^']*)'|(?P<bare>[-\w.:/]+))\s*)?\]
+''', re.VERBOSE)
+
+
+class _Compound:
+    """One compound selector, e.g. `a.link[href^="http"]`."""
+    __slots__ = ("tag", "conditions")
+
+    def __init__(self):
+        self.tag: Union[str, None] = None
+        self.conditions: List[Tuple[str, Union[str, None], Union[str, None]]] = []
+        """(attribute, operator, value), operator None for presence"""
+
+    def matches(self, tree: Any, node: Any) -> bool:
+        tag = tree.tag(node)
+        if tag is None or (self.tag is not None and tag != self.tag):
+            return False
+        for name, op, expected in self.conditions:
+            value = tree.attr(node, name)
+            if value is None:
+                return False
+            if op is None:
+                continue
+            if op == "=":
+                ok = value == expected
+            elif op == "~=":
+                ok = expected in value.split()
+            elif op == "|=":
+                ok = value == expected or value.startswith(expected + "-")
+            elif op == "^=":
+                ok = bool(expected) and value.startswith(expected)
+            elif op == "$=":
+                ok = bool(expected) and value.endswith(expected)
+            else:
+                ok = bool(expected) and expected in value
+            if not ok:
+                return False
+        return True
+
+
+class CompiledSelector:
+    """
+    A parsed selector list, see `compile_selector`.
+    """
+
+    def __init__(self, selector: str, chains: List[List[Tuple[_Compound, Union[str, None]]]]):
+        """
+        :param selector: (str) The selector source
+        :param chains: (list) One chain per selector of the list, compounds right to left, each with the combinator
+            linking it to the next compound (" " or ">"), None for the leftmost one
+        """
+        self.selector = selector
+        self._chains = chains
+
+    def matches(self, tree: Any, node: Any) -> bool:
+        """
+        Check if a node matches the selector.
+
+        :param tree: (Any) The tree, see the module documentation
+        :param node: (Any) The node
+        :return: (bool) True if the node matches any selector of the list
+        """
+        return any(self._match_chain(tree, node, chain, 0) for chain in self._chains)
+
+    def _match_chain(self, tree: Any, node: Any, chain, position: int) -> bool:
+        compound, combinator = chain[position]
+        if not compound.matches(tree, node):
+            return False
+        if combinator is None:
+            return True
+        ancestor = tree.parent_of(node)
+        if combinator == ">":
+            return ancestor is not None and self._match_chain(tree, ancestor, chain, position + 1)
+        while ancestor is not None:
+            if self._match_chain(tree, ancestor, chain, position + 1):
+                return True
+            ancestor = tree.parent_of(ancestor)
+        return False
+
+    def __repr__(self):
+        return f"CompiledSelector({self.selector!r})"
+
+
+def _split_list(selector: str) -> List[str]:
+    """Split a selector list on the commas outside of brackets and quotes."""
+    parts, depth, quote, start = [], 0, None, 0
+    for i, char in enumerate(selector):
+        if quote is not None:
+            quote = None if char == quote else quote
+        elif char in "\"'":
+            quote = char
+        elif char == "[":
+            depth += 1
+        elif char == "]":
+            depth -= 1
+        elif char == "," and depth == 0:
+            parts.append(selector[start:i])
+            start = i + 1
+    parts.append(selector[start:])
+    return parts
+
+
+def _parse_chain(selector: str) -> List[Tuple[_Compound, Union[str, None]]]:
+    compounds: List[_Compound] = []
+    combinators: List[str] = []
+    current, pending, position = None, None, 0
+    text = selector.strip()
+    while position < len(text):
+        match = _TOKEN.match(text, position)
+        if match is None or match.end() == position:
+            raise ValueError(f"Unsupported selector {selector!r} at {text[position:]!r}")
+        position = match.end()
+        if match["combinator"] or match["space"]:
+            if current is None:
+                raise ValueError(f"Unsupported selector {selector!r}: combinator without a left-hand side")
+            pending = ">" if match["combinator"] else (pending or " ")
+            continue
+        if current is None or pending is not None:
+            if current is not None:
+                compounds.append(current)
+                combinators.append(pending)
+            current, pending = _Compound(), None
+        if match["tag"]:
+            if current.tag is not None or current.conditions:
+                raise ValueError(f"Unsupported selector {selector!r}: misplaced type selector {match['tag']!r}")
+            current.tag = None if match["tag"] == "*" else match["tag"].lower()
+        elif match["id"]:
+            current.conditions.append(("id", "=", match["id"]))
+        elif match["cls"]:
+            current.conditions.append(("class", "~=", match["cls"]))
+        else:
+            value = next((v for v in (match["dq"], match["sq"], match["bare"]) if v is not None), None)
+            current.conditions.append((match["attr"].lower(), match["op"], value))
+    if current is None or pending is not None:
+        raise ValueError(f"Unsupported selector {selector!r}: empty or dangling combinator")
+    compounds.append(current)
+    # right to left, each compound with the combinator to its left-hand neighbour
+    return list(zip(reversed(compounds), list(reversed(combinators)) + [None]))
+
+
+@lru_cache(maxsize=512)
+def compile_selector(selector: str) -> CompiledSelector:
+    """
+    Parse a selector list, or get it from the cache.
+
+    :param selector: (str) The selector, e.g. "ul.results > li a[href]"
+    :return: (CompiledSelector) The parsed selector
+    """
+    return CompiledSelector(selector, [_parse_chain(part) for part in _split_list(selector)])
+
+
+__all__ = ["CompiledSelector", "compile_selector"]
@@ -0,0 +1,201 @@
+"""
+Browser-agnostic declarative extraction schemas.
+
+A schema describes the records of a page: a root item `selector`, and `fields` mapping each field name to where its
+value is, relative to the item::
+
+    {
+        "selector": "li.product",
+        "fields": {
+            "title": "h2",                                  # text of the first `h2`
+            "url": "a@href",                                # `href` attribute of the first `a`
+            "id": "@data-id",                               # `data-id` attribute of the item itself
+            "price": {"selector": ".price", "transform": ["strip", "float"]},
+            "tags": {"selector": ".tag", "many": True},     # texts of every `.tag`
+            "body": {"selector": ".body", "type": "html"},
+            "reviews": {"selector": ".review", "many": True, "fields": {"author": ".author", "stars": "@data-stars"}},
+        },
+    }
+
+Field specs are either a shorthand string `"<selector>[@<attribute>]"`, or a dict with keys:
+
+- `selector`: (str) Selector relative to the item, None (or "") for the item itself
+- `type`: (str) "text" (`textContent`, default), "html" (`innerHTML`) or "attr"
+- `attr`: (str) Attribute name, implies `type="attr"`
+- `transform`: (str, List[str]) Transforms applied in order to string values, see `TRANSFORMS`
+- `many`: (bool) Collect the values of every matching element into a list
+- `fields`: (dict) Nested fields, the value is then a record (or a list of records with `many`)
+- `default`: (Any) Value used when no element matches, default to None
+
+Browser managers compile the normalized schema into in-page code, `normalize_schema` only validates and expands it.
+Trees available in Python (DOM snapshots, parsed HTML) are read with `evaluate_schema` instead, which gives the same
+records.
+"""
+import re
+import json
+from typing import Any, Dict, List, Union
+
+
+FIELD_TYPES = ("text", "html", "attr")
+"""where a field's value is read from"""
+
+TRANSFORMS = ("strip", "lower", "upper", "int", "float")
+"""transforms applicable to string values; `int` and `float` ignore thousands separators and currency symbols, and
+give None when no number is found"""
+
+_ATTR_SHORTHAND = re.compile(r"^(?P<selector>.*)@(?P<attr>[A-Za-z_:][-\w:.]*)$")
+
+_INT = re.compile(r"-?\d+")
+_FLOAT = re.compile(r"-?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?")
+_SEPARATORS = re.compile(r"[,\s]")
+
+
+def normalize_field(name: str, spec: Union[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Expand a field spec into its full form.
+
+    :param name: (str) Name of the field, used in error messages
+    :param spec: (str, dict) Shorthand string or dict spec
+    :return: (dict) {"selector", "type", "attr", "transform", "many", "fields", "default"}
+    """
+    if isinstance(spec, str):
+        match = _ATTR_SHORTHAND.match(spec)
+        spec = {"selector": match["selector"], "attr": match["attr"]} if match else {"selector": spec}
+    if not isinstance(spec, dict):
+        raise ValueError(f"Field {name!r}: spec should be a str or a dict, got {type(spec)}")
+    unknown = set(spec) - {"selector", "type", "attr", "transform", "many", "fields", "default"}
+    if unknown:
+        raise ValueError(f"Field {name!r}: unknown keys {sorted(unknown)}")
+
+    selector = (spec.get("selector") or "").strip() or None
+    attr = spec.get("attr")
+    field_type = spec.get("type", "attr" if attr is not None else "text")
+    if field_type not in FIELD_TYPES:
+        raise ValueError(f"Field {name!r}: type should be one of {FIELD_TYPES}, got {field_type!r}")
+    if field_type == "attr" and not attr:
+        raise ValueError(f"Field {name!r}: type 'attr' requires an attribute name")
+
+    transform = spec.get("transform") or []
+    transform = [transform] if isinstance(transform, str) else list(transform)
+    for t in transform:
+        if t not in TRANSFORMS:
+            raise ValueError(f"Field {name!r}: transform should be one of {TRANSFORMS}, got {t!r}")
+
+    fields = spec.get("fields")
+    if fields is not None:
+        if transform or "type" in spec or attr is not None:
+            raise ValueError(f"Field {name!r}: nested fields cannot have a type, attribute or transform")
+        fields = _normalize_fields(fields)
+    return {"selector": selector, "type": field_type, "attr": attr if field_type == "attr" else None,
+            "transform": transform, "many": bool(spec.get("many", False)), "fields": fields,
+            "default": spec.get("default")}
+
+
+def _normalize_fields(fields: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    if not isinstance(fields, dict) or not fields:
+        raise ValueError(f"fields should be a non-empty dict, got {fields!r}")
+    return {str(name): normalize_field(name, spec) for name, spec in fields.items()}
+
+
+def normalize_schema(schema: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Validate a schema and expand every field spec into its full form.
+
+    :param schema: (dict) {"selector": root item selector, "fields": {name: spec}}. Without "selector", the schema
+        describes a single record, relative to the document (or the given root element)
+    :return: (dict) {"selector", "fields"}, with normalized fields
+    """
+    if not isinstance(schema, dict) or "fields" not in schema:
+        raise ValueError(f"schema should be a dict with a 'fields' key, got {schema!r}")
+    unknown = set(schema) - {"selector", "fields"}
+    if unknown:
+        raise ValueError(f"schema: unknown keys {sorted(unknown)}")
+    return {"selector": (schema.get("selector") or "").strip() or None, "fields": _normalize_fields(schema["fields"])}
+
+
+def schema_key(schema: Dict[str, Any]) -> str:
+    """
+    Canonical string of a normalized schema, e.g. to cache compiled code.
+
+    Normalized specs always list their keys in the same order, so equivalent schemas give the same key. Field order is
+    kept, since it is the key order of the extracted records.
+
+    :param schema: (dict) A normalized schema
+    :return: (str) The key
+    """
+    return json.dumps(schema)
+
+
+def apply_transforms(value: Union[str, None], transforms: List[str]) -> Any:
+    """
+    Apply transforms to a string value, as the in-page code does.
+
+    :param value: (str) The value, None passes through every transform
+    :param transforms: (List[str]) Transforms to apply in order, see `TRANSFORMS`
+    :return: (Any) The transformed value
+    """
+    for transform in transforms:
+        if value is None:
+            return None
+        if transform == "strip":
+            value = value.strip()
+        elif transform == "lower":
+            value = value.lower()
+        elif transform == "upper":
+            value = value.upper()
+        elif transform == "int":
+            match = _INT.search(_SEPARATORS.sub("", value))
+            value = int(match[0]) if match else None
+        else:
+            match = _FLOAT.search(_SEPARATORS.sub("", value))
+            value = float(match[0]) if match else None
+    return value
+
+
+def evaluate_schema(schema: Dict[str, Any], tree: Any, scope: Any) -> Union[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Extract the records of a normalized schema from a tree held in Python.
+
+    The tree is accessed through these methods, so any node representation works:
+
+    - `query_one(node, selector) -> node`: first descendant matching the selector, None if none
+    - `query_all(node, selector) -> List[node]`: every descendant matching the selector, in document order
+    - `text(node) -> str`, `html(node) -> str`: text content and inner HTML
+    - `attr(node, name) -> str`: attribute value, None if missing
+
+    :param schema: (dict) A normalized schema
+    :param tree: (Any) The tree
+    :param scope: (Any) Node to extract under, for a single-record schema the node the record is read from
+    :return: (list) One dict per item matching the root selector, or a single dict if the schema has no root selector
+    """
+    if schema["selector"] is None:
+        return _evaluate_record(schema["fields"], tree, scope)
+    return [_evaluate_record(schema["fields"], tree, item) for item in tree.query_all(scope, schema["selector"])]
+
+
+def _evaluate_record(fields: Dict[str, Dict[str, Any]], tree: Any, element: Any) -> Dict[str, Any]:
+    record = {}
+    for name, field in fields.items():
+        if field["many"]:
+            nodes = [element] if field["selector"] is None else tree.query_all(element, field["selector"])
+            record[name] = [_evaluate_value(field, tree, node) for node in nodes]
+        else:
+            node = element if field["selector"] is None else tree.query_one(element, field["selector"])
+            record[name] = field["default"] if node is None else _evaluate_value(field, tree, node)
+    return record
+
+
+def _evaluate_value(field: Dict[str, Any], tree: Any, node: Any) -> Any:
+    if field["fields"] is not None:
+        return _evaluate_record(field["fields"], tree, node)
+    if field["type"] == "html":
+        value = tree.html(node)
+    elif field["type"] == "attr":
+        value = tree.attr(node, field["attr"])
+    else:
+        value = tree.text(node)
+    return apply_transforms(value, field["transform"])
+
+
+__all__ = ["FIELD_TYPES", "TRANSFORMS", "normalize_field", "normalize_schema", "schema_key", "apply_transforms",
+           "evaluate_schema"]
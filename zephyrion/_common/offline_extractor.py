@@ -0,0 +1,277 @@
+"""
+Browser-agnostic extraction from HTML text, off the event loop.
+
+Take the page's HTML once (`await page.content()`), and let `OfflineExtractor` parse and query it with lxml in a
+thread or process pool, while the browser moves on to the next page. Results have the same shape as the in-browser
+APIs (`DataExtractor.get_texts`, `get_attrs`, `count`, `exists`, `has_cls_many`, `extract`).
+
+Each worker keeps an LRU cache of compiled selectors, and of the last parsed documents, so several queries on the same
+HTML only parse it once per worker. The workers, and their caches, go away with `close`. `run` sends several queries in
+one job.
+
+Requires lxml and cssselect (`pip install lxml cssselect`).
+
+Item-relative selectors follow `querySelectorAll`: the whole selector is matched against the document, and only the
+matches under the item are kept, so `"ul li h2"` under an `li` item finds its `h2`.
+"""
+import html
+import asyncio
+import threading
+import collections
+import concurrent.futures
+from functools import lru_cache
+from typing import Any, Dict, List, Tuple, Union
+
+from gembox.debug_utils import Debugger
+
+from .extraction_schema import evaluate_schema, normalize_schema
+
+try:
+    import lxml.html
+    import lxml.etree
+    import cssselect
+except ImportError:
+    lxml = None
+    cssselect = None
+
+
+_DOCUMENT_PREFIX = "descendant-or-self::"
+_SCOPED_PREFIX = "descendant::"
+
+_MAX_DOCUMENTS = 8
+"""number of parsed documents cached by each worker"""
+
+_local = threading.local()
+"""per-thread compiled XPath objects and parsed documents, lxml's are not shareable between threads"""
+
+
+@lru_cache(maxsize=1024)
+def _xpath_source(selector: str, prefix: str) -> str:
+    return cssselect.HTMLTranslator().css_to_xpath(selector, prefix=prefix)
+
+
+def _compiled(selector: str, prefix: str) -> "lxml.etree.XPath":
+    cache = getattr(_local, "xpaths", None)
+    if cache is None:
+        cache = _local.xpaths = {}
+    key = (selector, prefix)
+    if key not in cache:
+        if len(cache) >= 1024:
+            cache.clear()
+        cache[key] = lxml.etree.XPath(_xpath_source(selector, prefix))
+    return cache[key]
+
+
+@lru_cache(maxsize=1024)
+def _has_combinator(selector: str) -> bool:
+    return any(isinstance(s.parsed_tree, cssselect.parser.CombinedSelector) for s in cssselect.parse(selector))
+
+
+def _parse(text: str) -> "lxml.html.HtmlElement":
+    documents = getattr(_local, "documents", None)
+    if documents is None:
+        documents = _local.documents = collections.OrderedDict()
+    root = documents.get(text)
+    if root is None:
+        root = documents[text] = lxml.html.document_fromstring(text)
+        if len(documents) > _MAX_DOCUMENTS:
+            documents.popitem(last=False)
+    else:
+        documents.move_to_end(text)
+    return root
+
+
+class _Tree:
+    """lxml adapter for `evaluate_schema`, the document root is queried as the document itself."""
+
+    def __init__(self, root: "lxml.html.HtmlElement"):
+        self.root = root
+        self._document_matches: Dict[str, set] = {}
+        """elements of the document matching a selector with combinators, for item-relative queries"""
+
+    def query_all(self, node, selector: str) -> list:
+        if node is self.root:
+            return _compiled(selector, _DOCUMENT_PREFIX)(node)
+        if not _has_combinator(selector):
+            # a single compound matches the same elements whether ancestors of the item count or not
+            return _compiled(selector, _SCOPED_PREFIX)(node)
+        matches = self._document_matches.get(selector)
+        if matches is None:
+            # lxml returns the same element objects while they are referenced, so the set can be tested by identity
+            matches = self._document_matches[selector] = set(_compiled(selector, _DOCUMENT_PREFIX)(self.root))
+        return [descendant for descendant in node.iterdescendants() if descendant in matches]
+
+    def query_one(self, node, selector: str):
+        nodes = self.query_all(node, selector)
+        return nodes[0] if nodes else None
+
+    @staticmethod
+    def text(node) -> str:
+        return str(node.text_content())
+
+    @staticmethod
+    def html(node) -> str:
+        inner = html.escape(node.text, quote=False) if node.text else ""
+        return inner + "".join(lxml.html.tostring(child, encoding="unicode") for child in node)
+
+    @staticmethod
+    def attr(node, name: str) -> Union[str, None]:
+        return node.get(name)
+
+
+def _query(tree: _Tree, operation: str, args: tuple) -> Any:
+    if operation == "extract":
+        return evaluate_schema(args[0], tree, tree.root)
+    selector = args[0]
+    if operation == "exists":
+        return tree.query_one(tree.root, selector) is not None
+    nodes = tree.query_all(tree.root, selector)
+    if operation == "count":
+        return len(nodes)
+    if operation == "get_texts":
+        return [tree.text(node) for node in nodes]
+    if operation == "get_attrs":
+        attrs = args[1]
+        if isinstance(attrs, str):
+            return [node.get(attrs) for node in nodes]
+        return [{name: node.get(name) for name in attrs} for node in nodes]
+    if operation == "has_cls_many":
+        return [args[1] in (node.get("class") or "").split() for node in nodes]
+    raise ValueError(f"Unknown offline query {operation!r}")
+
+
+def _run_job(text: str, queries: Dict[str, Tuple[str, tuple]]) -> Dict[str, Any]:
+    """Parse the HTML (or get it from the cache) and run the queries, in a worker."""
+    tree = _Tree(_parse(text))
+    return {name: _query(tree, operation, args) for name, (operation, args) in queries.items()}
+
+
+class OfflineExtractor:
+    """
+    Parse and query HTML text in a worker pool, see the module documentation.
+
+    Usage::
+
+        async with OfflineExtractor() as offline:
+            text = await agent.get_html()
+            await agent.go("https://example.com/page/2")     # the browser moves on...
+            records = await offline.extract(text, schema)    # ...while the previous page is parsed
+    """
+
+    def __init__(self, max_workers: int = None, use_processes: bool = False, debug_tool: Debugger = None):
+        """
+        :param max_workers: (int) Number of workers, default to the executor's default
+        :param use_processes: (bool) Parse in a process pool instead of a thread pool. The HTML is then copied to the
+            worker for every job, but parsing does not compete for the GIL with the event loop
+        :param debug_tool: (Debugger) Debugger instance for debugging
+        """
+        if lxml is None:
+            raise ImportError("OfflineExtractor requires lxml and cssselect, install them with "
+                              "`pip install lxml cssselect`")
+        self._debug_tool = debug_tool if debug_tool is not None else Debugger()
+        self._use_processes = use_processes
+        executor_class = (concurrent.futures.ProcessPoolExecutor if use_processes
+                          else concurrent.futures.ThreadPoolExecutor)
+        self._executor = executor_class(max_workers=max_workers)
+        self._n_jobs = 0
+
+    @property
+    def n_jobs(self) -> int:
+        """number of jobs sent to the workers"""
+        return self._n_jobs
+
+    async def run(self, text: str, queries: Dict[str, Tuple[str, tuple]]) -> Dict[str, Any]:
+        """
+        Run several queries on the same HTML in one job.
+
+        :param text: (str) The HTML
+        :param queries: (dict) {name: (operation, args)}, operations are the methods of the extractor, e.g.
+            {"n": ("count", ("li",)), "titles": ("get_texts", ("h2",)), "items": ("extract", (schema,))}
+        :return: (dict) {name: result}
+        """
+        queries = {name: (operation, tuple(args)) for name, (operation, args) in queries.items()}
+        for name, (operation, args) in queries.items():
+            if operation == "extract":
+                queries[name] = (operation, (normalize_schema(args[0]),))
+        self._n_jobs += 1
+        loop = asyncio.get_running_loop()
+        results = await loop.run_in_executor(self._executor, _run_job, text, queries)
+        self._debug_tool.debug(f"OfflineExtractor: Ran {len(queries)} queries on {len(text)} chars of HTML")
+        return results
+
+    async def _one(self, text: str, operation: str, *args: Any) -> Any:
+        return (await self.run(text, {operation: (operation, args)}))[operation]
+
+    async def get_texts(self, text: str, selector: str) -> List[str]:
+        """
+        :param text: (str) The HTML
+        :param selector: (str) Selector of the elements
+        :return: (List[str]) Text content of each matching element
+        """
+        return await self._one(text, "get_texts", selector)
+
+    async def get_attrs(self, text: str, selector: str, attrs: Union[str, List[str]]) \
+            -> List[Union[str, None, Dict[str, Any]]]:
+        """
+        :param text: (str) The HTML
+        :param selector: (str) Selector of the elements
+        :param attrs: (str, List[str]) Attribute, or list of attributes, to get
+        :return: (list) For a single attribute, its value for each element. For a list, a dict {attr: value} for
+            each element. Missing attributes are None
+        """
+        return await self._one(text, "get_attrs", selector, attrs)
+
+    async def count(self, text: str, selector: str) -> int:
+        """
+        :param text: (str) The HTML
+        :param selector: (str) Selector of the elements
+        :return: (int) Number of elements matching the selector
+        """
+        return await self._one(text, "count", selector)
+
+    async def exists(self, text: str, selector: str) -> bool:
+        """
+        :param text: (str) The HTML
+        :param selector: (str) Selector of the elements
+        :return: (bool) True if at least one element matches the selector
+        """
+        return await self._one(text, "exists", selector)
+
+    async def has_cls_many(self, text: str, selector: str, cls: str) -> List[bool]:
+        """
+        :param text: (str) The HTML
+        :param selector: (str) Selector of the elements
+        :param cls: (str) Class to check
+        :return: (list) For each element matching the selector, True if it has given class
+        """
+        return await self._one(text, "has_cls_many", selector, cls)
+
+    async def extract(self, text: str, schema: Dict[str, Any]) -> Union[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Extract records described by a declarative schema, see `zephyrion._common.extraction_schema`.
+
+        :param text: (str) The HTML
+        :param schema: (dict) The schema
+        :return: (list) One dict per item matching the root selector, or a single dict if the schema has no root selector
+        """
+        return await self._one(text, "extract", schema)
+
+    def close(self, wait: bool = True) -> None:
+        """
+        Shut the worker pool down.
+
+        :param wait: (bool) Wait for the running jobs to finish
+        """
+        self._executor.shutdown(wait=wait)
+
+    async def __aenter__(self) -> "OfflineExtractor":
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __repr__(self):
+        return f"OfflineExtractor(use_processes={self._use_processes}, n_jobs={self._n_jobs})"
+
+
+__all__ = ["OfflineExtractor"]
@@ -0,0 +1,284 @@
+"""
+Browser-agnostic request blocking policies.
+
+A `RequestPolicy` is an ordered list of `RequestRule`, the first matching rule decides whether a request is blocked or
+allowed, and unmatched requests fall back to the policy's default. Browser managers consult the policy from their
+request interception hooks, and report what was blocked through `RequestPolicyStats`.
+"""
+import re
+import fnmatch
+import ipaddress
+from functools import lru_cache
+from typing import Dict, Iterable, List, Pattern, Tuple, Union
+from urllib.parse import urlsplit
+
+try:
+    import tldextract
+    # the snapshot of the public suffix list bundled with tldextract, without fetching the latest one
+    _extract_domain = tldextract.TLDExtract(suffix_list_urls=())
+except ImportError:
+    tldextract = None
+    _extract_domain = None
+
+
+RESOURCE_TYPES = ("document", "stylesheet", "image", "media", "font", "script", "texttrack", "xhr", "fetch",
+                  "eventsource", "websocket", "manifest", "other")
+"""resource types reported by chromium, in lower case"""
+
+
+class UrlPattern:
+    """
+    A url pattern, either a glob (`"*.png"`, `"https://*.example.com/*"`) or a regular expression.
+
+    Strings are globs, unless prefixed with `re:`; compiled `re.Pattern` objects are used as is.
+    """
+
+    def __init__(self, pattern: Union[str, Pattern]):
+        """
+        :param pattern: (str, re.Pattern) Glob, `re:`-prefixed regex string, or compiled regex
+        """
+        self._source = pattern
+        if isinstance(pattern, str):
+            if pattern.startswith("re:"):
+                self._regex = re.compile(pattern[3:])
+            else:
+                self._regex = re.compile(fnmatch.translate(pattern))
+        else:
+            self._regex = pattern
+
+    def matches(self, url: str) -> bool:
+        return self._regex.search(url) is not None
+
+    def to_wildcard(self) -> Union[str, None]:
+        """
+        The pattern as a `*`/`?` wildcard matching at least the same urls, e.g. for the CDP `Fetch.enable` patterns.
+
+        :return: (str) The wildcard, None if the pattern is a regex or uses glob character classes
+        """
+        source = self._source
+        if not isinstance(source, str) or source.startswith("re:") or any(c in source for c in "[]\\"):
+            return None
+        # `matches` searches, so a glob may match anywhere in the url
+        return source if source.startswith("*") else "*" + source
+
+    def __repr__(self):
+        return f"UrlPattern({self._source!r})"
+
+
+def _host(url: str) -> str:
+    return (urlsplit(url).hostname or "").lower()
+
+
+_COMMON_SECOND_LEVELS = frozenset({"co", "com", "net", "org", "gov", "edu", "ac", "or", "ne", "go"})
+"""second-level labels under which country code domains are registered, e.g. `co.uk`, `com.au`"""
+
+
+@lru_cache(maxsize=4096)
+def _site(host: str) -> str:
+    """
+    Registrable domain of a host, e.g. "example.co.uk" for "www.example.co.uk".
+
+    Uses the public suffix list if tldextract is installed (`pip install tldextract`). Without it, the last two labels
+    are taken, or three under a common second level of a country code (`co.uk`, `com.au`, ...), which misses the rarer
+    public suffixes, see `RequestPolicy` `first_party_domains`.
+    """
+    try:
+        ipaddress.ip_address(host.strip("[]"))
+        return host
+    except ValueError:
+        pass
+    if _extract_domain is not None:
+        return _extract_domain(host).registered_domain or host
+    labels = host.split(".")
+    if len(labels) >= 3 and len(labels[-1]) == 2 and labels[-2] in _COMMON_SECOND_LEVELS:
+        return ".".join(labels[-3:])
+    return ".".join(labels[-2:])
+
+
+def _in_domains(host: str, domains: Tuple[str, ...]) -> bool:
+    return any(host == d or host.endswith("." + d) for d in domains)
+
+
+class RequestRule:
+    """
+    One rule of a `RequestPolicy`. Every given condition must hold for the rule to match.
+    """
+
+    def __init__(self, action: str, resource_types: Iterable[str] = None, url_patterns: Iterable[Union[str, Pattern]] = None,
+                 domains: Iterable[str] = None, third_party: bool = None):
+        """
+        :param action: (str) "block" or "allow"
+        :param resource_types: (Iterable[str]) Resource types to match, e.g. ["image", "font"], see `RESOURCE_TYPES`
+        :param url_patterns: (Iterable[str, re.Pattern]) Url patterns to match, any of them may match
+        :param domains: (Iterable[str]) Domains to match, subdomains included, e.g. ["doubleclick.net"]
+        :param third_party: (bool) If True, only match requests to another site than the page's; if False, only same-site
+        """
+        if action not in ("block", "allow"):
+            raise ValueError(f"action should be 'block' or 'allow', got {action}")
+        self.action: str = action
+        self.resource_types = None if resource_types is None else frozenset(t.lower() for t in resource_types)
+        self.url_patterns = None if url_patterns is None else [UrlPattern(p) for p in url_patterns]
+        self.domains = None if domains is None else tuple(d.lower().lstrip(".") for d in domains)
+        self.third_party = third_party
+
+    def matches(self, url: str, resource_type: str, page_url: str = None,
+                first_party_domains: Tuple[str, ...] = ()) -> bool:
+        """
+        Whether the rule matches a request.
+
+        :param url: (str) Url of the request
+        :param resource_type: (str) Resource type of the request
+        :param page_url: (str) Url of the page issuing the request, needed by `third_party`
+        :param first_party_domains: (Tuple[str]) Domains, subdomains included, never counted as third-party
+        :return: (bool) True if the rule matches
+        """
+        if self.resource_types is not None and resource_type.lower() not in self.resource_types:
+            return False
+        if self.url_patterns is not None and not any(p.matches(url) for p in self.url_patterns):
+            return False
+        if self.domains is not None or self.third_party is not None:
+            host = _host(url)
+            if self.domains is not None and not _in_domains(host, self.domains):
+                return False
+            if self.third_party is not None:
+                if not page_url or not _host(page_url):
+                    return False
+                is_third_party = _site(host) != _site(_host(page_url)) and not _in_domains(host, first_party_domains)
+                if is_third_party != self.third_party:
+                    return False
+        return True
+
+    def __repr__(self):
+        return (f"RequestRule({self.action!r}, resource_types={self.resource_types}, url_patterns={self.url_patterns}, "
+                f"domains={self.domains}, third_party={self.third_party})")
+
+
+class RequestPolicyStats:
+    """
+    Counters of the requests seen by a `RequestPolicy`.
+
+    Blocked responses are never downloaded, so `bytes_saved` only counts the blocked urls whose size was observed by an
+    earlier, allowed download; the others are counted by `n_unknown_size`.
+    """
+
+    def __init__(self):
+        self.n_allowed: int = 0
+        """number of allowed requests"""
+        self.n_blocked: int = 0
+        """number of blocked requests"""
+        self.blocked_by_type: Dict[str, int] = {}
+        """number of blocked requests, by resource type"""
+        self.bytes_saved: int = 0
+        """number of bytes not downloaded thanks to blocking, for the blocked urls of known size"""
+        self.n_unknown_size: int = 0
+        """number of blocked requests whose size was never observed"""
+        self._size_by_url: Dict[str, int] = {}
+
+    def record_response(self, url: str, resource_type: str, n_bytes: int) -> None:
+        """Remember the size of a downloaded response, counted in `bytes_saved` when the same url is blocked later."""
+        self._size_by_url[url] = n_bytes
+
+    def _record_allowed(self) -> None:
+        self.n_allowed += 1
+
+    def _record_blocked(self, url: str, resource_type: str) -> None:
+        self.n_blocked += 1
+        self.blocked_by_type[resource_type] = self.blocked_by_type.get(resource_type, 0) + 1
+        if url in self._size_by_url:
+            self.bytes_saved += self._size_by_url[url]
+        else:
+            self.n_unknown_size += 1
+
+    def reset(self) -> None:
+        """Reset the counters, the observed sizes are kept."""
+        self.n_allowed, self.n_blocked, self.bytes_saved, self.n_unknown_size = 0, 0, 0, 0
+        self.blocked_by_type = {}
+
+    def to_dict(self) -> dict:
+        return {"n_allowed": self.n_allowed, "n_blocked": self.n_blocked, "blocked_by_type": dict(self.blocked_by_type),
+                "bytes_saved": self.bytes_saved, "n_unknown_size": self.n_unknown_size}
+
+    def __repr__(self):
+        return f"RequestPolicyStats({self.to_dict()})"
+
+
+class RequestPolicy:
+    """
+    Ordered request blocking rules, the first matching rule wins.
+
+    Usage::
+
+        policy = RequestPolicy().block(resource_types=["image", "font", "media"]) \\
+                                .block(resource_types=["script"], third_party=True)
+        await browser_manager.go(url, policy=policy)
+    """
+
+    def __init__(self, rules: Iterable[RequestRule] = None, default: str = "allow",
+                 first_party_domains: Iterable[str] = None):
+        """
+        :param rules: (Iterable[RequestRule]) Rules, checked in order
+        :param default: (str) "allow" or "block", the action when no rule matches
+        :param first_party_domains: (Iterable[str]) Domains, subdomains included, never counted as third-party by the
+            `third_party` rules, e.g. the site's CDN domain, or its own domain under a public suffix the registrable
+            domain guess misses
+        """
+        if default not in ("block", "allow"):
+            raise ValueError(f"default should be 'block' or 'allow', got {default}")
+        self.rules: List[RequestRule] = list(rules) if rules is not None else []
+        self.default: str = default
+        self.first_party_domains: Tuple[str, ...] = tuple(d.lower().lstrip(".") for d in (first_party_domains or ()))
+        self.stats: RequestPolicyStats = RequestPolicyStats()
+
+    def block(self, **kwargs) -> "RequestPolicy":
+        """Append a blocking rule, see `RequestRule` for the arguments. Return the policy itself for chaining."""
+        self.rules.append(RequestRule("block", **kwargs))
+        return self
+
+    def allow(self, **kwargs) -> "RequestPolicy":
+        """Append an allowing rule, see `RequestRule` for the arguments. Return the policy itself for chaining."""
+        self.rules.append(RequestRule("allow", **kwargs))
+        return self
+
+    def is_allowed(self, url: str, resource_type: str, page_url: str = None) -> bool:
+        """
+        Decide whether a request is allowed, and count it in `stats`.
+
+        :param url: (str) Url of the request
+        :param resource_type: (str) Resource type of the request
+        :param page_url: (str) Url of the page issuing the request
+        :return: (bool) True if the request should go on, False if it should be aborted
+        """
+        action = self.default
+        # never block `data:` urls, they cost nothing
+        if not url.startswith("data:"):
+            for rule in self.rules:
+                if rule.matches(url, resource_type, page_url, self.first_party_domains):
+                    action = rule.action
+                    break
+        if action == "allow":
+            self.stats._record_allowed()
+            return True
+        self.stats._record_blocked(url, resource_type)
+        return False
+
+    @classmethod
+    def lightweight(cls, first_party_domains: Iterable[str] = None) -> "RequestPolicy":
+        """
+        A preset blocking images, media, fonts, and third-party scripts.
+
+        Third-party means another registrable domain than the page's. Without tldextract (`pip install tldextract`),
+        it is guessed from the host's last labels, which handles `example.com` and `example.co.uk` but not every public
+        suffix (e.g. `example.github.io` and `other.github.io` count as the same site). Pass the site's own domains,
+        and its CDN's, as `first_party_domains` to keep their scripts whatever the guess.
+
+        :param first_party_domains: (Iterable[str]) Domains, subdomains included, whose scripts are never blocked
+        """
+        return cls(first_party_domains=first_party_domains).block(resource_types=["image", "media", "font"]) \
+            .block(resource_types=["script"], third_party=True)
+
+    def __repr__(self):
+        return (f"RequestPolicy(rules={self.rules}, default={self.default!r}, "
+                f"first_party_domains={self.first_party_domains})")
+
+
+__all__ = ["RequestPolicy", "RequestRule", "RequestPolicyStats", "UrlPattern", "RESOURCE_TYPES"]
@@ -0,0 +1,316 @@
+"""
+Persistent, content-addressed HTTP response cache, shared across runs and processes.
+
+Bodies are stored once per content hash under `<root>/blobs/`, and an SQLite index at `<root>/index.sqlite` maps
+`(method, url)` to a body, its status, headers and expiry. The index counts the entries referencing each body and keeps
+the total size of the bodies, so that storing a response does not scan the index. The cache is bounded by `max_bytes`
+and evicts the least recently used entries first. Only urls matching a TTL rule are cached.
+
+Bodies are stored decoded, as browsers hand them out, so `Content-Encoding`, `Content-Length` and `Transfer-Encoding`
+are dropped from the stored headers.
+"""
+import json
+import time
+import sqlite3
+import hashlib
+import pathlib
+import threading
+from typing import Dict, Iterable, List, Pattern, Tuple, Union
+
+from .request_policy import UrlPattern
+
+
+_BODY_FRAMING_HEADERS = frozenset({"content-encoding", "content-length", "transfer-encoding"})
+"""headers describing the body as sent on the wire, stale once the body is stored decoded"""
+
+
+_PER_USER_VARY = frozenset({"cookie", "authorization", "*"})
+"""`Vary` values of responses that differ per user, or per request"""
+
+
+def _without_framing_headers(headers: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    return [h for h in headers if h["name"].lower() not in _BODY_FRAMING_HEADERS]
+
+
+def _is_shareable(headers: List[Dict[str, str]]) -> bool:
+    """Whether a response may be served to later requests, whoever makes them."""
+    for header in headers:
+        name = header["name"].lower()
+        values = {v.strip().split("=")[0] for v in header["value"].lower().split(",")}
+        if name == "set-cookie":
+            return False
+        if name == "cache-control" and values & {"no-store", "private"}:
+            return False
+        if name == "vary" and values & _PER_USER_VARY:
+            return False
+    return True
+
+
+class CachedResponse:
+    """A response served from the cache."""
+
+    def __init__(self, status: int, headers: List[Dict[str, str]], body: bytes):
+        """
+        :param status: (int) HTTP status code
+        :param headers: (List[dict]) Response headers, as a list of {"name": ..., "value": ...}
+        :param body: (bytes) Response body
+        """
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def __repr__(self):
+        return f"CachedResponse(status={self.status}, n_bytes={len(self.body)})"
+
+
+class ResponseCacheStats:
+    """Counters of a `DiskResponseCache`, since it was opened."""
+
+    def __init__(self):
+        self.n_hits: int = 0
+        """number of requests served from the cache"""
+        self.n_misses: int = 0
+        """number of cacheable requests not found in the cache, or expired"""
+        self.n_stored: int = 0
+        """number of responses stored"""
+        self.n_evicted: int = 0
+        """number of entries evicted to stay under the size limit"""
+        self.bytes_served: int = 0
+        """number of body bytes served from the cache"""
+
+    @property
+    def hit_ratio(self) -> float:
+        """hits / (hits + misses), 0 if no cacheable request was seen"""
+        n_lookups = self.n_hits + self.n_misses
+        return self.n_hits / n_lookups if n_lookups else 0.
+
+    def to_dict(self) -> dict:
+        return {"n_hits": self.n_hits, "n_misses": self.n_misses, "n_stored": self.n_stored, "n_evicted": self.n_evicted,
+                "bytes_served": self.bytes_served, "hit_ratio": self.hit_ratio}
+
+    def __repr__(self):
+        return f"ResponseCacheStats({self.to_dict()})"
+
+
+class DiskResponseCache:
+    """
+    Persistent response cache with per-url-pattern TTL rules and LRU eviction.
+
+    Usage::
+
+        cache = DiskResponseCache("~/.cache/zephyrion", max_bytes=1 << 30,
+                                  rules=[("*.js", 24 * 3600), ("re:/api/v1/catalog", 600)])
+    """
+
+    def __init__(self, root: Union[str, pathlib.Path], max_bytes: int = 512 * 1024 * 1024,
+                 rules: Iterable[Tuple[Union[str, Pattern], float]] = None):
+        """
+        :param root: (str, pathlib.Path) Directory of the cache, created if missing
+        :param max_bytes: (int) Maximum total size of the stored bodies
+        :param rules: (Iterable[(pattern, ttl)]) Url patterns (see `UrlPattern`) and their TTL in seconds, the first
+            matching rule wins, and urls matching no rule are not cached
+        """
+        self._root = pathlib.Path(root).expanduser()
+        self._blob_dir = self._root / "blobs"
+        self._blob_dir.mkdir(parents=True, exist_ok=True)
+        self._max_bytes = max_bytes
+        self._rules: List[Tuple[UrlPattern, float]] = [(UrlPattern(p), ttl) for p, ttl in (rules or [])]
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self._root / "index.sqlite"), timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, url TEXT, status INTEGER, "
+                         "headers TEXT, blob TEXT, size INTEGER, expires_at REAL, last_access REAL)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)")
+        self._db.execute("BEGIN IMMEDIATE")
+        if self._db.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'blobs'").fetchone() is None:
+            # bodies with the number of entries referencing them, and their total size; built from the entries of an
+            # index created before they existed
+            self._db.execute("CREATE TABLE blobs (blob TEXT PRIMARY KEY, size INTEGER, refs INTEGER)")
+            self._db.execute("INSERT INTO blobs SELECT blob, MAX(size), COUNT(*) FROM entries GROUP BY blob")
+            self._db.execute("CREATE TABLE totals (id INTEGER PRIMARY KEY, bytes INTEGER)")
+            self._db.execute("INSERT INTO totals SELECT 0, COALESCE(SUM(size), 0) FROM blobs")
+        self._db.commit()
+        self.stats = ResponseCacheStats()
+
+    @property
+    def root(self) -> pathlib.Path:
+        """directory of the cache"""
+        return self._root
+
+    @property
+    def max_bytes(self) -> int:
+        """maximum total size of the stored bodies"""
+        return self._max_bytes
+
+    @property
+    def total_bytes(self) -> int:
+        """total size of the stored bodies, each distinct body counted once"""
+        with self._lock:
+            return self._total_bytes()
+
+    def ttl_for(self, url: str) -> Union[float, None]:
+        """
+        TTL of a url according to the rules.
+
+        :param url: (str) The url
+        :return: (float) TTL in seconds, None if the url should not be cached
+        """
+        for pattern, ttl in self._rules:
+            if pattern.matches(url):
+                return ttl
+        return None
+
+    def url_wildcards(self) -> Union[List[str], None]:
+        """
+        `*`/`?` wildcards covering every cacheable url, to only intercept those requests.
+
+        :return: (List[str]) One wildcard per rule, ["*"] if a rule cannot be written as a wildcard (e.g. a regex),
+            None if there are no rules
+        """
+        if not self._rules:
+            return None
+        wildcards = [pattern.to_wildcard() for pattern, _ in self._rules]
+        return ["*"] if None in wildcards else list(dict.fromkeys(wildcards))
+
+    def get(self, method: str, url: str) -> Union[CachedResponse, None]:
+        """
+        Look up a fresh response.
+
+        :param method: (str) HTTP method of the request
+        :param url: (str) Url of the request
+        :return: (CachedResponse) The cached response, None on a miss
+        """
+        if method.upper() != "GET" or self.ttl_for(url) is None:
+            return None
+        key = self._key(method, url)
+        with self._lock:
+            row = self._db.execute("SELECT status, headers, blob, expires_at FROM entries WHERE key = ?", (key,)).fetchone()
+            now = time.time()
+            if row is None or row[3] < now:
+                self.stats.n_misses += 1
+                return None
+            try:
+                body = self._blob_path(row[2]).read_bytes()
+            except FileNotFoundError:
+                self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._release_blob(row[2])
+                self._db.commit()
+                self.stats.n_misses += 1
+                return None
+            self._db.execute("UPDATE entries SET last_access = ? WHERE key = ?", (now, key))
+            self._db.commit()
+        self.stats.n_hits += 1
+        self.stats.bytes_served += len(body)
+        # entries stored before the framing headers were dropped may still have them
+        return CachedResponse(status=row[0], headers=_without_framing_headers(json.loads(row[1])), body=body)
+
+    def put(self, method: str, url: str, status: int, headers: List[Dict[str, str]], body: bytes) -> bool:
+        """
+        Store a response, if it is cacheable.
+
+        Only successful GET responses matching a TTL rule are stored. Responses setting cookies, marked `no-store` or
+        `private`, or varying by `Cookie` or `Authorization` are never stored: they may belong to one user.
+
+        :param method: (str) HTTP method of the request
+        :param url: (str) Url of the request
+        :param status: (int) HTTP status code
+        :param headers: (List[dict]) Response headers, as a list of {"name": ..., "value": ...}
+        :param body: (bytes) Response body, decoded
+        :return: (bool) True if the response was stored
+        """
+        ttl = self.ttl_for(url)
+        if method.upper() != "GET" or status != 200 or ttl is None or len(body) > self._max_bytes:
+            return False
+        if not _is_shareable(headers):
+            return False
+        headers = _without_framing_headers(headers)
+        blob = hashlib.sha256(body).hexdigest()
+        blob_path = self._blob_path(blob)
+        if not blob_path.exists():
+            blob_path.parent.mkdir(exist_ok=True)
+            tmp_path = blob_path.with_suffix(".tmp")
+            tmp_path.write_bytes(body)
+            tmp_path.replace(blob_path)
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                old = self._db.execute("SELECT blob FROM entries WHERE key = ?", (self._key(method, url),)).fetchone()
+                self._db.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                 (self._key(method, url), url, status, json.dumps(headers), blob, len(body), now + ttl,
+                                  now))
+                self._reference_blob(blob, len(body))
+                if old is not None:
+                    self._release_blob(old[0])
+                self._evict()
+                self._db.commit()
+            except Exception:
+                self._db.rollback()
+                raise
+        self.stats.n_stored += 1
+        return True
+
+    def clear(self) -> None:
+        """Remove every entry and body."""
+        with self._lock:
+            for (blob,) in self._db.execute("SELECT blob FROM blobs").fetchall():
+                self._blob_path(blob).unlink(missing_ok=True)
+            self._db.execute("DELETE FROM entries")
+            self._db.execute("DELETE FROM blobs")
+            self._db.execute("UPDATE totals SET bytes = 0")
+            self._db.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def _evict(self) -> None:
+        """Drop the least recently used entries until the total size is under `max_bytes`. Caller holds the lock."""
+        total = self._total_bytes()
+        while total > self._max_bytes:
+            row = self._db.execute("SELECT key, blob FROM entries ORDER BY last_access LIMIT 1").fetchone()
+            if row is None:
+                break
+            self._db.execute("DELETE FROM entries WHERE key = ?", (row[0],))
+            total -= self._release_blob(row[1])
+            self.stats.n_evicted += 1
+
+    def _reference_blob(self, blob: str, size: int) -> None:
+        """Count a new entry referencing a body. Caller holds the lock."""
+        if self._db.execute("UPDATE blobs SET refs = refs + 1 WHERE blob = ?", (blob,)).rowcount == 0:
+            self._db.execute("INSERT INTO blobs VALUES (?, ?, 1)", (blob, size))
+            self._db.execute("UPDATE totals SET bytes = bytes + ?", (size,))
+
+    def _release_blob(self, blob: str) -> int:
+        """
+        Uncount a removed entry referencing a body, and delete the body once unused. Caller holds the lock.
+
+        :return: (int) Number of bytes freed
+        """
+        self._db.execute("UPDATE blobs SET refs = refs - 1 WHERE blob = ?", (blob,))
+        row = self._db.execute("SELECT refs, size FROM blobs WHERE blob = ?", (blob,)).fetchone()
+        if row is None or row[0] > 0:
+            return 0
+        self._db.execute("DELETE FROM blobs WHERE blob = ?", (blob,))
+        self._db.execute("UPDATE totals SET bytes = bytes - ?", (row[1],))
+        self._blob_path(blob).unlink(missing_ok=True)
+        return row[1]
+
+    def _total_bytes(self) -> int:
+        return self._db.execute("SELECT bytes FROM totals").fetchone()[0]
+
+    def _blob_path(self, blob: str) -> pathlib.Path:
+        return self._blob_dir / blob[:2] / blob
+
+    @staticmethod
+    def _key(method: str, url: str) -> str:
+        return hashlib.sha256(f"{method.upper()} {url}".encode()).hexdigest()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+__all__ = ["DiskResponseCache", "CachedResponse", "ResponseCacheStats"]
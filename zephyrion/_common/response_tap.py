@@ -0,0 +1,287 @@
+"""
+Browser-agnostic capture of network response bodies.
+
+Feeds usually load their data as JSON XHR responses. A `ResponseTap` registered on a browser manager receives the
+responses of the page, keeps those matching its url patterns, content types and resource types, and hands their
+decoded bodies out through an async iterator, while `go`, `scroll_load` and friends run. Only matching responses have
+their body read, the others are dropped from their headers alone.
+
+Captured responses are buffered up to `max_buffer`. When the consumer falls behind, new matching responses are
+dropped, without reading their body, and counted in `n_dropped`.
+"""
+import json
+import asyncio
+import contextlib
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterable, List, Pattern, Set, Union
+
+from gembox.debug_utils import Debugger
+
+from .request_policy import UrlPattern
+
+
+DECODERS = ("json", "text", "bytes")
+"""how bodies are decoded"""
+
+
+class TappedResponse:
+    """
+    A captured response.
+    """
+
+    def __init__(self, url: str, status: int, content_type: str, resource_type: str, body: Any):
+        """
+        :param url: (str) Url of the response
+        :param status: (int) HTTP status
+        :param content_type: (str) Content-Type header
+        :param resource_type: (str) Resource type of the request, e.g. "xhr"
+        :param body: (Any) The decoded body
+        """
+        self.url = url
+        self.status = status
+        self.content_type = content_type
+        self.resource_type = resource_type
+        self.body = body
+
+    def __repr__(self):
+        return f"TappedResponse({self.url!r}, status={self.status}, content_type={self.content_type!r})"
+
+
+class ResponseTap:
+    """
+    Filter and buffer response bodies, see the module documentation. Create taps with the browser managers'
+    `tap_responses`, e.g.::
+
+        tap = await agent.tap_responses("*/api/feed*")
+        async with tap:
+            async for response in tap.until(agent.scroll_load()):
+                items.extend(response.body["items"])
+    """
+
+    def __init__(self, url_patterns: Iterable[Union[str, Pattern]] = None,
+                 content_types: Iterable[str] = ("application/json",),
+                 resource_types: Iterable[str] = ("xhr", "fetch"), decode: str = "json", max_buffer: int = 256,
+                 debug_tool: Debugger = None):
+        """
+        :param url_patterns: (Iterable[str, re.Pattern]) Url patterns of the responses to keep, see `UrlPattern`,
+            default to every url
+        :param content_types: (Iterable[str]) Content types to keep, matched as substrings of the Content-Type header
+            (e.g. "json" keeps "application/vnd.api+json"), None for every content type
+        :param resource_types: (Iterable[str]) Resource types to keep, None for every resource type
+        :param decode: (str) "json", "text" or "bytes"
+        :param max_buffer: (int) Maximum number of captured responses waiting to be consumed
+        :param debug_tool: (Debugger) Debugger instance for debugging
+        """
+        if decode not in DECODERS:
+            raise ValueError(f"decode should be one of {DECODERS}, got {decode!r}")
+        self._url_patterns = [UrlPattern(p) for p in url_patterns] if url_patterns else None
+        self._content_types = [t.lower() for t in content_types] if content_types is not None else None
+        self._resource_types = {t.lower() for t in resource_types} if resource_types is not None else None
+        self._decode = decode
+        self._debug_tool = debug_tool if debug_tool is not None else Debugger()
+        self._queue: "asyncio.Queue[Union[TappedResponse, None]]" = asyncio.Queue(maxsize=max_buffer)
+        self._pending: Set[asyncio.Future] = set()
+        """body reads in flight"""
+        self._on_close: Union[Callable[[], Any], None] = None
+        self._closed = False
+        self._n_matched = 0
+        self._n_dropped = 0
+        self._n_errors = 0
+
+    @property
+    def n_matched(self) -> int:
+        """number of responses matching the tap"""
+        return self._n_matched
+
+    @property
+    def n_dropped(self) -> int:
+        """number of matching responses dropped because the buffer was full"""
+        return self._n_dropped
+
+    @property
+    def n_errors(self) -> int:
+        """number of matching responses whose body could not be read or decoded"""
+        return self._n_errors
+
+    @property
+    def is_closed(self) -> bool:
+        return self._closed
+
+    def on_close(self, callback: Callable[[], Any]) -> None:
+        """
+        Register the function detaching the tap from its page, called once by `close`.
+
+        :param callback: (Callable) The function
+        """
+        self._on_close = callback
+
+    def matches(self, url: str, status: int, content_type: str, resource_type: str) -> bool:
+        """
+        Check, from the headers alone, if a response is kept.
+
+        :param url: (str) Url of the response
+        :param status: (int) HTTP status, only 2xx responses have a body to keep
+        :param content_type: (str) Content-Type header, "" if missing
+        :param resource_type: (str) Resource type of the request
+        :return: (bool) True if the response is kept
+        """
+        if not 200 <= status < 300 or status == 204:
+            return False
+        if self._resource_types is not None and (resource_type or "").lower() not in self._resource_types:
+            return False
+        if self._content_types is not None:
+            content_type = (content_type or "").lower()
+            if not any(t in content_type for t in self._content_types):
+                return False
+        return self._url_patterns is None or any(p.matches(url) for p in self._url_patterns)
+
+    def offer(self, url: str, status: int, content_type: str, resource_type: str,
+              read_body: Callable[[], Awaitable[Union[bytes, str]]]) -> bool:
+        """
+        Hand a response to the tap, called by the browser managers from their response event.
+
+        :param url: (str) Url of the response
+        :param status: (int) HTTP status
+        :param content_type: (str) Content-Type header, "" if missing
+        :param resource_type: (str) Resource type of the request
+        :param read_body: (Callable) Coroutine function reading the body, only called if the response is kept
+        :return: (bool) True if the body is being captured
+        """
+        if self._closed or not self.matches(url, status, content_type, resource_type):
+            return False
+        self._n_matched += 1
+        if self._queue.qsize() + len(self._pending) >= self._queue.maxsize:
+            self._n_dropped += 1
+            return False
+        task = asyncio.ensure_future(self._capture(url, status, content_type, resource_type, read_body))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+        return True
+
+    async def _capture(self, url: str, status: int, content_type: str, resource_type: str,
+                       read_body: Callable[[], Awaitable[Union[bytes, str]]]) -> None:
+        try:
+            raw = await read_body()
+            body = self._decode_body(raw)
+        except Exception as e:
+            # e.g. the page navigated away before the body was read
+            self._n_errors += 1
+            self._debug_tool.debug(f"ResponseTap: Failed to capture {url}: {e}")
+            return
+        if self._closed:
+            return
+        try:
+            self._queue.put_nowait(TappedResponse(url=url, status=status, content_type=content_type,
+                                                  resource_type=resource_type, body=body))
+        except asyncio.QueueFull:
+            self._n_dropped += 1
+
+    def _decode_body(self, raw: Union[bytes, str]) -> Any:
+        if self._decode == "bytes":
+            return raw.encode("utf-8") if isinstance(raw, str) else raw
+        text = raw.decode("utf-8", errors="replace") if isinstance(raw, bytes) else raw
+        return json.loads(text) if self._decode == "json" else text
+
+    def drain(self) -> List[TappedResponse]:
+        """
+        Take every buffered response, without waiting.
+
+        :return: (List[TappedResponse]) The responses, in order of capture
+        """
+        responses = []
+        is_ended = False
+        while not self._queue.empty():
+            response = self._queue.get_nowait()
+            if response is None:
+                is_ended = True
+            else:
+                responses.append(response)
+        if is_ended:
+            # leave the end marker for the other consumers
+            self._queue.put_nowait(None)
+        return responses
+
+    async def until(self, awaitable: Awaitable) -> AsyncIterator[TappedResponse]:
+        """
+        Yield the captured responses while an awaitable runs, e.g. a navigation or a scroll-load, then the ones
+        captured by its end. Exceptions of the awaitable are raised once the buffer is drained.
+
+        If the tap is closed first, the awaitable is cancelled, and its exception, other than the cancellation, raised.
+
+        :param awaitable: (Awaitable) The awaitable, e.g. `agent.scroll_load()`
+        :return: (AsyncIterator[TappedResponse]) The responses, in order of capture
+        """
+        task = asyncio.ensure_future(awaitable)
+        getter = None
+        try:
+            while not task.done():
+                getter = asyncio.ensure_future(self._queue.get())
+                await asyncio.wait([getter, task], return_when=asyncio.FIRST_COMPLETED)
+                if not getter.done():
+                    getter.cancel()
+                    continue
+                response = getter.result()
+                if response is None:
+                    # leave the end marker for the other consumers
+                    self._queue.put_nowait(None)
+                    task.cancel()
+                    with contextlib.suppress(asyncio.CancelledError):
+                        await task
+                    return
+                yield response
+            # bodies of the last responses may still be in flight
+            if self._pending:
+                await asyncio.wait(list(self._pending))
+            for response in self.drain():
+                yield response
+            task.result()
+        finally:
+            # a pending getter would take the next response from the other consumers
+            if getter is not None and not getter.done():
+                getter.cancel()
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled():
+                # the consumer stopped early, the exception is not raised but must not be reported as lost
+                task.exception()
+
+    def close(self) -> None:
+        """
+        Stop capturing, detach the tap from its page, and end the iterators once the buffer is consumed.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        for task in list(self._pending):
+            task.cancel()
+        if self._on_close is not None:
+            self._on_close()
+            self._on_close = None
+        if not self._queue.full():
+            # wake the waiting consumers up, a full buffer has no waiting consumer
+            self._queue.put_nowait(None)
+
+    def __aiter__(self) -> "ResponseTap":
+        return self
+
+    async def __anext__(self) -> TappedResponse:
+        if self._closed and self._queue.empty():
+            raise StopAsyncIteration
+        response = await self._queue.get()
+        if response is None:
+            # leave the end marker for the other consumers
+            self._queue.put_nowait(None)
+            raise StopAsyncIteration
+        return response
+
+    async def __aenter__(self) -> "ResponseTap":
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __repr__(self):
+        return (f"ResponseTap(n_matched={self._n_matched}, n_buffered={self._queue.qsize()}, "
+                f"n_dropped={self._n_dropped}, closed={self._closed})")
+
+
+__all__ = ["ResponseTap", "TappedResponse", "DECODERS"]
@@ -0,0 +1,197 @@
+"""
+Browser-agnostic session snapshots, and stores persisting them to files or SQLite.
+
+A `SessionSnapshot` holds what a site needs to recognise a logged-in user: cookies, localStorage, sessionStorage and
+IndexedDB records of one origin. Browser managers capture and restore snapshots, the stores only persist them.
+"""
+import abc
+import json
+import time
+import sqlite3
+import pathlib
+import threading
+from typing import Any, Dict, List, Union
+
+
+_COOKIE_PARAM_KEYS = ("name", "value", "domain", "path", "secure", "httpOnly", "sameSite", "expires")
+"""keys of a cookie accepted when setting it back into a browser"""
+
+
+class SessionSnapshot:
+    """
+    Cookies and storage of one origin, at one point in time.
+    """
+
+    def __init__(self, origin: str, cookies: List[Dict[str, Any]] = None, local_storage: Dict[str, str] = None,
+                 session_storage: Dict[str, str] = None, indexed_db: List[Dict[str, Any]] = None, saved_at: float = None):
+        """
+        :param origin: (str) Origin of the session, e.g. "https://example.com"
+        :param cookies: (List[dict]) Cookies, as returned by the browser
+        :param local_storage: (Dict[str, str]) localStorage items of the origin
+        :param session_storage: (Dict[str, str]) sessionStorage items of the origin
+        :param indexed_db: (List[dict]) IndexedDB databases of the origin, each {"name", "version", "stores": [...]}
+        :param saved_at: (float) Unix time of the capture, default to now
+        """
+        self.origin = origin
+        self.cookies = cookies if cookies is not None else []
+        self.local_storage = local_storage if local_storage is not None else {}
+        self.session_storage = session_storage if session_storage is not None else {}
+        self.indexed_db = indexed_db if indexed_db is not None else []
+        self.saved_at = saved_at if saved_at is not None else time.time()
+
+    @property
+    def expires_at(self) -> Union[float, None]:
+        """
+        Unix time at which the last cookie expires, None if there is no cookie or a session cookie, which never expires.
+        Short-lived cookies (e.g. analytics) expiring earlier do not end the session, they are just not restored.
+        """
+        expiries = [c.get("expires", -1) for c in self.cookies]
+        if not expiries or any(expires <= 0 for expires in expiries):
+            return None
+        return max(expiries)
+
+    def is_expired(self, max_age: float = None, now: float = None) -> bool:
+        """
+        Whether the session is likely no longer valid.
+
+        :param max_age: (float) Maximum age of the snapshot in seconds, None for no limit
+        :param now: (float) Unix time to check against, default to now
+        :return: (bool) True if every cookie has expired, or the snapshot is older than `max_age`
+        """
+        now = now if now is not None else time.time()
+        if max_age is not None and now - self.saved_at > max_age:
+            return True
+        expires_at = self.expires_at
+        return expires_at is not None and expires_at <= now
+
+    def live_cookies(self, now: float = None) -> List[Dict[str, Any]]:
+        """
+        Cookies not expired yet, stripped down to the keys accepted when setting cookies.
+
+        :param now: (float) Unix time to check against, default to now
+        :return: (List[dict]) The cookies
+        """
+        now = now if now is not None else time.time()
+        cookies = []
+        for cookie in self.cookies:
+            expires = cookie.get("expires", -1)
+            if 0 < expires <= now:
+                continue
+            cookie = {k: v for k, v in cookie.items() if k in _COOKIE_PARAM_KEYS}
+            if expires <= 0:
+                cookie.pop("expires", None)
+            cookies.append(cookie)
+        return cookies
+
+    def to_dict(self) -> dict:
+        return {"origin": self.origin, "cookies": self.cookies, "local_storage": self.local_storage,
+                "session_storage": self.session_storage, "indexed_db": self.indexed_db, "saved_at": self.saved_at}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "SessionSnapshot":
+        return cls(origin=data["origin"], cookies=data.get("cookies"), local_storage=data.get("local_storage"),
+                   session_storage=data.get("session_storage"), indexed_db=data.get("indexed_db"),
+                   saved_at=data.get("saved_at"))
+
+    def __repr__(self):
+        return (f"SessionSnapshot(origin={self.origin!r}, n_cookies={len(self.cookies)}, "
+                f"n_local_storage={len(self.local_storage)}, n_indexed_db={len(self.indexed_db)})")
+
+
+class SessionStore(abc.ABC):
+    """
+    Persistent store of `SessionSnapshot`, by key (e.g. an account name).
+    """
+
+    @abc.abstractmethod
+    def save(self, key: str, snapshot: SessionSnapshot) -> None:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def _load(self, key: str) -> Union[SessionSnapshot, None]:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def load(self, key: str, max_age: float = None) -> Union[SessionSnapshot, None]:
+        """
+        Load a snapshot, unless it is missing or expired.
+
+        :param key: (str) Key of the snapshot
+        :param max_age: (float) Maximum age of the snapshot in seconds, None for no limit
+        :return: (SessionSnapshot) The snapshot, None if missing or expired
+        """
+        snapshot = self._load(key)
+        if snapshot is None or snapshot.is_expired(max_age=max_age):
+            return None
+        return snapshot
+
+
+class FileSessionStore(SessionStore):
+    """Store each snapshot as `<directory>/<key>.json`."""
+
+    def __init__(self, directory: Union[str, pathlib.Path]):
+        """
+        :param directory: (str, pathlib.Path) Directory of the snapshots, created if missing
+        """
+        self._directory = pathlib.Path(directory).expanduser()
+        self._directory.mkdir(parents=True, exist_ok=True)
+
+    def save(self, key: str, snapshot: SessionSnapshot) -> None:
+        path = self._path(key)
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(snapshot.to_dict()), encoding="utf-8")
+        tmp_path.replace(path)
+
+    def _load(self, key: str) -> Union[SessionSnapshot, None]:
+        path = self._path(key)
+        if not path.exists():
+            return None
+        return SessionSnapshot.from_dict(json.loads(path.read_text(encoding="utf-8")))
+
+    def delete(self, key: str) -> None:
+        self._path(key).unlink(missing_ok=True)
+
+    def _path(self, key: str) -> pathlib.Path:
+        if not key or "/" in key or "\\" in key or key.startswith("."):
+            raise ValueError(f"Invalid session key: {key!r}")
+        return self._directory / f"{key}.json"
+
+
+class SqliteSessionStore(SessionStore):
+    """Store the snapshots in one SQLite table, safe to share between processes."""
+
+    def __init__(self, path: Union[str, pathlib.Path]):
+        """
+        :param path: (str, pathlib.Path) Path of the SQLite database, created if missing
+        """
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(pathlib.Path(path).expanduser()), timeout=30, check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS sessions (key TEXT PRIMARY KEY, origin TEXT, saved_at REAL, "
+                         "expires_at REAL, data TEXT)")
+        self._db.commit()
+
+    def save(self, key: str, snapshot: SessionSnapshot) -> None:
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?, ?)",
+                             (key, snapshot.origin, snapshot.saved_at, snapshot.expires_at, json.dumps(snapshot.to_dict())))
+            self._db.commit()
+
+    def _load(self, key: str) -> Union[SessionSnapshot, None]:
+        with self._lock:
+            row = self._db.execute("SELECT data FROM sessions WHERE key = ?", (key,)).fetchone()
+        return None if row is None else SessionSnapshot.from_dict(json.loads(row[0]))
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM sessions WHERE key = ?", (key,))
+            self._db.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+__all__ = ["SessionSnapshot", "SessionStore", "FileSessionStore", "SqliteSessionStore"]
@@ -1,10 +1,12 @@
-from typing import Union
+from typing import Pattern, Union
 
 import playwright
 from playwright.async_api import async_playwright
 from gembox.debug_utils import Debugger
 
 from .._common.browser_manager import NoActivePageError
+from .._common.request_policy import RequestPolicy, RequestPolicyStats
+from .._common.response_tap import ResponseTap
 
 
 class SingleBrowserManager:
@@ -24,6 +26,9 @@ class SingleBrowserManager:
         self._browser: [playwright.async_api.Browser, None] = None
         self._context: [playwright.async_api.BrowserContext, None] = None
         self._page: [playwright.async_api.Page, None] = None
+        self._request_policy: Union[RequestPolicy, None] = None
+        self._active_request_policy: Union[RequestPolicy, None] = None
+        self._routed_page: Union[playwright.async_api.Page, None] = None
 
     @property
     def headless(self) -> bool:
@@ -59,6 +64,16 @@ class SingleBrowserManager:
         """the page"""
         return self._page
 
+    @property
+    def request_policy(self) -> Union[RequestPolicy, None]:
+        """default request policy, applied to navigations without their own policy"""
+        return self._request_policy
+
+    @property
+    def request_policy_stats(self) -> Union[RequestPolicyStats, None]:
+        """stats of the request policy of the current navigation, None if no policy is active"""
+        return None if self._active_request_policy is None else self._active_request_policy.stats
+
     @classmethod
     async def create(cls, headless=True, debug_tool: Debugger = None):
         wright = await (async_playwright().start())
@@ -92,11 +107,77 @@ class SingleBrowserManager:
         await self.close()
         await self.start()
 
-    async def go(self, url: str, **kwargs):
+    async def go(self, url: str, policy: RequestPolicy = None, **kwargs):
+        """
+        Go to the url.
+
+        :param url: (str) The url to go to
+        :param policy: (RequestPolicy) Request policy for this navigation, default to `request_policy`
+        """
         if self.page is None:
             raise NoActivePageError
+        await self._activate_request_policy(policy if policy is not None else self._request_policy)
         await self.page.goto(url=url, **kwargs)
 
+    async def set_request_policy(self, policy: Union[RequestPolicy, None]):
+        """
+        Set the default request policy, applied from now on and to every navigation without its own policy.
+
+        :param policy: (RequestPolicy) The policy, None to stop blocking requests
+        """
+        if self.page is None:
+            raise NoActivePageError
+        self._request_policy = policy
+        await self._activate_request_policy(policy)
+
+    async def tap_responses(self, *url_patterns: Union[str, Pattern], content_types: tuple = ("application/json",),
+                            resource_types: tuple = ("xhr", "fetch"), decode: str = "json",
+                            max_buffer: int = 256) -> ResponseTap:
+        """
+        Capture the bodies of the page's responses matching the patterns, see `ResponseTap`. Close the tap to stop.
+
+        :param url_patterns: (str, re.Pattern) Url patterns of the responses to keep, default to every url
+        :param content_types: (tuple) Content types to keep, as substrings of the Content-Type header
+        :param resource_types: (tuple) Resource types to keep, None for every resource type
+        :param decode: (str) "json", "text" or "bytes"
+        :param max_buffer: (int) Maximum number of captured responses waiting to be consumed
+        :return: (ResponseTap) The tap, an async iterator of `TappedResponse`
+        """
+        if self.page is None:
+            raise NoActivePageError
+        page = self.page
+        tap = ResponseTap(url_patterns=url_patterns, content_types=content_types, resource_types=resource_types,
+                          decode=decode, max_buffer=max_buffer, debug_tool=self._debug_tool)
+
+        def on_response(response: playwright.async_api.Response):
+            tap.offer(response.url, response.status, response.headers.get("content-type", ""),
+                      response.request.resource_type, response.body)
+
+        page.on("response", on_response)
+        tap.on_close(lambda: page.remove_listener("response", on_response))
+        return tap
+
+    async def _activate_request_policy(self, policy: Union[RequestPolicy, None]):
+        self._active_request_policy = policy
+        if policy is not None and self._routed_page is not self.page:
+            await self.page.route("**/*", self._on_route)
+            self.page.on("response", self._on_response)
+            self._routed_page = self.page
+
+    async def _on_route(self, route: playwright.async_api.Route):
+        policy = self._active_request_policy
+        request = route.request
+        if policy is None or policy.is_allowed(request.url, request.resource_type, page_url=self._routed_page.url):
+            await route.continue_()
+        else:
+            await route.abort("blockedbyclient")
+
+    def _on_response(self, response: playwright.async_api.Response):
+        policy = self._active_request_policy
+        content_length = response.headers.get("content-length")
+        if policy is not None and content_length is not None and content_length.isdigit():
+            policy.stats.record_response(response.url, response.request.resource_type, int(content_length))
+
     async def go_back(self, **kwargs):
         if self.page is None:
             raise NoActivePageError
@@ -1,4 +1,25 @@
 from ._main import PyppeteerAgent
+from .browser_pool import BrowserPool, PooledPage
+from .sharded_runner import ShardedAgentRunner, JobResult
+from .browser_daemon import BrowserDaemon, get_daemon_endpoint
+from .._common.request_policy import RequestPolicy, RequestRule
+from .._common.response_cache import DiskResponseCache
+from .._common.offline_extractor import OfflineExtractor
+from .._common.response_tap import ResponseTap, TappedResponse
+from .._common.session_store import SessionSnapshot, FileSessionStore, SqliteSessionStore
+from .handle_arena import HandleArena
+from .profiler import CdpProfiler, profile_label
+from .dom_snapshot import DomSnapshot
+from .tiered_fetcher import TieredFetcher, SiteRule, FetchResult
+from .http_session import BrowserHttpSession, HttpResponse, HttpStatusError
+from .memory_watchdog import MemoryWatchdog, MemorySample
+from .wait_strategy import WaitStrategy, FixedWait, LoadStateWait, NetworkIdleWait, SelectorWait, UrlChangeWait
 
 
-__all__ = ["PyppeteerAgent"]
+__all__ = ["PyppeteerAgent", "BrowserPool", "PooledPage", "ShardedAgentRunner", "JobResult", "BrowserDaemon",
+           "get_daemon_endpoint", "WaitStrategy", "FixedWait", "LoadStateWait", "NetworkIdleWait", "SelectorWait",
+           "UrlChangeWait", "RequestPolicy", "RequestRule", "DiskResponseCache", "SessionSnapshot", "FileSessionStore",
+           "SqliteSessionStore", "HandleArena", "CdpProfiler", "profile_label",
+           "DomSnapshot", "OfflineExtractor", "TieredFetcher", "SiteRule", "FetchResult",
+           "ResponseTap", "TappedResponse", "BrowserHttpSession", "HttpResponse", "HttpStatusError",
+           "MemoryWatchdog", "MemorySample"]
@@ -1,29 +1,49 @@
 import pathlib
-from typing import Union, List, Any
+from typing import Union, List, Any, AsyncIterator, Callable, Dict, Hashable, Pattern
 
+import pyppeteer.page
 import pyppeteer.element_handle
 from gembox.debug_utils import Debugger
 
 from .data_extractor import DataExtractor
 from .page_interactor import PageInteractor
 from .browser_manager import SinglePageBrowser
+from .wait_strategy import WaitStrategy
+from .handle_arena import HandleArena
+from .dom_snapshot import DomSnapshot
+from .http_session import BrowserHttpSession
+from .memory_watchdog import MemoryWatchdog
+from .profiler import CdpProfiler
+from .js_util.cdp_backend import CdpBackend
+from .js_util.helper_bundle import install_helper_bundle
+from .._common.request_policy import RequestPolicy
+from .._common.session_store import SessionStore
+from .._common.response_tap import ResponseTap
 
 
 class PyppeteerAgent:
     """
     Agent class for managing browser instances and page interactions.
     """
-    def __init__(self, headless=False, debug_tool: Debugger = None, interactor_config_path: Union[str, pathlib.Path] = None):
+    def __init__(self, headless=False, debug_tool: Debugger = None, interactor_config_path: Union[str, pathlib.Path] = None,
+                 browser_options: dict = None, browser_ws_endpoint: str = None):
         """
         :param headless: (bool) Whether to run the browser in headless mode
         :param debug_tool: (Debugger) Debugger instance for debugging
         :param interactor_config_path: (str, pathlib.Path) Path to the page interaction config file
+        :param browser_options: (dict) Extra options passed to `pyppeteer.launch`
+        :param browser_ws_endpoint: (str) If given, attach to this running browser instead of launching a new one,
+            `start()` and `stop()` then only open and close a page
         """
         self.debug_tool = debug_tool if debug_tool is not None else Debugger()
         self._interactor_config_path = interactor_config_path
-        self.browser_manager = SinglePageBrowser(headless=headless, debug_tool=self.debug_tool)
+        self.browser_manager = SinglePageBrowser(browser_options=browser_options, headless=headless,
+                                                 debug_tool=self.debug_tool, browser_ws_endpoint=browser_ws_endpoint)
         self.page_interactor: Union[PageInteractor, None] = None
         self.data_extractor: Union[DataExtractor, None] = None
+        self._profiler: Union[CdpProfiler, None] = None
+        self._cdp_backend: Union[CdpBackend, None] = None
+        self._memory_watchdog: Union[MemoryWatchdog, None] = None
 
     @property
     def interactor_config_path(self) -> Union[str, pathlib.Path]:
@@ -50,6 +70,7 @@ class PyppeteerAgent:
         self.debug_tool.debug(f"Starting PyppeteerAgent...")
         await self.browser_manager.start_browser()
         page = await self.browser_manager.get_page()
+        await install_helper_bundle(page)
         self.page_interactor = PageInteractor(page=page, debug_tool=self.debug_tool, config_path=self.interactor_config_path)
         self.data_extractor = DataExtractor(page=page, debug_tool=self.debug_tool)
         assert self.is_running is True, "Browser is not running successfully"
@@ -61,31 +82,168 @@ class PyppeteerAgent:
 
         :return: (None)
         """
+        await self.disable_memory_watchdog()
+        self.disable_profiling()
+        await self.disable_cdp_fast_path()
         await self.browser_manager.close_browser()
         self.page_interactor = None
         self.data_extractor = None
         assert self.is_running is False, "Browser is not closed successfully"
 
+    def handle_arena(self) -> HandleArena:
+        """
+        Create an arena releasing, on exit, every element handle created through the agent while it is active.
+
+        usage::
+
+            async with agent.handle_arena() as arena:
+                elements = await agent.scroll_load_selector("li.item")
+                ...
+
+        :return: (HandleArena) The arena, to use as an async context manager
+        """
+        # follow the page across recycles, see `enable_memory_watchdog`
+        return HandleArena(page=lambda: self.page_interactor._page, debug_tool=self.debug_tool)
+
+    def enable_profiling(self, profiler: CdpProfiler = None) -> CdpProfiler:
+        """
+        Record the latency of every CDP call of the page, grouped by agent method and CDP method.
+
+        Pass `CdpProfiler(count_bytes=True)` to also record payload sizes.
+
+        usage::
+
+            profiler = agent.enable_profiling()
+            ...
+            print(profiler.report())
+
+        :param profiler: (CdpProfiler) Profiler to record into, default to a new one
+        :return: (CdpProfiler) The profiler
+        """
+        if self._profiler is not None:
+            self._profiler.detach()
+        self._profiler = profiler if profiler is not None else CdpProfiler(debug_tool=self.debug_tool)
+        if self._cdp_backend is not None:
+            self._profiler.attach_session(self._cdp_backend.session)
+        return self._profiler.attach(self.page_interactor._page)
+
+    def disable_profiling(self) -> Union[CdpProfiler, None]:
+        """
+        Stop recording CDP calls, the recorded stats are kept in the profiler.
+
+        :return: (CdpProfiler) The profiler, None if profiling was not enabled
+        """
+        profiler, self._profiler = self._profiler, None
+        if profiler is not None:
+            profiler.detach()
+        return profiler
+
+    async def enable_cdp_fast_path(self) -> CdpBackend:
+        """
+        Send the javascript of the page interactor and data extractor straight through a dedicated CDP session, instead
+        of `page.evaluate`. Cheaper per call for hot primitives such as `get_scroll_top`, `scroll_by` or `count`.
+
+        :return: (CdpBackend) The backend
+        """
+        if self._cdp_backend is None or self._cdp_backend.is_closed:
+            self._cdp_backend = await CdpBackend.open(self.page_interactor._page, debug_tool=self.debug_tool)
+            if self._profiler is not None:
+                self._profiler.attach_session(self._cdp_backend.session)
+        self.page_interactor.set_cdp_backend(self._cdp_backend)
+        self.data_extractor.set_cdp_backend(self._cdp_backend)
+        return self._cdp_backend
+
+    async def disable_cdp_fast_path(self) -> None:
+        """
+        Go back to `page.evaluate`, and close the dedicated CDP session.
+        """
+        backend, self._cdp_backend = self._cdp_backend, None
+        if backend is None:
+            return
+        for executor in (self.page_interactor, self.data_extractor):
+            if executor is not None:
+                executor.set_cdp_backend(None)
+        await backend.close()
+
+    async def enable_memory_watchdog(self, interval: float = 10., max_js_heap_mb: float = None, max_nodes: int = None,
+                                     max_rss_mb: float = None, restart_rss_mb: float = None,
+                                     max_navigations: int = None, keep_session: bool = True) -> MemoryWatchdog:
+        """
+        Sample the browser's memory in the background, and recycle the page or restart the browser past thresholds,
+        carrying the session and the current url over. The agent moves to the new page by itself, see `MemoryWatchdog`.
+
+        usage::
+
+            watchdog = await agent.enable_memory_watchdog(max_js_heap_mb=512, max_navigations=200)
+            for url in urls:
+                async with watchdog.hold():
+                    await agent.go(url)
+                    ...
+
+        :param interval: (float) Seconds between two samples
+        :param max_js_heap_mb: (float) Recycle the page past this used JS heap, in MB
+        :param max_nodes: (int) Recycle the page past this number of DOM nodes
+        :param max_rss_mb: (float) Recycle the page past this resident memory of the browser, in MB
+        :param restart_rss_mb: (float) Restart the browser past this resident memory, in MB
+        :param max_navigations: (int) Recycle the page after this many navigations
+        :param keep_session: (bool) Carry the session and the current url over to the new page or browser
+        :return: (MemoryWatchdog) The running watchdog
+        """
+        await self.disable_memory_watchdog()
+        self._memory_watchdog = MemoryWatchdog(
+            browser_manager=self.browser_manager, interval=interval, max_js_heap_mb=max_js_heap_mb,
+            max_nodes=max_nodes, max_rss_mb=max_rss_mb, restart_rss_mb=restart_rss_mb,
+            max_navigations=max_navigations, keep_session=keep_session, on_recycle=self._rebind_page,
+            debug_tool=self.debug_tool)
+        return self._memory_watchdog.start()
+
+    async def disable_memory_watchdog(self) -> None:
+        """
+        Stop the memory watchdog, waiting for a recycle in progress to finish.
+        """
+        watchdog, self._memory_watchdog = self._memory_watchdog, None
+        if watchdog is not None:
+            await watchdog.stop()
+
+    async def _rebind_page(self, page: pyppeteer.page.Page) -> None:
+        """
+        Move the interactor, the extractor, the profiler and the CDP fast path to a new page. HTTP sessions and handle
+        arenas follow the interactor's page by themselves, and the browser manager moves the open response taps.
+        """
+        await install_helper_bundle(page)
+        self.page_interactor = PageInteractor(page=page, debug_tool=self.debug_tool, config_path=self.interactor_config_path)
+        self.data_extractor = DataExtractor(page=page, debug_tool=self.debug_tool)
+        if self._profiler is not None:
+            self._profiler.detach()
+            self._profiler.attach(page)
+        if self._cdp_backend is not None:
+            # the session of the old page is gone with it
+            await self._cdp_backend.close()
+            self._cdp_backend = None
+            await self.enable_cdp_fast_path()
+
     # Page interactions
-    async def click(self, selector: str, new_page: bool = False):
+    async def click(self, selector: str, new_page: bool = False, wait: WaitStrategy = None):
         """
         Click on the element specified by the selector.
 
         :param selector: (str) Selector for the element to click
         :param new_page: (bool) Whether to open a new page after clicking
+        :param wait: (WaitStrategy) When the click is done, e.g. `LoadStateWait()` instead of the fixed new page wait
         :return: (None)
         """
-        return await self.page_interactor.click(selector=selector, new_page=new_page)
+        return await self.page_interactor.click(selector=selector, new_page=new_page, wait=wait)
 
-    async def type_input(self, selector: str, text: str):
+    async def type_input(self, selector: str, text: str, wait: WaitStrategy = None):
         """
         Type text into an input element.
 
         :param selector: (str) Selector of the element to type into
         :param text: (str) Text to type
+        :param wait: (WaitStrategy) When the typing is done, None not to wait
         :return:
         """
-        return await self.page_interactor.type_input(selector=selector, text=text)
+        return await self.page_interactor.type_input(selector=selector, text=text, wait=wait)
 
     async def scroll_to_bottom(self, element: pyppeteer.element_handle.ElementHandle = None):
         """
@@ -125,7 +283,9 @@ class PyppeteerAgent:
         return await self.page_interactor.scroll_by(x_disp=x_disp, y_disp=y_disp, element=element)
 
     async def scroll_load(self, scroll_step: int = 400, load_wait: int = 40, same_th: int = 20,
-                          scroll_step_callbacks: List[callable] = None, element: pyppeteer.element_handle.ElementHandle = None):
+                          scroll_step_callbacks: List[callable] = None, element: pyppeteer.element_handle.ElementHandle = None,
+                          progress_callback: Callable[[dict], Any] = None, max_duration: int = None,
+                          adaptive: bool = False, settle_time: int = 300, max_wait: int = 5000) -> dict:
         """
         Scroll and load all contents, until no new content is loaded.
 
@@ -134,14 +294,24 @@ class PyppeteerAgent:
         :param same_th: (int) The threshold of the number of same scroll top to stop scrolling.
         :param scroll_step_callbacks: (List[Callable]) A callback function that will be called after each scroll.
         :param element: (ElementHandle) The element to scroll. If None, the method will scroll the page.
-        :return:
+        :param progress_callback: (Callable) Called with the progress of the scrolling, which runs inside the page
+        :param max_duration: (int) Stop after this many milliseconds, None for no limit
+        :param adaptive: (bool) Wait for DOM mutations and requests to settle after each scroll instead of `load_wait`
+        :param settle_time: (int) Adaptive mode only, how long the page must stay quiet to be settled, in milliseconds
+        :param max_wait: (int) Adaptive mode only, maximum wait per scroll, in milliseconds
+        :return: (dict) Summary: {"steps", "count", "top", "reason", "duration"}
         """
         return await self.page_interactor.scroll_load(scroll_step=scroll_step, load_wait=load_wait, same_th=same_th,
-                                                      scroll_step_callbacks=scroll_step_callbacks, element=element)
+                                                      scroll_step_callbacks=scroll_step_callbacks, element=element,
+                                                      progress_callback=progress_callback, max_duration=max_duration,
+                                                      adaptive=adaptive, settle_time=settle_time, max_wait=max_wait)
 
     async def scroll_load_selector(self, selector: str, threshold: int = None, scroll_step: int = 400, load_wait: int = 40,
                                    same_th: int = 20, scroll_step_callbacks: List[callable] = None, log_interval: int = 100,
-                                   element: pyppeteer.element_handle.ElementHandle = None) -> List[pyppeteer.element_handle.ElementHandle]:
+                                   element: pyppeteer.element_handle.ElementHandle = None,
+                                   progress_callback: Callable[[dict], Any] = None, max_duration: int = None,
+                                   adaptive: bool = False, settle_time: int = 300, max_wait: int = 5000) \
+            -> List[pyppeteer.element_handle.ElementHandle]:
         """
         Scroll and load all contents, until no new content is loaded or enough specific items are collected.
 
@@ -153,18 +323,132 @@ class PyppeteerAgent:
         :param scroll_step_callbacks: (List[Callable]) A callback function that will be called after each scroll.
         :param log_interval: (int) The interval of logging the number of elements loaded
         :param element: (ElementHandle) The element to scroll. If None, the method will scroll the page
+        :param progress_callback: (Callable) Called with the progress of the scrolling, which runs inside the page
+        :param max_duration: (int) Stop after this many milliseconds, None for no limit
+        :param adaptive: (bool) Wait for DOM mutations and requests to settle after each scroll instead of `load_wait`
+        :param settle_time: (int) Adaptive mode only, how long the page must stay quiet to be settled, in milliseconds
+        :param max_wait: (int) Adaptive mode only, maximum wait per scroll, in milliseconds
         :return: (int) The number of elements matching the selector
         """
         return await self.page_interactor.scroll_load_selector(selector=selector, threshold=threshold, scroll_step=scroll_step,
                                                                load_wait=load_wait, same_th=same_th, scroll_step_callbacks=scroll_step_callbacks,
-                                                               log_interval=log_interval, element=element)
+                                                               log_interval=log_interval, element=element,
+                                                               progress_callback=progress_callback, max_duration=max_duration,
+                                                               adaptive=adaptive, settle_time=settle_time, max_wait=max_wait)
+
+    def scroll_harvest(self, selector: str, extract: Union[dict, str] = None, key: Union[str, Callable[[Any], Hashable]] = None,
+                       scroll_step: int = 400, load_wait: int = 40, same_th: int = 20, max_items: int = None,
+                       element: pyppeteer.element_handle.ElementHandle = None) -> AsyncIterator[Any]:
+        """
+        Scroll and yield items matching the selector as soon as they appear, see `ScrollHandler.scroll_harvest`.
+
+        :param selector: (str) Selector of the items
+        :param extract: (dict, str) Schema of one item, or the source of a javascript function `(element) => value`.
+            Default to the item's text content
+        :param key: (str, Callable) Dedupe items by this field of the extracted value, or by the result of this function
+        :param scroll_step: (int) The number of pixels to scroll each time. If None, scroll to bottom.
+        :param load_wait: (int) The time to wait after each scroll, in milliseconds
+        :param same_th: (int) Stop after the scroll top is unchanged this many times in a row
+        :param max_items: (int) Stop after yielding this many items, None for no limit
+        :param element: (ElementHandle) The element to scroll. If None, the method will scroll the page.
+        :return: (AsyncIterator) The extracted items
+        """
+        return self.page_interactor.scroll_harvest(selector=selector, extract=extract, key=key, scroll_step=scroll_step,
+                                                   load_wait=load_wait, same_th=same_th, max_items=max_items, element=element)
 
     # Browser interactions
-    async def go_back(self):
-        return await self.browser_manager.go_back()
+    async def go_back(self, wait: WaitStrategy = None):
+        """
+        Go back to the previous page.
+
+        :param wait: (WaitStrategy) When the navigation is done, default to the `load` event
+        """
+        return await self.browser_manager.go_back(wait=wait)
+
+    async def go(self, url: str, policy: RequestPolicy = None, wait: WaitStrategy = None):
+        """
+        Go to the url.
+
+        :param url: (str) The url to go to
+        :param policy: (RequestPolicy) Request policy blocking resources for this navigation, see `set_request_policy`
+        :param wait: (WaitStrategy) When the navigation is done, e.g. `LoadStateWait("domcontentloaded")`
+        """
+        return await self.browser_manager.go(url=url, policy=policy, wait=wait)
+
+    async def tap_responses(self, *url_patterns: Union[str, Pattern], content_types: tuple = ("application/json",),
+                            resource_types: tuple = ("xhr", "fetch"), decode: str = "json",
+                            max_buffer: int = 256) -> ResponseTap:
+        """
+        Capture the decoded bodies of matching responses, e.g. a feed's JSON XHRs, while navigating or scrolling.
 
-    async def go(self, url: str):
-        return await self.browser_manager.go(url=url)
+        usage::
+
+            async with await agent.tap_responses("*/api/feed*") as tap:
+                async for response in tap.until(agent.scroll_load()):
+                    items.extend(response.body["items"])
+
+        :param url_patterns: (str, re.Pattern) Url patterns of the responses to keep, default to every url
+        :param content_types: (tuple) Content types to keep, as substrings of the Content-Type header
+        :param resource_types: (tuple) Resource types to keep, None for every resource type
+        :param decode: (str) "json", "text" or "bytes"
+        :param max_buffer: (int) Maximum number of captured responses waiting to be consumed
+        :return: (ResponseTap) The tap, see `ResponseTap`
+        """
+        return await self.browser_manager.tap_responses(*url_patterns, content_types=content_types,
+                                                        resource_types=resource_types, decode=decode,
+                                                        max_buffer=max_buffer)
+
+    def http_session(self, headers: Dict[str, str] = None, headers_js: str = None,
+                     reauthenticate: Callable[[], Any] = None, max_connections: int = 32,
+                     timeout: float = 30.) -> BrowserHttpSession:
+        """
+        Create a pooled HTTP client carrying the page's cookies, user agent and headers, to call the site's endpoints
+        directly once logged in, see `BrowserHttpSession`.
+
+        usage::
+
+            async with agent.http_session() as session:
+                items = await session.get_json("https://example.com/api/items")
+
+        :param headers: (dict) Extra headers sent with every request
+        :param headers_js: (str) Javascript expression evaluated in the page, giving more headers, e.g. a bearer token
+        :param reauthenticate: (Callable) Coroutine function logging in again through the browser, when the session
+            exported again is still refused
+        :param max_connections: (int) Maximum number of pooled connections
+        :param timeout: (float) Total timeout of a request, in seconds
+        :return: (BrowserHttpSession) The session, exported from the browser on first use
+        """
+        return BrowserHttpSession(page=lambda: self.page_interactor._page, headers=headers, headers_js=headers_js,
+                                  reauthenticate=reauthenticate, max_connections=max_connections, timeout=timeout,
+                                  debug_tool=self.debug_tool)
+
+    async def set_request_policy(self, policy: Union[RequestPolicy, None]):
+        """
+        Set the default request policy, e.g. `RequestPolicy.lightweight()` to block images, fonts and third-party scripts.
+
+        :param policy: (RequestPolicy) The policy, None to stop blocking requests
+        """
+        return await self.browser_manager.set_request_policy(policy=policy)
+
+    async def save_session(self, store: SessionStore, key: str):
+        """
+        Save the cookies and storage of the current origin, e.g. right after logging in.
+
+        :param store: (SessionStore) Where to save the session, e.g. `FileSessionStore("sessions")`
+        :param key: (str) Key of the session, e.g. the account name
+        """
+        return await self.browser_manager.save_session(store=store, key=key)
+
+    async def restore_session(self, store: SessionStore, key: str, max_age: float = None) -> bool:
+        """
+        Restore a saved session, call it right after `start()` and before the first `go()`.
+
+        :param store: (SessionStore) Where the session was saved
+        :param key: (str) Key of the session
+        :param max_age: (float) Maximum age of the session in seconds, None for no limit
+        :return: (bool) True if restored, False if the session is missing or expired
+        """
+        return await self.browser_manager.restore_session(store=store, key=key, max_age=max_age)
 
     # data extraction
     async def get_text(self, element: pyppeteer.element_handle.ElementHandle) -> str:
@@ -195,6 +479,34 @@ class PyppeteerAgent:
         """
         return await self.data_extractor.get_attr(element=element, attribute=attribute)
 
+    async def get_attrs(self, selector: str, attrs: Union[str, List[str]]) -> Union[List[str], List[Dict[str, str]]]:
+        """
+        Get attributes of all elements matching the selector, in one round trip.
+
+        :param selector: (str) Selector of the elements to get attributes from
+        :param attrs: (str, List[str]) Attribute, or list of attributes, to get
+        :return: (list) Value, or dict {attr: value}, for each element
+        """
+        return await self.data_extractor.get_attrs(selector=selector, attrs=attrs)
+
+    async def count(self, selector: str) -> int:
+        """
+        Count the elements matching the selector.
+
+        :param selector: (str) Selector of the elements to count
+        :return: (int) Number of elements matching the selector
+        """
+        return await self.data_extractor.count(selector=selector)
+
+    async def exists(self, selector: str) -> bool:
+        """
+        Check if any element matches the selector.
+
+        :param selector: (str) Selector of the elements to check
+        :return: (bool) True if at least one element matches the selector
+        """
+        return await self.data_extractor.exists(selector=selector)
+
     async def get_cls_list(self, element: pyppeteer.element_handle.ElementHandle) -> List[Any]:
         """
         Get classList of given element
@@ -213,6 +525,56 @@ class PyppeteerAgent:
         """
         return await self.data_extractor.has_cls(element=element, cls=cls)
 
+    async def has_cls_many(self, selector: str, cls: str) -> List[bool]:
+        """
+        Check, for all elements matching the selector, if they have given class, in one round trip.
+
+        :param selector: (str) Selector of the elements to check
+        :param cls: (str) Class to check
+        :return: (list) For each element matching the selector, True if it has given class
+        """
+        return await self.data_extractor.has_cls_many(selector=selector, cls=cls)
+
+    async def extract(self, schema: dict, root: pyppeteer.element_handle.ElementHandle = None) -> Union[List[dict], dict]:
+        """
+        Extract records described by a declarative schema, in one round trip, see `DataExtractor.extract`.
+
+        :param schema: (dict) The schema
+        :param root: (ElementHandle) Only extract under this element, default to the whole document
+        :return: (list) One dict per item matching the root selector, or a single dict if the schema has no root selector
+        """
+        return await self.data_extractor.extract(schema=schema, root=root)
+
+    async def get_html(self) -> str:
+        """
+        Get the HTML of the whole document, see `DataExtractor.get_html` and `OfflineExtractor`.
+
+        :return: (str) The serialized document
+        """
+        return await self.data_extractor.get_html()
+
+    async def snapshot(self, include_layout: bool = True) -> DomSnapshot:
+        """
+        Capture the whole document as columnar node tables, in a single CDP call, see `DataExtractor.snapshot`.
+
+        :param include_layout: (bool) Keep the layout boxes of the rendered nodes
+        :return: (DomSnapshot) The snapshot
+        """
+        return await self.data_extractor.snapshot(include_layout=include_layout)
+
+    def extract_stream(self, extract: Union[dict, str], selector: str = None,
+                       root: pyppeteer.element_handle.ElementHandle = None, chunk_size: int = 500) -> AsyncIterator[Any]:
+        """
+        Extract records in chunks, as an async iterator, see `DataExtractor.extract_stream`.
+
+        :param extract: (dict, str) Schema with a root selector, or the source of a javascript function `(element) => value`
+        :param selector: (str) Selector of the items, default to the schema's root selector
+        :param root: (ElementHandle) Only extract under this element, default to the whole document
+        :param chunk_size: (int) Number of records per round trip
+        :return: (AsyncIterator) The records, in document order
+        """
+        return self.data_extractor.extract_stream(extract=extract, selector=selector, root=root, chunk_size=chunk_size)
+
     async def __aenter__(self):
         await self.start()
         return self
@@ -0,0 +1,169 @@
+"""
+A small local daemon keeping a warm browser alive, so that short jobs attach to it instead of launching their own.
+
+Start it with::
+
+    python -m zephyrion.pypp.browser_daemon --port 9339
+
+then attach agents to it::
+
+    endpoint = await get_daemon_endpoint(port=9339)
+    async with PyppeteerAgent(browser_ws_endpoint=endpoint) as agent:
+        await agent.go("https://example.com")
+"""
+import json
+import asyncio
+import argparse
+from typing import Union
+
+import pyppeteer.browser
+from pyppeteer import launch
+from gembox.debug_utils import Debugger
+
+
+class BrowserDaemon:
+    """
+    Keep one browser running, and hand out its websocket endpoint over HTTP.
+
+    `GET /endpoint` answers `{"browserWSEndpoint": "ws://..."}`. If the browser dies, it is relaunched on the next
+    request, so clients always receive a live endpoint.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 9339, headless: bool = True, browser_options: dict = None,
+                 debug_tool: Debugger = None):
+        """
+        :param host: (str) Host the HTTP server listens on
+        :param port: (int) Port the HTTP server listens on
+        :param headless: (bool) Whether to run the browser in headless mode
+        :param browser_options: (dict) Extra options passed to `pyppeteer.launch`
+        :param debug_tool: (Debugger) Debugger instance for debugging
+        """
+        self._host = host
+        self._port = port
+        self._headless = headless
+        self._browser_options: dict = browser_options if browser_options is not None else {}
+        self._debug_tool = debug_tool if debug_tool is not None else Debugger()
+        self._browser: Union[pyppeteer.browser.Browser, None] = None
+        self._server: Union[asyncio.AbstractServer, None] = None
+        self._launch_lock = asyncio.Lock()
+
+    @property
+    def is_running(self) -> bool:
+        """whether the HTTP server is running"""
+        return self._server is not None
+
+    @property
+    def address(self) -> str:
+        """http address of the daemon"""
+        return f"http://{self._host}:{self._port}"
+
+    async def get_endpoint(self) -> str:
+        """
+        Get the websocket endpoint of the warm browser, (re)launching it if needed.
+
+        :return: (str) The `browserWSEndpoint` of the browser
+        """
+        async with self._launch_lock:
+            if self._browser is None:
+                self._debug_tool.info(f"BrowserDaemon: Launching browser...")
+                self._browser = await launch(headless=self._headless, **self._browser_options)
+                self._browser.on("disconnected", self._on_disconnected)
+                self._debug_tool.info(f"BrowserDaemon: Browser listening on {self._browser.wsEndpoint}")
+            return self._browser.wsEndpoint
+
+    def _on_disconnected(self):
+        self._debug_tool.warn(f"BrowserDaemon: Browser disconnected, it will be relaunched on the next request.")
+        self._browser = None
+
+    async def start(self) -> None:
+        if self.is_running:
+            self._debug_tool.warn(f"BrowserDaemon: Already running.")
+            return
+        await self.get_endpoint()
+        self._server = await asyncio.start_server(self._handle, host=self._host, port=self._port)
+        self._debug_tool.info(f"BrowserDaemon: Serving endpoints on {self.address}")
+
+    async def close(self) -> None:
+        if not self.is_running:
+            self._debug_tool.warn(f"BrowserDaemon: Not running, no need to close.")
+            return
+        self._server.close()
+        await self._server.wait_closed()
+        self._server = None
+        if self._browser is not None:
+            browser, self._browser = self._browser, None
+            browser.remove_listener("disconnected", self._on_disconnected)
+            await browser.close()
+
+    async def serve_forever(self) -> None:
+        await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            if self.is_running:
+                await self.close()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = await reader.readline()
+            # skip the headers, the daemon does not need them
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            parts = request_line.decode("latin-1").split()
+            if len(parts) >= 2 and parts[0] == "GET" and parts[1] == "/endpoint":
+                status, body = "200 OK", {"browserWSEndpoint": await self.get_endpoint()}
+            else:
+                status, body = "404 Not Found", {"error": "only `GET /endpoint` is supported"}
+            payload = json.dumps(body).encode()
+            writer.write(f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+                         f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode() + payload)
+            await writer.drain()
+        except Exception as e:
+            self._debug_tool.error(f"BrowserDaemon: Failed to handle request: {e}")
+        finally:
+            writer.close()
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+
+async def get_daemon_endpoint(host: str = "127.0.0.1", port: int = 9339) -> str:
+    """
+    Ask a running `BrowserDaemon` for the websocket endpoint of its browser.
+
+    :param host: (str) Host of the daemon
+    :param port: (int) Port of the daemon
+    :return: (str) The `browserWSEndpoint` to attach to
+    """
+    reader, writer = await asyncio.open_connection(host=host, port=port)
+    try:
+        writer.write(f"GET /endpoint HTTP/1.1\r\nHost: {host}:{port}\r\nConnection: close\r\n\r\n".encode())
+        await writer.drain()
+        response = await reader.read()
+    finally:
+        writer.close()
+    head, _, body = response.partition(b"\r\n\r\n")
+    if not head.startswith(b"HTTP/1.1 200"):
+        raise ConnectionError(f"BrowserDaemon at {host}:{port} answered: {head.splitlines()[0] if head else b''}")
+    return json.loads(body)["browserWSEndpoint"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Keep a warm browser alive and serve its websocket endpoint.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9339)
+    parser.add_argument("--headful", action="store_true", help="run the browser with a window")
+    args = parser.parse_args()
+    daemon = BrowserDaemon(host=args.host, port=args.port, headless=not args.headful)
+    asyncio.run(daemon.serve_forever())
+
+
+__all__ = ["BrowserDaemon", "get_daemon_endpoint"]
+
+
+if __name__ == "__main__":
+    main()
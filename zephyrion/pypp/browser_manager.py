@@ -1,12 +1,22 @@
-from typing import Union
+import asyncio
+from typing import Any, Callable, Dict, Pattern, Tuple, Union
 from functools import wraps
 
 import pyppeteer.page
 import pyppeteer.browser
-from pyppeteer import launch
+import pyppeteer.network_manager
+from pyppeteer import launch, connect
 from gembox.debug_utils import Debugger
 
-from .._common.browser_manager import NoActivePageError, NonSingletonError
+from .page_registry import PageRegistry
+from .wait_strategy import WaitStrategy
+from .session import capture_session, restore_session
+from .cache_interceptor import CacheInterceptor
+from .._common.browser_manager import NoActivePageError
+from .._common.request_policy import RequestPolicy, RequestPolicyStats
+from .._common.response_cache import DiskResponseCache, ResponseCacheStats
+from .._common.response_tap import ResponseTap
+from .._common.session_store import SessionStore, SessionSnapshot
 
 
 def ensure_the_page(func):
@@ -30,9 +40,13 @@ class SinglePageBrowser:
 
     To avoid troubles, **only one browser instance** is allowed to run at a time,
     and **only one page** is allowed to be used.
+
+    If `browser_ws_endpoint` is given, the manager attaches to that already-running browser instead of launching one:
+    `start_browser` only opens a new page (target) and `close_browser` only closes that page and disconnects, leaving
+    the browser process alive for the next job. See `BrowserDaemon` for keeping a warm browser around.
     """
 
-    def __init__(self, browser_options=None, headless=True, debug_tool=None):
+    def __init__(self, browser_options=None, headless=True, debug_tool=None, browser_ws_endpoint: str = None):
         self._is_running: bool = False
         """whether browser is running"""
         self._browser: Union[pyppeteer.browser.Browser, None] = None
@@ -41,6 +55,22 @@ class SinglePageBrowser:
         """whether browser is headless"""
         self._browser_options: dict = browser_options if browser_options is not None else {}
         self._debug_tool = debug_tool if debug_tool is not None else Debugger()
+        self._browser_ws_endpoint: Union[str, None] = browser_ws_endpoint
+        """websocket endpoint of the browser to attach to, None to launch a new browser"""
+        self._attached_page: Union[pyppeteer.page.Page, None] = None
+        """the page opened by this manager, only used when attached to an existing browser"""
+        self._page_registry: Union[PageRegistry, None] = None
+        """event-driven registry of the open pages, only used when the browser is launched by this manager"""
+        self._request_policy: Union[RequestPolicy, None] = None
+        """default request policy, applied to navigations without their own policy"""
+        self._active_request_policy: Union[RequestPolicy, None] = None
+        """request policy of the current navigation"""
+        self._intercepted_page: Union[pyppeteer.page.Page, None] = None
+        """the page on which request interception is installed"""
+        self._cache_interceptor: Union[CacheInterceptor, None] = None
+        """interceptor serving requests from the response cache, None if the cache is disabled"""
+        self._taps: Dict[ResponseTap, Tuple[pyppeteer.page.Page, Callable]] = {}
+        """open response taps, with the page they listen to and their listener, moved along when the page is replaced"""
 
     @property
     def is_running(self) -> bool:
@@ -52,36 +82,153 @@ class SinglePageBrowser:
         """whether browser is headless"""
         return self._headless
 
+    @property
+    def request_policy(self) -> Union[RequestPolicy, None]:
+        """default request policy, applied to navigations without their own policy"""
+        return self._request_policy
+
+    @property
+    def request_policy_stats(self) -> Union[RequestPolicyStats, None]:
+        """stats of the request policy of the current navigation, None if no policy is active"""
+        return None if self._active_request_policy is None else self._active_request_policy.stats
+
+    @property
+    def response_cache_stats(self) -> Union[ResponseCacheStats, None]:
+        """stats of the response cache, None if the cache is disabled"""
+        return None if self._cache_interceptor is None else self._cache_interceptor.cache.stats
+
+    @property
+    def browser_pid(self) -> Union[int, None]:
+        """process id of the browser, None if it is not running or not launched by this manager"""
+        if self._browser is None or self._browser.process is None:
+            return None
+        return self._browser.process.pid
+
+    @property
+    def is_attached(self) -> bool:
+        """whether the manager attaches to an existing browser instead of launching one"""
+        return self._browser_ws_endpoint is not None
+
     async def get_page(self) -> Union[pyppeteer.page.Page, None]:
         """get the active only page, if more than one pages are found, raise error"""
         if not self.is_running:
             return None
-        pages = await self._browser.pages()
-        if len(pages) == 0:
-            return None
-        if len(pages) == 1:
-            return pages[0]
-        raise NonSingletonError(f"Only one page is allowed to be used, but {len(pages)} pages are found")
+        if self.is_attached:
+            # other clients may own other pages of a shared browser, only our own page counts
+            if self._attached_page is None or self._attached_page.isClosed():
+                return None
+            return self._attached_page
+        return await self._page_registry.get_only_page()
+
+    def on_disconnected(self, callback: Callable[[], Any]) -> None:
+        """
+        Register a function called when the connection to the running browser is lost, e.g. when the browser crashed.
+        Registrations do not carry over a restart.
+
+        :param callback: (Callable) The function, called without arguments
+        """
+        if self._browser is None:
+            raise RuntimeError("Browser: Not running, start it before watching for disconnects")
+        self._browser.on("disconnected", callback)
 
     async def start_browser(self) -> None:
         page = await self.get_page()
         if page is not None and self._is_running:
             self._debug_tool.warn(f"Browser: Already running.")
+        elif self.is_attached:
+            self._browser = await connect(browserWSEndpoint=self._browser_ws_endpoint, **self._browser_options)
+            self._attached_page = await self._browser.newPage()
+            self._is_running = True
         else:
             self._browser = await launch(headless=self._headless, **self._browser_options)
+            self._page_registry = PageRegistry(self._browser)
+            self._page_registry.attach()
             self._is_running = True
 
     async def close_browser(self) -> None:
         if not self._is_running or not self._browser:
             self._debug_tool.warn(f"Browser: Not running, no need to close.")
+        elif self.is_attached:
+            if not self._attached_page.isClosed():
+                await self._attached_page.close()
+            await self._browser.disconnect()
+            self._attached_page = None
+            self._browser = None
+            self._is_running = False
         else:
+            self._page_registry.detach()
+            self._page_registry = None
             await self._browser.close()
             self._browser = None
             self._is_running = False
 
-    async def restart_browser(self) -> None:
+    async def restart_browser(self, keep_session: bool = False) -> None:
+        """
+        Close and start the browser again.
+
+        :param keep_session: (bool) Carry the cookies (of every domain) and the storage of the current origin over to
+            the new browser, and go back to the current url
+        """
+        snapshot, url = await self._capture_for_resume(keep_session, all_cookies=True)
         await self.close_browser()
         await self.start_browser()
+        page = await self.get_page()
+        if page is not None:
+            await self._resume(page, snapshot, url)
+
+    async def recycle_page(self, keep_session: bool = True) -> pyppeteer.page.Page:
+        """
+        Replace the page by a fresh target of the same browser, releasing the memory the renderer of the old one kept
+        (detached DOM, leaked listeners and closures). The old page is emptied, garbage collected and closed.
+
+        Open response taps move to the new page, other listeners registered on the old page are not carried over.
+
+        :param keep_session: (bool) Carry the storage of the current origin over, sessionStorage being per tab, and go
+            back to the current url. Cookies are kept by the browser anyway
+        :return: (pyppeteer.page.Page) The new page
+        """
+        old = await self.get_page()
+        if old is None:
+            raise NoActivePageError()
+        snapshot, url = await self._capture_for_resume(keep_session, all_cookies=False)
+        try:
+            await old.goto("about:blank")
+            await old._client.send("HeapProfiler.collectGarbage")
+        except Exception as e:
+            self._debug_tool.warn(f"Browser: Failed to empty the page before recycling it: {e}")
+        if not self.is_attached:
+            # open the new page before closing the old one, the browser exits with its last page
+            self._page_registry.discard(old)
+        page = await self._browser.newPage()
+        if self.is_attached:
+            self._attached_page = page
+        if self._intercepted_page is old:
+            self._intercepted_page = None
+        await old.close()
+        self._debug_tool.info(f"Browser: Recycled the page")
+        await self._resume(page, snapshot, url)
+        return page
+
+    async def _capture_for_resume(self, keep_session: bool, all_cookies: bool) \
+            -> Tuple[Union[SessionSnapshot, None], Union[str, None]]:
+        page = await self.get_page()
+        if not keep_session or page is None or not page.url.startswith("http"):
+            return None, None
+        return await capture_session(page, all_cookies=all_cookies), page.url
+
+    async def _resume(self, page: pyppeteer.page.Page, snapshot: Union[SessionSnapshot, None],
+                      url: Union[str, None]) -> None:
+        """Set a new page up like the one it replaces."""
+        for tap, (old_page, listener) in list(self._taps.items()):
+            old_page.remove_listener("response", listener)
+            page.on("response", listener)
+            self._taps[tap] = (page, listener)
+        if self._cache_interceptor is not None:
+            await self._cache_interceptor.attach(page)
+        if snapshot is not None:
+            await restore_session(page, snapshot)
+        if url is not None:
+            await self.go(url, page=page)
 
     @ensure_the_page
     async def get_url(self, page: pyppeteer.page.Page) -> str:
@@ -102,14 +249,160 @@ class SinglePageBrowser:
         return await self.get_cookies(page=page)
 
     @ensure_the_page
-    async def go_back(self, page: pyppeteer.page.Page) -> None:
+    async def save_session(self, store: SessionStore, key: str, page: pyppeteer.page.Page, all_cookies: bool = False) -> SessionSnapshot:
+        """
+        Save the cookies and storage of the current origin, to skip the login flow next time with `restore_session`.
+
+        :param store: (SessionStore) Where to save the session
+        :param key: (str) Key of the session, e.g. the account name
+        :param all_cookies: (bool) Whether to save the cookies of every domain, instead of those of the current url
+        :return: (SessionSnapshot) The saved snapshot
+        """
+        snapshot = await capture_session(page, all_cookies=all_cookies)
+        store.save(key, snapshot)
+        self._debug_tool.info(f"Browser: Saved session {key} of {snapshot.origin}")
+        return snapshot
+
+    @ensure_the_page
+    async def restore_session(self, store: SessionStore, key: str, page: pyppeteer.page.Page, max_age: float = None) -> bool:
+        """
+        Restore a saved session, call it **before** navigating to the session's origin.
+
+        :param store: (SessionStore) Where the session was saved
+        :param key: (str) Key of the session
+        :param max_age: (float) Maximum age of the session in seconds, None for no limit
+        :return: (bool) True if restored, False if the session is missing or expired
+        """
+        snapshot = store.load(key, max_age=max_age)
+        if snapshot is None:
+            self._debug_tool.info(f"Browser: No valid session {key} to restore")
+            return False
+        await restore_session(page, snapshot)
+        self._debug_tool.info(f"Browser: Restored session {key} of {snapshot.origin}")
+        return True
+
+    @ensure_the_page
+    async def go_back(self, page: pyppeteer.page.Page, wait: WaitStrategy = None) -> None:
+        """
+        Go back to the previous page.
+
+        :param wait: (WaitStrategy) When the navigation is done, default to the `load` event
+        """
         self._debug_tool.info(f"Browser: Go back")
-        await page.goBack()
+        if wait is None:
+            await page.goBack()
+        else:
+            await wait.run(page, lambda: page.goBack(waitUntil=wait.wait_until), navigation=True)
 
     @ensure_the_page
-    async def go(self, url, page: pyppeteer.page.Page) -> None:
+    async def go(self, url, page: pyppeteer.page.Page, policy: RequestPolicy = None, wait: WaitStrategy = None) -> None:
+        """
+        Go to the url.
+
+        :param url: (str) The url to go to
+        :param policy: (RequestPolicy) Request policy for this navigation, default to `request_policy`
+        :param wait: (WaitStrategy) When the navigation is done, default to the `load` event
+        """
         self._debug_tool.info(f"Browser: Go to {url}")
-        await page.goto(url)
+        await self._activate_request_policy(policy if policy is not None else self._request_policy, page=page)
+        if self._active_request_policy is not None:
+            self._active_request_policy.stats.reset()
+        if wait is None:
+            await page.goto(url)
+        else:
+            await wait.run(page, lambda: page.goto(url, waitUntil=wait.wait_until), navigation=True)
+
+    @ensure_the_page
+    async def set_request_policy(self, policy: Union[RequestPolicy, None], page: pyppeteer.page.Page) -> None:
+        """
+        Set the default request policy, applied from now on and to every navigation without its own policy.
+
+        :param policy: (RequestPolicy) The policy, None to stop blocking requests
+        """
+        self._request_policy = policy
+        await self._activate_request_policy(policy, page=page)
+
+    @ensure_the_page
+    async def enable_response_cache(self, cache: DiskResponseCache, page: pyppeteer.page.Page) -> None:
+        """
+        Serve the requests of the page from a persistent response cache, see `CacheInterceptor`.
+
+        :param cache: (DiskResponseCache) The cache, which may be shared with other browsers and runs
+        """
+        await self.disable_response_cache()
+        self._cache_interceptor = CacheInterceptor(cache=cache, debug_tool=self._debug_tool)
+        await self._cache_interceptor.attach(page)
+
+    async def disable_response_cache(self) -> None:
+        """Stop serving requests from the response cache."""
+        if self._cache_interceptor is not None:
+            await self._cache_interceptor.detach()
+            self._cache_interceptor = None
+
+    @ensure_the_page
+    async def tap_responses(self, *url_patterns: Union[str, Pattern], page: pyppeteer.page.Page,
+                            content_types: tuple = ("application/json",), resource_types: tuple = ("xhr", "fetch"),
+                            decode: str = "json", max_buffer: int = 256) -> ResponseTap:
+        """
+        Capture the bodies of the page's responses matching the patterns, see `ResponseTap`. Close the tap to stop.
+
+        :param url_patterns: (str, re.Pattern) Url patterns of the responses to keep, default to every url
+        :param content_types: (tuple) Content types to keep, as substrings of the Content-Type header
+        :param resource_types: (tuple) Resource types to keep, None for every resource type
+        :param decode: (str) "json", "text" or "bytes"
+        :param max_buffer: (int) Maximum number of captured responses waiting to be consumed
+        :return: (ResponseTap) The tap, an async iterator of `TappedResponse`
+        """
+        tap = ResponseTap(url_patterns=url_patterns, content_types=content_types, resource_types=resource_types,
+                          decode=decode, max_buffer=max_buffer, debug_tool=self._debug_tool)
+
+        def on_response(response: pyppeteer.network_manager.Response) -> None:
+            tap.offer(response.url, response.status, response.headers.get("content-type", ""),
+                      response.request.resourceType, response.buffer)
+
+        page.on("response", on_response)
+        self._taps[tap] = (page, on_response)
+        tap.on_close(lambda: self._detach_tap(tap))
+        return tap
+
+    def _detach_tap(self, tap: ResponseTap) -> None:
+        page, listener = self._taps.pop(tap, (None, None))
+        if page is not None:
+            page.remove_listener("response", listener)
+
+    async def _activate_request_policy(self, policy: Union[RequestPolicy, None], page: pyppeteer.page.Page) -> None:
+        self._active_request_policy = policy
+        # interception disables the browser cache, so it is only installed while a policy is active
+        if self._intercepted_page is not None and (policy is None or self._intercepted_page is not page):
+            await self._stop_request_interception()
+        if policy is not None and self._intercepted_page is None:
+            await page.setRequestInterception(True)
+            page.on("request", self._on_request)
+            page.on("response", self._on_response)
+            self._intercepted_page = page
+
+    async def _stop_request_interception(self) -> None:
+        page = self._intercepted_page
+        try:
+            await page.setRequestInterception(False)
+        except Exception as e:
+            self._debug_tool.warn(f"Browser: Failed to stop request interception: {e}")
+        page.remove_listener("request", self._on_request)
+        page.remove_listener("response", self._on_response)
+        self._intercepted_page = None
+
+    def _on_request(self, request: pyppeteer.network_manager.Request) -> None:
+        policy = self._active_request_policy
+        if policy is None or policy.is_allowed(request.url, request.resourceType, page_url=self._intercepted_page.url):
+            asyncio.ensure_future(request.continue_())
+        else:
+            asyncio.ensure_future(request.abort("blockedbyclient"))
+
+    def _on_response(self, response: pyppeteer.network_manager.Response) -> None:
+        policy = self._active_request_policy
+        content_length = response.headers.get("content-length")
+        if policy is not None and content_length is not None and content_length.isdigit():
+            policy.stats.record_response(response.url, response.request.resourceType, int(content_length))
 
 
 __all__ = ["SinglePageBrowser"]
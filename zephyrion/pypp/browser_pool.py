@@ -0,0 +1,268 @@
+import asyncio
+import pathlib
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Deque, Union, List
+
+import pyppeteer.page
+import pyppeteer.browser
+from pyppeteer import launch
+from gembox.debug_utils import Debugger
+
+from .data_extractor import DataExtractor
+from .page_interactor import PageInteractor
+from .._common.browser_manager import BrowserNotRunningError
+
+
+class PooledPage:
+    """
+    A page leased from a `BrowserPool`.
+
+    Every pooled page lives in its own incognito browser context, and owns its own `PageInteractor` and `DataExtractor`.
+    """
+    def __init__(self, page: pyppeteer.page.Page, context: pyppeteer.browser.BrowserContext, debug_tool: Debugger = None,
+                 interactor_config_path: Union[str, pathlib.Path] = None):
+        """
+        :param page: (pyppeteer.page.Page) The underlying page
+        :param context: (pyppeteer.browser.BrowserContext) The incognito context owning the page
+        :param debug_tool: (Debugger) Debugger instance for debugging
+        :param interactor_config_path: (str, pathlib.Path) Path to the page interaction config file
+        """
+        self._page = page
+        self._context = context
+        self._debug_tool = debug_tool if debug_tool is not None else Debugger()
+        self.page_interactor = PageInteractor(page=page, debug_tool=self._debug_tool, config_path=interactor_config_path)
+        self.data_extractor = DataExtractor(page=page, debug_tool=self._debug_tool)
+
+    @property
+    def page(self) -> pyppeteer.page.Page:
+        """the underlying page"""
+        return self._page
+
+    @property
+    def context(self) -> pyppeteer.browser.BrowserContext:
+        """the incognito context owning the page"""
+        return self._context
+
+    @property
+    def url(self) -> str:
+        """Return the current url of the page."""
+        return self._page.url
+
+    async def go(self, url: str) -> None:
+        self._debug_tool.info(f"Pooled page: Go to {url}")
+        await self._page.goto(url)
+
+    async def go_back(self) -> None:
+        self._debug_tool.info(f"Pooled page: Go back")
+        await self._page.goBack()
+
+    def __str__(self):
+        return f"PooledPage(url={self.url})"
+
+    def __repr__(self):
+        return self.__str__()
+
+
+class BrowserPool:
+    """
+    A pool of pages running in **one** browser instance.
+
+    Unlike `SinglePageBrowser`, the pool keeps `size` pages alive in the same Chromium process, each page in its own
+    incognito context. Pages are leased with `async with pool.lease() as pooled_page:`, and reset to a clean state
+    (fresh context, no cookies, no storage) when they are returned.
+
+    Usage::
+
+        async with BrowserPool(size=8) as pool:
+            async with pool.lease() as pooled_page:
+                await pooled_page.go("https://example.com")
+                texts = await pooled_page.data_extractor.get_texts("h1")
+    """
+
+    def __init__(self, size: int = 8, browser_options=None, headless=True, debug_tool: Debugger = None,
+                 interactor_config_path: Union[str, pathlib.Path] = None):
+        """
+        :param size: (int) Number of pages kept in the pool
+        :param browser_options: (dict) Extra options passed to `pyppeteer.launch`
+        :param headless: (bool) Whether to run the browser in headless mode
+        :param debug_tool: (Debugger) Debugger instance for debugging
+        :param interactor_config_path: (str, pathlib.Path) Path to the page interaction config file
+        """
+        if size < 1:
+            raise ValueError(f"size should be a positive integer, got {size}")
+        self._size: int = size
+        self._is_running: bool = False
+        """whether browser is running"""
+        self._browser: Union[pyppeteer.browser.Browser, None] = None
+        """The browser instance shared by all pages"""
+        self._headless: bool = headless
+        """whether browser is headless"""
+        self._browser_options: dict = browser_options if browser_options is not None else {}
+        self._debug_tool = debug_tool if debug_tool is not None else Debugger()
+        self._interactor_config_path = interactor_config_path
+        self._idle: Deque[PooledPage] = deque()
+        """idle pooled pages, waiting to be leased"""
+        self._available: Union[asyncio.Condition, None] = None
+        """notified when a page is returned, a page goes missing, or the pool closes"""
+        self._leased: List[PooledPage] = []
+        """pooled pages currently leased"""
+        self._n_missing: int = 0
+        """pages that failed to be replaced on release, created again by `acquire`"""
+
+    @property
+    def size(self) -> int:
+        """number of pages kept in the pool"""
+        return self._size
+
+    @property
+    def is_running(self) -> bool:
+        """whether browser is running"""
+        return self._is_running
+
+    @property
+    def headless(self) -> bool:
+        """whether browser is headless"""
+        return self._headless
+
+    @property
+    def n_idle(self) -> int:
+        """number of pages waiting to be leased"""
+        return len(self._idle)
+
+    @property
+    def n_leased(self) -> int:
+        """number of pages currently leased"""
+        return len(self._leased)
+
+    @property
+    def n_missing(self) -> int:
+        """number of pages that failed to be replaced on release, and are not created again yet"""
+        return self._n_missing
+
+    async def start(self) -> None:
+        if self._is_running:
+            self._debug_tool.warn(f"BrowserPool: Already running.")
+            return
+        self._debug_tool.info(f"BrowserPool: Starting browser with {self._size} pages...")
+        self._browser = await launch(headless=self._headless, **self._browser_options)
+        self._available = asyncio.Condition()
+        pooled_pages = await asyncio.gather(*[self._new_pooled_page() for _ in range(self._size)])
+        self._idle = deque(pooled_pages)
+        self._is_running = True
+        self._debug_tool.info(f"BrowserPool: Started successfully.")
+
+    async def close(self) -> None:
+        if not self._is_running or not self._browser:
+            self._debug_tool.warn(f"BrowserPool: Not running, no need to close.")
+            return
+        self._is_running = False
+        # the waiting `acquire` calls raise `BrowserNotRunningError`
+        async with self._available:
+            self._available.notify_all()
+        await self._browser.close()
+        self._browser = None
+        self._idle = deque()
+        self._leased = []
+        self._n_missing = 0
+        self._debug_tool.info(f"BrowserPool: Closed successfully.")
+
+    async def acquire(self) -> PooledPage:
+        """
+        Lease a page from the pool, waiting until one is idle.
+
+        Prefer `lease()`, which always returns the page to the pool.
+
+        Pages that failed to be replaced on release are created again here, when no page is idle, so failures surface
+        to the caller instead of shrinking the pool.
+
+        :return: (PooledPage) The leased page
+        :raise BrowserNotRunningError: If the pool is not running, or closes while waiting
+        """
+        if not self._is_running:
+            raise BrowserNotRunningError()
+        async with self._available:
+            while self._is_running and not self._idle and self._n_missing == 0:
+                await self._available.wait()
+            if not self._is_running:
+                raise BrowserNotRunningError()
+            pooled_page = self._idle.popleft() if self._idle else None
+            if pooled_page is None:
+                self._n_missing -= 1
+        if pooled_page is None:
+            try:
+                pooled_page = await self._new_pooled_page()
+            except Exception:
+                async with self._available:
+                    self._n_missing += 1
+                    # let another waiter try again
+                    self._available.notify()
+                raise
+        self._leased.append(pooled_page)
+        return pooled_page
+
+    async def release(self, pooled_page: PooledPage) -> None:
+        """
+        Return a leased page to the pool.
+
+        The page's incognito context is discarded, and a fresh one takes its place, so that the next lease starts from
+        a clean state.
+
+        :param pooled_page: (PooledPage) The page to return, returning a page to a closed pool does nothing
+        """
+        if not self._is_running:
+            return
+        if pooled_page not in self._leased:
+            raise ValueError(f"{pooled_page} is not leased from this pool")
+        self._leased.remove(pooled_page)
+        try:
+            await pooled_page.context.close()
+        except Exception as e:
+            self._debug_tool.warn(f"BrowserPool: Failed to close context of {pooled_page}: {e}")
+        try:
+            new_page = await self._new_pooled_page()
+        except Exception as e:
+            # e.g. a transient CDP error, a waiting or later `acquire` creates the page again
+            new_page = None
+            self._debug_tool.warn(f"BrowserPool: Failed to replace {pooled_page}: {e}")
+        if not self._is_running:
+            return
+        async with self._available:
+            if new_page is None:
+                self._n_missing += 1
+            else:
+                self._idle.append(new_page)
+            self._available.notify()
+
+    @asynccontextmanager
+    async def lease(self):
+        """
+        Lease a page from the pool for the duration of the `async with` block.
+
+        :return: (PooledPage) The leased page
+        """
+        pooled_page = await self.acquire()
+        try:
+            yield pooled_page
+        finally:
+            await self.release(pooled_page)
+
+    async def _new_pooled_page(self) -> PooledPage:
+        context = await self._browser.createIncognitoBrowserContext()
+        try:
+            page = await context.newPage()
+        except Exception:
+            await context.close()
+            raise
+        return PooledPage(page=page, context=context, debug_tool=self._debug_tool,
+                          interactor_config_path=self._interactor_config_path)
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+
+__all__ = ["BrowserPool", "PooledPage"]
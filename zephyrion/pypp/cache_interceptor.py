@@ -0,0 +1,105 @@
+import base64
+import asyncio
+from typing import Union
+
+import pyppeteer.page
+from pyppeteer.connection import CDPSession
+from gembox.debug_utils import Debugger
+
+from .._common.response_cache import DiskResponseCache
+
+
+class CacheInterceptor:
+    """
+    Serve requests of a page from a `DiskResponseCache`, through the CDP `Fetch` domain.
+
+    Requests are paused at the request stage: fresh cache hits are answered with `Fetch.fulfillRequest` and never reach
+    the network. Cacheable misses are paused again at the response stage, where their body is stored. Only urls matching
+    the cache's TTL rules are paused, and the cache's disk IO runs in the default executor.
+
+    **Note**: the `Fetch` domain requires Chromium 74+, pass a recent `executablePath` in the browser options if the
+    bundled Chromium of pyppeteer is older.
+    """
+
+    def __init__(self, cache: DiskResponseCache, debug_tool: Debugger = None):
+        """
+        :param cache: (DiskResponseCache) The cache to serve from and store to
+        :param debug_tool: (Debugger) Debugger instance for debugging
+        """
+        self._cache = cache
+        self._debug_tool = debug_tool if debug_tool is not None else Debugger()
+        self._session: Union[CDPSession, None] = None
+
+    @property
+    def cache(self) -> DiskResponseCache:
+        """the underlying cache"""
+        return self._cache
+
+    @property
+    def is_attached(self) -> bool:
+        """whether the interceptor is attached to a page"""
+        return self._session is not None
+
+    async def attach(self, page: pyppeteer.page.Page) -> None:
+        """
+        Start intercepting the requests of the page.
+
+        :param page: (pyppeteer.page.Page) The page to intercept
+        """
+        if self.is_attached:
+            await self.detach()
+        wildcards = self._cache.url_wildcards()
+        if wildcards is None:
+            self._debug_tool.warn("CacheInterceptor: The cache has no TTL rule, nothing to intercept")
+            return
+        self._session = await page.target.createCDPSession()
+        self._session.on("Fetch.requestPaused", lambda event: asyncio.ensure_future(self._on_request_paused(event)))
+        await self._session.send("Fetch.enable", {"patterns": [
+            {"urlPattern": wildcard, "requestStage": stage}
+            for wildcard in wildcards for stage in ("Request", "Response")
+        ]})
+
+    async def detach(self) -> None:
+        """Stop intercepting requests."""
+        if not self.is_attached:
+            return
+        session, self._session = self._session, None
+        try:
+            await session.send("Fetch.disable")
+            await session.detach()
+        except Exception as e:
+            self._debug_tool.warn(f"CacheInterceptor: Failed to detach: {e}")
+
+    async def _on_request_paused(self, event: dict) -> None:
+        session = self._session
+        if session is None:
+            return
+        request_id = event["requestId"]
+        request = event["request"]
+        loop = asyncio.get_running_loop()
+        try:
+            if "responseStatusCode" not in event:
+                cached = await loop.run_in_executor(None, self._cache.get, request["method"], request["url"])
+                if cached is not None:
+                    await session.send("Fetch.fulfillRequest", {
+                        "requestId": request_id,
+                        "responseCode": cached.status,
+                        "responseHeaders": cached.headers,
+                        "body": base64.b64encode(cached.body).decode(),
+                    })
+                    return
+            elif event["responseStatusCode"] == 200 and self._cache.ttl_for(request["url"]) is not None:
+                response_body = await session.send("Fetch.getResponseBody", {"requestId": request_id})
+                body = response_body["body"]
+                body = base64.b64decode(body) if response_body.get("base64Encoded") else body.encode()
+                await loop.run_in_executor(None, self._cache.put, request["method"], request["url"],
+                                           event["responseStatusCode"], event.get("responseHeaders", []), body)
+        except Exception as e:
+            self._debug_tool.warn(f"CacheInterceptor: Failed to handle {request['url']}: {e}")
+        try:
+            await session.send("Fetch.continueRequest", {"requestId": request_id})
+        except Exception as e:
+            self._debug_tool.debug(f"CacheInterceptor: Failed to continue {request['url']}: {e}")
+
+
+__all__ = ["CacheInterceptor"]
@@ -1,4 +1,6 @@
-from typing import List, Any
+import json
+import uuid
+from typing import Any, AsyncIterator, Dict, List, Union
 
 import pyppeteer.page
 from gembox.debug_utils import Debugger
@@ -6,6 +8,47 @@ from pyppeteer.element_handle import ElementHandle
 
 from zephyrion.pypp.js_util.js_handler.data_handler.common import JsAttrHandler, JsQueryHandler
 from zephyrion.pypp.js_util.interface import JsExecutor
+from zephyrion.pypp.js_util.helper_bundle import install_helper_bundle
+from zephyrion.pypp.js_util.js_generator import CompiledSchema, compile_schema
+from zephyrion.pypp.dom_snapshot import DomSnapshot
+
+
+_STREAM_OPEN_JS = '''
+function (id, selector, scope) {
+    const item = %s;
+    const items = Array.from((scope || document).querySelectorAll(selector));
+    window.__zephyrionStreams = window.__zephyrionStreams || {};
+    window.__zephyrionStreams[id] = { items: items, item: item, next: 0 };
+    return items.length;
+}
+'''
+
+_STREAM_CHUNK_JS = '''
+function (id, size) {
+    const stream = (window.__zephyrionStreams || {})[id];
+    if (stream === undefined) {
+        throw new Error('zephyrion: extraction stream ' + id + ' is gone, the page navigated');
+    }
+    const end = Math.min(stream.next + size, stream.items.length);
+    const records = [];
+    for (let i = stream.next; i < end; i++) {
+        records.push(stream.item(stream.items[i]));
+        // drop the element, the page only holds what is left to read
+        stream.items[i] = null;
+    }
+    stream.next = end;
+    // one string is much cheaper to send than a deep value
+    return JSON.stringify(records);
+}
+'''
+
+_STREAM_CLOSE_JS = '''
+function (id) {
+    if (window.__zephyrionStreams) {
+        delete window.__zephyrionStreams[id];
+    }
+}
+'''
 
 
 class DataExtractor(JsExecutor):
@@ -36,13 +79,12 @@ class DataExtractor(JsExecutor):
 
     async def get_texts(self, selector: str) -> List[str]:
         """
-        Extract text from all elements matching the selector.
+        Extract text from all elements matching the selector, in one round trip.
 
         :param selector: (str) Selector of the elements to extract text from
         :return: (list) Text extracted from the elements
         """
-        elements = await self._page.querySelectorAll(selector)
-        return [await self.get_text(element=element) for element in elements]
+        return await self._query_handler.extract_texts(selector=selector)
 
     async def get_attr(self, element: ElementHandle, attribute: str) -> Any:
         """
@@ -54,14 +96,42 @@ class DataExtractor(JsExecutor):
         """
         return await self._page.evaluate(f'(element) => element.getAttribute("{attribute}")', element)
 
+    async def get_attrs(self, selector: str, attrs: Union[str, List[str]]) -> Union[List[str], List[Dict[str, str]]]:
+        """
+        Get attributes of all elements matching the selector, in one round trip.
+
+        :param selector: (str) Selector of the elements to get attributes from
+        :param attrs: (str, List[str]) Attribute, or list of attributes, to get, e.g. 'href' or ['href', 'title']
+        :return: (list) For a single attribute, its value for each element. For a list, a dict {attr: value} for
+            each element. Missing attributes are None
+        """
+        return await self._query_handler.extract_attrs(selector=selector, attrs=attrs)
+
+    async def count(self, selector: str) -> int:
+        """
+        Count the elements matching the selector.
+
+        :param selector: (str) Selector of the elements to count
+        :return: (int) Number of elements matching the selector
+        """
+        return await self._query_handler.count(selector=selector)
+
+    async def exists(self, selector: str) -> bool:
+        """
+        Check if any element matches the selector.
+
+        :param selector: (str) Selector of the elements to check
+        :return: (bool) True if at least one element matches the selector
+        """
+        return await self._query_handler.exists(selector=selector)
+
     async def get_cls_list(self, element: ElementHandle) -> List[Any]:
         """
         Get classList of given element
         :param element: (ElementHandle) Element to get classList from
         :return: (list) List of classList
         """
-        cls_dict = await self._page.evaluate('(element) => element.classList', element)
-        return list(cls_dict.values())
+        return await self._page.evaluate('(element) => Array.from(element.classList)', element)
 
     async def has_cls(self, element: ElementHandle, cls: str) -> bool:
         """
@@ -74,14 +144,126 @@ class DataExtractor(JsExecutor):
         cls_list = await self.get_cls_list(element)
         return cls in cls_list
 
-    async def exec_js(self, js: str) -> Any:
+    async def has_cls_many(self, selector: str, cls: str) -> List[bool]:
+        """
+        Check, for all elements matching the selector, if they have given class, in one round trip.
+
+        :param selector: (str) Selector of the elements to check
+        :param cls: (str) Class to check
+        :return: (list) For each element matching the selector, True if it has given class
+        """
+        return await self._query_handler.has_class_many(selector=selector, class_name=cls)
+
+    async def extract(self, schema: Union[Dict[str, Any], CompiledSchema], root: ElementHandle = None) \
+            -> Union[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Extract records described by a declarative schema, in one round trip.
+
+        The schema is compiled once into an in-page function (see `zephyrion._common.extraction_schema` for the
+        format), which reads every field of every item. e.g.::
+
+            await extractor.extract({"selector": "li.product",
+                                     "fields": {"title": "h2", "url": "a@href",
+                                                "price": {"selector": ".price", "transform": "float"}}})
+
+        :param schema: (dict, CompiledSchema) The schema
+        :param root: (ElementHandle) Only extract under this element, default to the whole document
+        :return: (list) One dict per item matching the root selector, or a single dict if the schema has no root selector
+        """
+        compiled = compile_schema(schema)
+        if root is not None:
+            return await self._page.evaluate(compiled.extract_js, root)
+        return await self._page.evaluate(compiled.extract_js)
+
+    async def extract_stream(self, extract: Union[Dict[str, Any], CompiledSchema, str], selector: str = None,
+                             root: ElementHandle = None, chunk_size: int = 500) -> AsyncIterator[Any]:
+        """
+        Extract records like `extract`, but transfer them in chunks, as an async iterator.
+
+        The matching items are collected in the page, then read `chunk_size` records per round trip, so neither the
+        browser, the websocket nor Python ever hold the whole result: memory stays flat whatever the number of records.
+        e.g.::
+
+            async for record in extractor.extract_stream(schema, chunk_size=1000):
+                ...
+
+        :param extract: (dict, CompiledSchema, str) Schema with a root selector (see `extract`), or the source of a
+            javascript function `(element) => value`
+        :param selector: (str) Selector of the items, default to the schema's root selector. Required for a function
+        :param root: (ElementHandle) Only extract under this element, default to the whole document
+        :param chunk_size: (int) Number of records per round trip
+        :return: (AsyncIterator) The records, in document order
+        """
+        if chunk_size < 1:
+            raise ValueError(f"chunk_size should be positive, got {chunk_size}")
+        if isinstance(extract, str):
+            item_js = f"({extract})"
+        else:
+            compiled = compile_schema(extract)
+            item_js = compiled.item_js
+            selector = selector if selector is not None else compiled.selector
+        if selector is None:
+            raise ValueError("extract_stream needs an item selector, from the schema or the `selector` argument")
+
+        stream_id = uuid.uuid4().hex
+        n_records = await self._page.evaluate(_STREAM_OPEN_JS % item_js, stream_id, selector, root)
+        self._debug_tool.debug(f"DataExtractor: Streaming {n_records} records of {selector} by {chunk_size}")
+        try:
+            for _ in range(0, n_records, chunk_size):
+                chunk = json.loads(await self._page.evaluate(_STREAM_CHUNK_JS, stream_id, chunk_size))
+                for record in chunk:
+                    yield record
+                del chunk
+        finally:
+            try:
+                await self._page.evaluate(_STREAM_CLOSE_JS, stream_id)
+            except Exception as e:
+                # the page navigated or closed, the stream is gone with it
+                self._debug_tool.debug(f"DataExtractor: Failed to close extraction stream: {e}")
+
+    async def get_html(self) -> str:
+        """
+        Get the HTML of the whole document, e.g. to extract from it with `OfflineExtractor` while the page moves on.
+
+        :return: (str) The serialized document
+        """
+        return await self._page.content()
+
+    async def snapshot(self, include_layout: bool = True) -> DomSnapshot:
+        """
+        Capture the whole document as columnar node tables, in a single CDP call, see `DomSnapshot`.
+
+        Selectors, filters and schemas then run in Python over the snapshot, without any further round trip::
+
+            snapshot = await extractor.snapshot()
+            titles = snapshot.get_texts("li.product h2")
+            records = snapshot.extract({"selector": "li.product", "fields": {"title": "h2", "url": "a@href"}})
+
+        :param include_layout: (bool) Keep the layout boxes of the rendered nodes
+        :return: (DomSnapshot) The snapshot of the main frame's document
+        """
+        response = await self._page._client.send("DOMSnapshot.captureSnapshot", {"computedStyles": []})
+        snapshot = DomSnapshot(response, include_layout=include_layout)
+        self._debug_tool.debug(f"DataExtractor: Captured {snapshot}")
+        return snapshot
+
+    async def install_helpers(self) -> None:
+        """
+        Install the helper bundle into the current document of the page, and into every later one.
+        """
+        await install_helper_bundle(self._page)
+
+    async def exec_js(self, js: str, force_expr: bool = False) -> Any:
         """
         Execute JavaScript code on the page.
 
         :param js: JavaScript code string to be executed.
+        :param force_expr: Evaluate `js` as an expression, even if it looks like a function (e.g. contains "=>").
         :return: Result of the JavaScript execution.
         """
-        return await self._page.evaluate(js)
+        if self._cdp_backend is not None and not self._cdp_backend.is_closed:
+            return await self._cdp_backend.evaluate(js)
+        return await self._page.evaluate(js, force_expr=force_expr)
 
 
 __all__ = ["DataExtractor"]
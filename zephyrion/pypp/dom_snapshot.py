@@ -0,0 +1,341 @@
+"""
+Columnar snapshot of a whole page, taken with a single `DOMSnapshot.captureSnapshot` call.
+
+The snapshot keeps the flat tables of the protocol, as compact `array.array` columns indexed by node (in document
+order), instead of building an object per node:
+
+- `parent`: index of the parent node, -1 for the document
+- `node_type`: DOM node type, 1 for elements, 3 for text
+- `node_name`, `node_value`: indices into `strings`, -1 if missing
+- `attr_offsets`, `attr_pairs`: attributes of node `i` are `attr_pairs[attr_offsets[i]:attr_offsets[i + 1]]`, as
+  alternating name and value string indices
+- `subtree_end`: the descendants of node `i` are the nodes `i + 1` to `subtree_end[i] - 1`
+- `layout_node`, `bounds`: layout boxes (x, y, width, height) of the rendered nodes, when captured
+
+Selectors (see `zephyrion._common.css_select` for the supported subset), filters and schemas then run in Python over
+the tables, so any number of extraction passes cost no further round trip. `to_numpy()` exposes the columns as NumPy
+arrays, numpy being optional.
+"""
+import array
+import html
+from typing import Any, Callable, Dict, Iterator, List, Tuple, Union
+
+from zephyrion._common.css_select import compile_selector
+from zephyrion._common.extraction_schema import evaluate_schema, normalize_schema
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+ELEMENT_NODE = 1
+TEXT_NODE = 3
+CDATA_SECTION_NODE = 4
+
+_VOID_ELEMENTS = frozenset(("area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param",
+                            "source", "track", "wbr"))
+_RAW_TEXT_ELEMENTS = frozenset(("script", "style"))
+
+
+class DomSnapshot:
+    """
+    Array-backed node tables of a document, see the module documentation.
+    """
+
+    def __init__(self, snapshot: dict, document_index: int = 0, include_layout: bool = True):
+        """
+        Prefer `DataExtractor.snapshot()`.
+
+        :param snapshot: (dict) Response of `DOMSnapshot.captureSnapshot`
+        :param document_index: (int) Document of the response to read, 0 for the main frame
+        :param include_layout: (bool) Keep the layout boxes
+        """
+        self.strings: List[str] = snapshot["strings"]
+        document = snapshot["documents"][document_index]
+        nodes = document["nodes"]
+        n_nodes = len(nodes["parentIndex"])
+
+        self.parent = array.array("i", nodes["parentIndex"])
+        self.node_type = array.array("B", nodes["nodeType"])
+        self.node_name = array.array("i", nodes["nodeName"])
+        self.node_value = array.array("i", nodes.get("nodeValue") or [-1] * n_nodes)
+        self.backend_node_id = array.array("i", nodes.get("backendNodeId") or [0] * n_nodes)
+
+        self.attr_offsets = array.array("i", [0])
+        self.attr_pairs = array.array("i")
+        for pairs in nodes.get("attributes") or [[]] * n_nodes:
+            self.attr_pairs.extend(pairs)
+            self.attr_offsets.append(len(self.attr_pairs))
+
+        # nodes are in document order, so a node's subtree ends where its last descendant's does
+        self.subtree_end = array.array("i", range(1, n_nodes + 1))
+        for i in range(n_nodes - 1, 0, -1):
+            parent = self.parent[i]
+            if parent >= 0 and self.subtree_end[i] > self.subtree_end[parent]:
+                self.subtree_end[parent] = self.subtree_end[i]
+
+        self.layout_node = array.array("i")
+        self.bounds = array.array("d")
+        """flat (x, y, width, height) per layout row"""
+        self._layout_row = None
+        if include_layout:
+            layout = document.get("layout") or {}
+            self.layout_node.extend(layout.get("nodeIndex") or [])
+            for box in layout.get("bounds") or []:
+                self.bounds.extend(box[:4])
+            self._layout_row = array.array("i", [-1]) * n_nodes
+            for row, node in enumerate(self.layout_node):
+                self._layout_row[node] = row
+
+        self._tags: Dict[int, Union[str, None]] = {}
+        """lower-case tag name by node name string index"""
+
+    @property
+    def n_nodes(self) -> int:
+        """number of nodes, of every type"""
+        return len(self.parent)
+
+    # Nodes
+    def tag(self, node: int) -> Union[str, None]:
+        """
+        :param node: (int) Node index
+        :return: (str) Lower-case tag name, None if the node is not an element
+        """
+        if self.node_type[node] != ELEMENT_NODE:
+            return None
+        name_index = self.node_name[node]
+        if name_index not in self._tags:
+            self._tags[name_index] = self.strings[name_index].lower()
+        return self._tags[name_index]
+
+    def attr(self, node: int, name: str) -> Union[str, None]:
+        """
+        :param node: (int) Node index
+        :param name: (str) Attribute name
+        :return: (str) Attribute value, None if missing
+        """
+        strings, pairs = self.strings, self.attr_pairs
+        for k in range(self.attr_offsets[node], self.attr_offsets[node + 1], 2):
+            if strings[pairs[k]] == name:
+                return strings[pairs[k + 1]]
+        return None
+
+    def attrs(self, node: int) -> Dict[str, str]:
+        """
+        :param node: (int) Node index
+        :return: (dict) Every attribute of the node
+        """
+        strings, pairs = self.strings, self.attr_pairs
+        return {strings[pairs[k]]: strings[pairs[k + 1]]
+                for k in range(self.attr_offsets[node], self.attr_offsets[node + 1], 2)}
+
+    def parent_of(self, node: int) -> Union[int, None]:
+        """
+        :param node: (int) Node index
+        :return: (int) Index of the parent node, None for the document
+        """
+        parent = self.parent[node]
+        return parent if parent >= 0 else None
+
+    def children(self, node: int) -> List[int]:
+        """
+        :param node: (int) Node index
+        :return: (List[int]) Indices of the child nodes, of every type
+        """
+        children, child = [], node + 1
+        while child < self.subtree_end[node]:
+            children.append(child)
+            child = self.subtree_end[child]
+        return children
+
+    def descendants(self, node: int) -> range:
+        """
+        :param node: (int) Node index
+        :return: (range) Indices of every descendant node, in document order
+        """
+        return range(node + 1, self.subtree_end[node])
+
+    def elements(self) -> Iterator[int]:
+        """Indices of every element, in document order."""
+        return (i for i in range(self.n_nodes) if self.node_type[i] == ELEMENT_NODE)
+
+    def text(self, node: int) -> str:
+        """
+        :param node: (int) Node index
+        :return: (str) Text content of the node, like `textContent`
+        """
+        node_type, node_value, strings = self.node_type, self.node_value, self.strings
+        if node_type[node] != ELEMENT_NODE:
+            return strings[node_value[node]] if node_value[node] >= 0 else ""
+        return "".join(strings[node_value[i]] for i in self.descendants(node)
+                       if node_type[i] in (TEXT_NODE, CDATA_SECTION_NODE) and node_value[i] >= 0)
+
+    def html(self, node: int) -> str:
+        """
+        Serialize the children of an element, like `innerHTML`.
+
+        :param node: (int) Node index
+        :return: (str) The HTML
+        """
+        parts: List[str] = []
+        for child in self.children(node):
+            self._serialize(child, parts, raw_text=self.tag(node) in _RAW_TEXT_ELEMENTS)
+        return "".join(parts)
+
+    def _serialize(self, node: int, parts: List[str], raw_text: bool) -> None:
+        node_type = self.node_type[node]
+        if node_type in (TEXT_NODE, CDATA_SECTION_NODE):
+            text = self.text(node)
+            parts.append(text if raw_text else html.escape(text, quote=False))
+            return
+        if node_type != ELEMENT_NODE:
+            return
+        tag = self.tag(node)
+        if tag.startswith("::"):
+            # pseudo-elements are in the snapshot, not in the markup
+            return
+        attrs = "".join(f' {name}="{html.escape(value)}"' for name, value in self.attrs(node).items())
+        parts.append(f"<{tag}{attrs}>")
+        if tag in _VOID_ELEMENTS:
+            return
+        for child in self.children(node):
+            self._serialize(child, parts, raw_text=tag in _RAW_TEXT_ELEMENTS)
+        parts.append(f"</{tag}>")
+
+    def bounds_of(self, node: int) -> Union[Tuple[float, float, float, float], None]:
+        """
+        :param node: (int) Node index
+        :return: (tuple) Layout box (x, y, width, height) of the node, None if it is not rendered or layout was not
+            captured
+        """
+        if self._layout_row is None or self._layout_row[node] < 0:
+            return None
+        row = self._layout_row[node] * 4
+        return tuple(self.bounds[row:row + 4])
+
+    # Queries
+    @property
+    def document_element(self) -> Union[int, None]:
+        """index of the `<html>` element"""
+        return next(self.elements(), None)
+
+    def select(self, selector: str, root: int = None) -> List[int]:
+        """
+        Find every element matching the selector.
+
+        :param selector: (str) The selector
+        :param root: (int) Only search the descendants of this node, default to the whole document
+        :return: (List[int]) Indices of the matching elements, in document order
+        """
+        compiled = compile_selector(selector)
+        nodes = range(self.n_nodes) if root is None else self.descendants(root)
+        return [i for i in nodes if self.node_type[i] == ELEMENT_NODE and compiled.matches(self, i)]
+
+    def select_one(self, selector: str, root: int = None) -> Union[int, None]:
+        """
+        Find the first element matching the selector.
+
+        :param selector: (str) The selector
+        :param root: (int) Only search the descendants of this node, default to the whole document
+        :return: (int) Index of the element, None if no element matches
+        """
+        compiled = compile_selector(selector)
+        nodes = range(self.n_nodes) if root is None else self.descendants(root)
+        return next((i for i in nodes if self.node_type[i] == ELEMENT_NODE and compiled.matches(self, i)), None)
+
+    def filter(self, predicate: Callable[["DomSnapshot", int], bool], selector: str = None) -> List[int]:
+        """
+        Find every element for which the predicate holds, e.g. visible links::
+
+            snapshot.filter(lambda s, i: (s.bounds_of(i) or (0, 0, 0, 0))[2] > 0, selector="a[href]")
+
+        :param predicate: (Callable) Function `(snapshot, node index) -> bool`
+        :param selector: (str) Only test the elements matching this selector
+        :return: (List[int]) Indices of the elements, in document order
+        """
+        nodes = self.select(selector) if selector is not None else self.elements()
+        return [i for i in nodes if predicate(self, i)]
+
+    def count(self, selector: str) -> int:
+        """
+        :param selector: (str) The selector
+        :return: (int) Number of elements matching the selector
+        """
+        return len(self.select(selector))
+
+    def exists(self, selector: str) -> bool:
+        """
+        :param selector: (str) The selector
+        :return: (bool) True if at least one element matches the selector
+        """
+        return self.select_one(selector) is not None
+
+    def get_texts(self, selector: str) -> List[str]:
+        """
+        :param selector: (str) The selector
+        :return: (List[str]) Text content of each matching element
+        """
+        return [self.text(i) for i in self.select(selector)]
+
+    def get_attrs(self, selector: str, attrs: Union[str, List[str]]) -> List[Union[str, None, Dict[str, Any]]]:
+        """
+        :param selector: (str) The selector
+        :param attrs: (str, List[str]) Attribute, or list of attributes, to get
+        :return: (list) Same shape as `DataExtractor.get_attrs`
+        """
+        if isinstance(attrs, str):
+            return [self.attr(i, attrs) for i in self.select(selector)]
+        return [{name: self.attr(i, name) for name in attrs} for i in self.select(selector)]
+
+    def extract(self, schema: Dict[str, Any], root: int = None) -> Union[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Extract records described by a declarative schema, same result as `DataExtractor.extract`.
+
+        :param schema: (dict) The schema, see `zephyrion._common.extraction_schema`
+        :param root: (int) Only extract under this node, default to the whole document
+        :return: (list) One dict per item matching the root selector, or a single dict if the schema has no root selector
+        """
+        normalized = normalize_schema(schema)
+        if root is None:
+            root = self.document_element if normalized["selector"] is None else 0
+        return evaluate_schema(normalized, _SchemaTree(self), root)
+
+    def to_numpy(self) -> Dict[str, Any]:
+        """
+        The columns as NumPy arrays, without copying. Requires numpy (`pip install numpy`).
+
+        :return: (dict) {column name: numpy.ndarray}, `bounds` has shape (n_layout_rows, 4)
+        """
+        if numpy is None:
+            raise ImportError("DomSnapshot.to_numpy requires numpy, install it with `pip install numpy`")
+        columns = {name: numpy.frombuffer(getattr(self, name), dtype=getattr(self, name).typecode)
+                   for name in ("parent", "node_type", "node_name", "node_value", "backend_node_id", "attr_offsets",
+                                "attr_pairs", "subtree_end", "layout_node")}
+        columns["bounds"] = numpy.frombuffer(self.bounds, dtype="d").reshape(-1, 4)
+        return columns
+
+    def __len__(self):
+        return self.n_nodes
+
+    def __repr__(self):
+        return f"DomSnapshot(n_nodes={self.n_nodes}, n_strings={len(self.strings)})"
+
+
+class _SchemaTree:
+    """Adapt a snapshot to `evaluate_schema`."""
+
+    def __init__(self, snapshot: DomSnapshot):
+        self._snapshot = snapshot
+        self.text = snapshot.text
+        self.html = snapshot.html
+        self.attr = snapshot.attr
+
+    def query_one(self, node: int, selector: str) -> Union[int, None]:
+        return self._snapshot.select_one(selector, root=node)
+
+    def query_all(self, node: int, selector: str) -> List[int]:
+        return self._snapshot.select(selector, root=node)
+
+
+__all__ = ["DomSnapshot"]
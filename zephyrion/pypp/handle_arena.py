@@ -0,0 +1,208 @@
+"""
+Scoped tracking and bulk release of `ElementHandle`s.
+
+Every handle pins a remote object in the page's javascript heap until it is disposed. While a `HandleArena` is active,
+handles created through zephyrion (`get_element(s)`, `query_one`, `query_all`, `scroll_load_selector`) are created in
+the arena's CDP object group, and all released together with a single `Runtime.releaseObjectGroup` when the arena
+exits. The active arena is held in a context variable, so concurrent tasks each see their own.
+"""
+import uuid
+import asyncio
+import contextvars
+from typing import Callable, List, Union
+
+import pyppeteer.page
+import pyppeteer.errors
+from pyppeteer import helper
+from pyppeteer.execution_context import JSHandle
+from pyppeteer.element_handle import ElementHandle
+from gembox.debug_utils import Debugger
+
+
+_QUERY_ALL_JS = '''
+function (selector) {
+    // `this` is the root element, or the global object when querying the whole document
+    return Array.from((this && this.querySelectorAll ? this : document).querySelectorAll(selector));
+}
+'''
+
+_QUERY_ONE_JS = '''
+function (selector) {
+    return (this && this.querySelector ? this : document).querySelector(selector);
+}
+'''
+
+_current_arena: "contextvars.ContextVar[Union[HandleArena, None]]" = contextvars.ContextVar("zephyrion_handle_arena",
+                                                                                           default=None)
+
+
+class HandleArena:
+    """
+    Release every handle created while the arena is active, at once.
+
+    Usage::
+
+        async with agent.handle_arena() as arena:
+            items = await agent.page_interactor.get_elements("li.item")
+            ...
+            print(arena.n_live)
+        # the handles of `items` are released, and can no longer be used
+    """
+
+    def __init__(self, page: Union[pyppeteer.page.Page, Callable[[], pyppeteer.page.Page]],
+                 debug_tool: Debugger = None):
+        """
+        :param page: (pyppeteer.page.Page, Callable) The page whose handles are tracked, or a function returning the
+            current one, for owners replacing their page (see `MemoryWatchdog`)
+        :param debug_tool: (Debugger) Debugger instance for debugging
+        """
+        self._page_getter = page if callable(page) else (lambda: page)
+        self._debug_tool = debug_tool if debug_tool is not None else Debugger()
+        self._object_group = f"zephyrion-arena-{uuid.uuid4().hex}"
+        self._grouped: List[JSHandle] = []
+        """handles created in the arena's object group"""
+        self._adopted: List[JSHandle] = []
+        """handles created elsewhere and handed to `track`, released one by one"""
+        self._n_created = 0
+        self._n_released = 0
+        self._token = None
+
+    @staticmethod
+    def current(page: pyppeteer.page.Page = None) -> Union["HandleArena", None]:
+        """
+        The arena active in the current context.
+
+        :param page: (pyppeteer.page.Page) Only return the arena if it tracks this page
+        :return: (HandleArena) The active arena, None if none is active
+        """
+        arena = _current_arena.get()
+        if arena is None or (page is not None and arena.page is not page):
+            return None
+        return arena
+
+    @property
+    def page(self) -> pyppeteer.page.Page:
+        """the page whose handles are tracked"""
+        return self._page_getter()
+
+    @property
+    def object_group(self) -> str:
+        """the CDP object group of the handles created by the arena"""
+        return self._object_group
+
+    @property
+    def n_live(self) -> int:
+        """number of tracked handles not released yet"""
+        return sum(1 for handle in self._grouped + self._adopted if not handle._disposed)
+
+    @property
+    def n_created(self) -> int:
+        """number of handles tracked since the arena was created"""
+        return self._n_created
+
+    @property
+    def n_released(self) -> int:
+        """number of handles released since the arena was created"""
+        return self._n_released
+
+    async def query_all(self, selector: str, root: ElementHandle = None) -> List[ElementHandle]:
+        """
+        Get all elements matching the selector, as handles of the arena.
+
+        :param selector: (str) Selector of the elements
+        :param root: (ElementHandle) Only query under this element, default to the whole document
+        :return: (List[ElementHandle]) The elements
+        """
+        context, array = await self._call(_QUERY_ALL_JS, selector, root)
+        response = await context._client.send("Runtime.getProperties",
+                                               {"objectId": array["objectId"], "ownProperties": True})
+        elements = []
+        for prop in response["result"]:
+            if prop.get("enumerable") and "value" in prop:
+                handle = context._objectHandleFactory(prop["value"])
+                self._adopt_grouped(handle)
+                element = handle.asElement()
+                if element is not None:
+                    elements.append(element)
+        return elements
+
+    async def query_one(self, selector: str, root: ElementHandle = None) -> Union[ElementHandle, None]:
+        """
+        Get the first element matching the selector, as a handle of the arena.
+
+        :param selector: (str) Selector of the element
+        :param root: (ElementHandle) Only query under this element, default to the whole document
+        :return: (ElementHandle) The element, None if no element matches
+        """
+        context, remote_object = await self._call(_QUERY_ONE_JS, selector, root)
+        if remote_object.get("subtype") == "null":
+            return None
+        handle = context._objectHandleFactory(remote_object)
+        self._adopt_grouped(handle)
+        return handle.asElement()
+
+    def track(self, handle: JSHandle) -> JSHandle:
+        """
+        Track a handle created outside the arena, e.g. by pyppeteer directly, so it is released with the arena.
+
+        :param handle: (JSHandle) The handle
+        :return: (JSHandle) The same handle
+        """
+        self._adopted.append(handle)
+        self._n_created += 1
+        return handle
+
+    async def release(self) -> int:
+        """
+        Release every tracked handle. The arena stays usable.
+
+        :return: (int) Number of handles released
+        """
+        grouped, self._grouped = self._grouped, []
+        adopted, self._adopted = self._adopted, []
+        n_released = sum(1 for handle in grouped + adopted if not handle._disposed)
+        for handle in grouped:
+            handle._disposed = True
+        try:
+            await self.page._client.send("Runtime.releaseObjectGroup", {"objectGroup": self._object_group})
+        except Exception as e:
+            # the page or its context is gone, so are its objects
+            self._debug_tool.debug(f"HandleArena: Failed to release object group: {e}")
+        await asyncio.gather(*[handle.dispose() for handle in adopted if not handle._disposed])
+        self._n_released += n_released
+        self._debug_tool.debug(f"HandleArena: Released {n_released} handles, {self._n_released} in total")
+        return n_released
+
+    async def _call(self, function_declaration: str, selector: str, root: Union[ElementHandle, None]):
+        """Call a query function in the arena's object group, return the execution context and the result."""
+        context = root.executionContext if root is not None else await self.page.mainFrame.executionContext()
+        params = {"functionDeclaration": function_declaration, "arguments": [{"value": selector}],
+                  "objectGroup": self._object_group, "returnByValue": False, "awaitPromise": False}
+        if root is not None:
+            params["objectId"] = root._remoteObject["objectId"]
+        else:
+            params["executionContextId"] = context._contextId
+        response = await context._client.send("Runtime.callFunctionOn", params)
+        if response.get("exceptionDetails"):
+            raise pyppeteer.errors.ElementHandleError(
+                f"Evaluation failed: {helper.getExceptionMessage(response['exceptionDetails'])}")
+        return context, response["result"]
+
+    def _adopt_grouped(self, handle: JSHandle) -> None:
+        self._grouped.append(handle)
+        self._n_created += 1
+
+    async def __aenter__(self) -> "HandleArena":
+        self._token = _current_arena.set(self)
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        _current_arena.reset(self._token)
+        self._token = None
+        await self.release()
+
+    def __repr__(self):
+        return f"HandleArena(n_live={self.n_live}, n_released={self._n_released})"
+
+
+__all__ = ["HandleArena"]
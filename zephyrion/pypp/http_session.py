@@ -0,0 +1,286 @@
+"""
+Pooled HTTP client carrying the session of a browser page.
+
+Once logged in through the browser, a site's JSON endpoints are much cheaper to call directly. `BrowserHttpSession`
+exports the page's cookies (of every domain), user agent and language into a keep-alive aiohttp session, plus any
+headers computed in the page (e.g. a bearer token kept in `localStorage`). On a 401 or 403 it exports them again from
+the browser, which may have renewed them meanwhile, optionally after running a re-login callback, and retries once.
+
+Requires aiohttp (`pip install aiohttp`).
+"""
+import json
+import time
+import asyncio
+import http.cookies
+from typing import Any, Awaitable, Callable, Dict, List, Union
+from urllib.parse import urlsplit
+
+import pyppeteer.page
+from gembox.debug_utils import Debugger
+
+try:
+    import aiohttp
+    import yarl
+except ImportError:
+    aiohttp = None
+    yarl = None
+
+
+AUTH_FAILURE_STATUSES = (401, 403)
+
+_BROWSER_HEADERS_JS = "({userAgent: navigator.userAgent, languages: Array.from(navigator.languages || [])})"
+
+
+class HttpStatusError(Exception):
+    def __init__(self, url: str, status: int):
+        """
+        :param url: (str) The requested url
+        :param status: (int) HTTP status of the response
+        """
+        super().__init__(f"Request to {url} failed with status {status}")
+        self.url = url
+        self.status = status
+
+
+class HttpResponse:
+    """
+    A response of a `BrowserHttpSession`, with its body read.
+    """
+
+    def __init__(self, url: str, status: int, headers: Dict[str, str], body: bytes):
+        """
+        :param url: (str) Url of the response, after redirects
+        :param status: (int) HTTP status
+        :param headers: (dict) Response headers
+        :param body: (bytes) The body
+        """
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    @property
+    def ok(self) -> bool:
+        """whether the status is 2xx"""
+        return 200 <= self.status < 300
+
+    def text(self, encoding: str = "utf-8") -> str:
+        return self.body.decode(encoding, errors="replace")
+
+    def json(self) -> Any:
+        return json.loads(self.body)
+
+    def __repr__(self):
+        return f"HttpResponse({self.url!r}, status={self.status}, n_bytes={len(self.body)})"
+
+
+class BrowserHttpSession:
+    """
+    HTTP client authenticated as a browser page, see the module documentation.
+
+    Usage::
+
+        async with agent.http_session(headers_js="({Authorization: 'Bearer ' + localStorage.token})") as session:
+            pages = await asyncio.gather(*[session.get_json(f"https://example.com/api/items?page={i}")
+                                           for i in range(100)])
+    """
+
+    def __init__(self, page: Union[pyppeteer.page.Page, Callable[[], pyppeteer.page.Page]],
+                 headers: Dict[str, str] = None, headers_js: str = None,
+                 reauthenticate: Callable[[], Awaitable[Any]] = None, max_connections: int = 32,
+                 timeout: float = 30., debug_tool: Debugger = None):
+        """
+        :param page: (pyppeteer.page.Page, Callable) The logged-in page, or a function returning the current one, for
+            owners replacing their page (see `MemoryWatchdog`)
+        :param headers: (dict) Extra headers sent with every request
+        :param headers_js: (str) Javascript expression evaluated in the page at every export, giving more headers
+        :param reauthenticate: (Callable) Coroutine function logging in again through the browser, called when the
+            headers exported again are still refused
+        :param max_connections: (int) Maximum number of pooled connections
+        :param timeout: (float) Total timeout of a request, in seconds
+        :param debug_tool: (Debugger) Debugger instance for debugging
+        """
+        if aiohttp is None:
+            raise ImportError("BrowserHttpSession requires aiohttp, install it with `pip install aiohttp`")
+        self._page_getter = page if callable(page) else (lambda: page)
+        self._extra_headers = dict(headers or {})
+        self._headers_js = headers_js
+        self._reauthenticate = reauthenticate
+        self._max_connections = max_connections
+        self._timeout = timeout
+        self._debug_tool = debug_tool if debug_tool is not None else Debugger()
+        self._session: Union["aiohttp.ClientSession", None] = None
+        self._headers: Dict[str, str] = {}
+        self._generation = 0
+        """number of exports from the browser, requests retry only if no export happened since they were sent"""
+        self._refresh_lock = asyncio.Lock()
+        self._n_requests = 0
+        self._n_refreshes = 0
+
+    @property
+    def page(self) -> pyppeteer.page.Page:
+        """the page the session is exported from"""
+        return self._page_getter()
+
+    @property
+    def n_requests(self) -> int:
+        """number of requests sent, retries included"""
+        return self._n_requests
+
+    @property
+    def n_refreshes(self) -> int:
+        """number of exports from the browser"""
+        return self._n_refreshes
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        """headers sent with every request, as last exported"""
+        return dict(self._headers)
+
+    async def refresh(self) -> None:
+        """
+        Export the cookies and headers of the browser page again.
+        """
+        page = self.page
+        cookies = (await page._client.send("Network.getAllCookies"))["cookies"]
+        browser = await page.evaluate(_BROWSER_HEADERS_JS)
+        headers = {"User-Agent": browser["userAgent"]}
+        if browser["languages"]:
+            headers["Accept-Language"] = ",".join(
+                lang if i == 0 else f"{lang};q={max(0.1, 1 - i / 10):.1f}" for i, lang in enumerate(browser["languages"]))
+        if page.url.startswith("http"):
+            parts = urlsplit(page.url)
+            headers["Referer"] = page.url
+            headers["Origin"] = f"{parts.scheme}://{parts.netloc}"
+        if self._headers_js is not None:
+            headers.update({k: str(v) for k, v in (await page.evaluate(self._headers_js) or {}).items()})
+        headers.update(self._extra_headers)
+
+        session = self._get_session()
+        session.cookie_jar.clear()
+        n_cookies = self._load_cookies(session.cookie_jar, cookies)
+        self._headers = headers
+        self._generation += 1
+        self._n_refreshes += 1
+        self._debug_tool.debug(f"BrowserHttpSession: Exported {n_cookies} cookies and {len(headers)} headers")
+
+    @staticmethod
+    def _load_cookies(jar: "aiohttp.CookieJar", cookies: List[dict]) -> int:
+        now, n_loaded = time.time(), 0
+        for cookie in cookies:
+            expires = cookie.get("expires", -1)
+            if not cookie.get("session", False) and expires is not None and 0 < expires < now:
+                continue
+            morsel = http.cookies.Morsel()
+            try:
+                morsel.set(cookie["name"], cookie["value"], cookie["value"])
+            except http.cookies.CookieError:
+                continue
+            if cookie["domain"].startswith("."):
+                morsel["domain"] = cookie["domain"]
+            # else a host-only cookie, which the jar keeps for the exact host of the response url
+            morsel["path"] = cookie.get("path", "/")
+            if cookie.get("secure"):
+                morsel["secure"] = True
+            if cookie.get("httpOnly"):
+                morsel["httponly"] = True
+            host = cookie["domain"].lstrip(".")
+            jar.update_cookies({cookie["name"]: morsel}, response_url=yarl.URL(f"https://{host}/"))
+            n_loaded += 1
+        return n_loaded
+
+    def _get_session(self) -> "aiohttp.ClientSession":
+        if self._session is None or self._session.closed:
+            # values are sent as the browser sends them, without re-quoting
+            jar = aiohttp.CookieJar(unsafe=True, quote_cookie=False)
+            self._session = aiohttp.ClientSession(
+                cookie_jar=jar, timeout=aiohttp.ClientTimeout(total=self._timeout),
+                connector=aiohttp.TCPConnector(limit=self._max_connections, keepalive_timeout=30))
+        return self._session
+
+    async def request(self, method: str, url: str, **kwargs: Any) -> HttpResponse:
+        """
+        Send a request with the browser's session, exporting it again and retrying once on 401/403.
+
+        :param method: (str) HTTP method
+        :param url: (str) The url
+        :param kwargs: Passed to `aiohttp.ClientSession.request`, e.g. `params`, `json`, `headers`
+        :return: (HttpResponse) The response, with its body read
+        """
+        if self._generation == 0:
+            await self._refresh_once(0)
+        generation = self._generation
+        response = await self._send(method, url, **kwargs)
+        if response.status not in AUTH_FAILURE_STATUSES:
+            return response
+
+        self._debug_tool.info(f"BrowserHttpSession: {method} {url} got {response.status}, exporting the session again")
+        await self._refresh_once(generation)
+        generation = self._generation
+        response = await self._send(method, url, **kwargs)
+        if response.status in AUTH_FAILURE_STATUSES and self._reauthenticate is not None:
+            async with self._refresh_lock:
+                if self._generation == generation:
+                    self._debug_tool.info(f"BrowserHttpSession: Still {response.status}, logging in again through "
+                                          f"the browser")
+                    await self._reauthenticate()
+                    await self.refresh()
+            response = await self._send(method, url, **kwargs)
+        return response
+
+    async def _refresh_once(self, generation: int) -> None:
+        """Refresh unless another request already did since `generation`."""
+        async with self._refresh_lock:
+            if self._generation == generation:
+                await self.refresh()
+
+    async def _send(self, method: str, url: str, **kwargs: Any) -> HttpResponse:
+        headers = {**self._headers, **kwargs.pop("headers", {})}
+        self._n_requests += 1
+        async with self._get_session().request(method, url, headers=headers, **kwargs) as response:
+            body = await response.read()
+            return HttpResponse(url=str(response.url), status=response.status, headers=dict(response.headers),
+                                body=body)
+
+    async def get(self, url: str, **kwargs: Any) -> HttpResponse:
+        """See `request`."""
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs: Any) -> HttpResponse:
+        """See `request`."""
+        return await self.request("POST", url, **kwargs)
+
+    async def get_json(self, url: str, **kwargs: Any) -> Any:
+        """
+        GET a JSON endpoint.
+
+        :param url: (str) The url
+        :param kwargs: Passed to `request`
+        :return: (Any) The decoded body
+        """
+        response = await self.get(url, **kwargs)
+        if not response.ok:
+            raise HttpStatusError(url=url, status=response.status)
+        return response.json()
+
+    async def close(self) -> None:
+        """
+        Close the HTTP session. The browser page is left as is.
+        """
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self) -> "BrowserHttpSession":
+        if self._generation == 0:
+            await self._refresh_once(0)
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    def __repr__(self):
+        return f"BrowserHttpSession(n_requests={self._n_requests}, n_refreshes={self._n_refreshes})"
+
+
+__all__ = ["BrowserHttpSession", "HttpResponse", "HttpStatusError", "AUTH_FAILURE_STATUSES"]
@@ -0,0 +1,215 @@
+"""
+Batching of javascript handler calls into a single evaluate.
+
+While a `JsBatch` of an executor is active, calls of handler methods decorated with `execute_js` or `call_helper` on
+that executor are queued instead of executed, and return a `BatchStep`. The queue is sent as one script, each step
+wrapped in its own try/catch, when the batch exits (or when a step is awaited before). Awaiting a step gives its
+result, or raises its `JsBatchError`.
+
+Usage::
+
+    async with interactor.js_batch() as batch:
+        await interactor.attr_handler.set_attr("#q", "value", "shoes")
+        await interactor.class_handler.add_class("#q", "dirty")
+        await interactor.action_handler.click("#search")
+        top = await interactor.scroll_handler.get_scroll_top()
+    print(await top, batch.errors)
+"""
+import contextvars
+from typing import Any, List, Sequence, Union
+
+from zephyrion.pypp.profiler import profile_label
+from zephyrion.pypp.js_util.helper_bundle import helper_call_js
+
+
+class JsBatchError(Exception):
+    def __init__(self, index: int, description: str, message: str):
+        """
+        :param index: (int) Index of the failed step in its batch
+        :param description: (str) Description of the step, e.g. the helper call
+        :param message: (str) The javascript error message
+        """
+        super().__init__(f"Batch step {index} ({description}) failed: {message}")
+        self.index = index
+        self.description = description
+        self.message = message
+
+
+class BatchStep:
+    """
+    A queued call of a batch, awaitable for its result.
+    """
+
+    def __init__(self, batch: "JsBatch", index: int, js: str, description: str):
+        self._batch = batch
+        self.index = index
+        self.js = js
+        self.description = description
+        self._done = False
+        self._value: Any = None
+        self._error: Union[JsBatchError, None] = None
+
+    @property
+    def done(self) -> bool:
+        """whether the step was sent and its result is known"""
+        return self._done
+
+    def result(self) -> Any:
+        """
+        The result of the step, once the batch was sent.
+
+        :return: (Any) The raw javascript result
+        """
+        if not self._done:
+            raise RuntimeError(f"Batch step {self.index} was not sent yet, await it or exit the batch first")
+        if self._error is not None:
+            raise self._error
+        return self._value
+
+    def _resolve(self, value: Any = None, error: JsBatchError = None) -> None:
+        self._done, self._value, self._error = True, value, error
+
+    async def _wait(self) -> Any:
+        if not self._done:
+            await self._batch.flush()
+        return self.result()
+
+    def __await__(self):
+        return self._wait().__await__()
+
+    def __repr__(self):
+        state = "pending" if not self._done else ("failed" if self._error is not None else "done")
+        return f"BatchStep({self.index}, {self.description!r}, {state})"
+
+
+_active_batch: "contextvars.ContextVar[Union[JsBatch, None]]" = contextvars.ContextVar("zephyrion_js_batch", default=None)
+
+
+class JsBatch:
+    """
+    Queue of javascript calls of one executor, sent as a single evaluate. See the module documentation.
+    """
+
+    def __init__(self, executor, atomic: bool = False):
+        """
+        :param executor: (JsExecutor) The executor whose calls are batched
+        :param atomic: (bool) Stop at the first failed step, the following steps are not run and fail as skipped.
+            Steps already run are not rolled back
+        """
+        self._executor = executor
+        self._atomic = atomic
+        self._queue: List[BatchStep] = []
+        self._steps: List[BatchStep] = []
+        self._n_evaluates = 0
+        self._token = None
+
+    @staticmethod
+    def current(executor) -> Union["JsBatch", None]:
+        """
+        The batch active in the current context for the executor.
+
+        :param executor: (JsExecutor) The executor
+        :return: (JsBatch) The active batch, None if the executor's calls are not batched
+        """
+        batch = _active_batch.get()
+        if batch is None or batch._executor is not executor:
+            return None
+        return batch
+
+    @property
+    def steps(self) -> List[BatchStep]:
+        """every step of the batch, sent or not"""
+        return list(self._steps)
+
+    @property
+    def errors(self) -> List[JsBatchError]:
+        """errors of the failed steps sent so far"""
+        return [step._error for step in self._steps if step._error is not None]
+
+    @property
+    def n_evaluates(self) -> int:
+        """number of round trips the batch took"""
+        return self._n_evaluates
+
+    def add_js(self, js: str) -> BatchStep:
+        """
+        Queue a javascript expression.
+
+        :param js: (str) The expression
+        :return: (BatchStep) The queued step
+        """
+        js = js.strip().rstrip(";")
+        return self._add(js, description=js if len(js) <= 60 else js[:57] + "...")
+
+    def add_helper(self, name: str, args: Sequence[Any]) -> BatchStep:
+        """
+        Queue a call of the in-page helper bundle.
+
+        :param name: (str) Name of the helper
+        :param args: (Sequence) JSON-serializable arguments of the helper
+        :return: (BatchStep) The queued step
+        """
+        return self._add(helper_call_js(name, args), description=f"{name}{tuple(args)}")
+
+    def _add(self, js: str, description: str) -> BatchStep:
+        step = BatchStep(self, index=len(self._steps), js=js, description=description)
+        self._queue.append(step)
+        self._steps.append(step)
+        return step
+
+    async def flush(self) -> None:
+        """
+        Send the queued steps now, as one evaluate.
+        """
+        queue, self._queue = self._queue, []
+        if not queue:
+            return
+        uses_helpers = any(step.js.startswith("__zephyrion.") for step in queue)
+        script = self._script(queue, check_helpers=uses_helpers)
+        with profile_label("JsBatch.flush"):
+            results = await self._executor.exec_js(script, force_expr=True)
+            self._n_evaluates += 1
+            if results is None and uses_helpers:
+                await self._executor.install_helpers()
+                results = await self._executor.exec_js(script, force_expr=True)
+                self._n_evaluates += 1
+        for i, step in enumerate(queue):
+            if i >= len(results):
+                step._resolve(error=JsBatchError(step.index, step.description, "skipped, an earlier step failed"))
+            elif results[i][0]:
+                step._resolve(value=results[i][1])
+            else:
+                step._resolve(error=JsBatchError(step.index, step.description, results[i][1]))
+
+    def _script(self, queue: List[BatchStep], check_helpers: bool) -> str:
+        on_error = "return r; " if self._atomic else ""
+        lines = ["(function () {"]
+        if check_helpers:
+            lines.append("    if (typeof __zephyrion === 'undefined') { return null; }")
+        lines.append("    const r = [];")
+        for step in queue:
+            lines.append(f"    try {{ r.push([1, ({step.js})]); }} "
+                         f"catch (e) {{ r.push([0, String(e && e.message !== undefined ? e.message : e)]); {on_error}}}")
+        lines.append("    return r;")
+        lines.append("})()")
+        return "\n".join(lines)
+
+    async def __aenter__(self) -> "JsBatch":
+        self._token = _active_batch.set(self)
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        _active_batch.reset(self._token)
+        self._token = None
+        if exc_type is not None:
+            queue, self._queue = self._queue, []
+            for step in queue:
+                step._resolve(error=JsBatchError(step.index, step.description, "not sent, the batch was aborted"))
+            return
+        await self.flush()
+
+    def __repr__(self):
+        return f"JsBatch(n_steps={len(self._steps)}, n_queued={len(self._queue)}, n_evaluates={self._n_evaluates})"
+
+
+__all__ = ["JsBatch", "BatchStep", "JsBatchError"]
@@ -0,0 +1,154 @@
+"""
+Direct CDP backend for javascript executors.
+
+`page.evaluate` looks up the frame's execution context, wraps the code, and builds a handle or a value out of the
+result on every call. For hot primitives (`get_scroll_top`, `scroll_by`, `count`, ...) that overhead is most of the
+call. `CdpBackend` talks to a dedicated `CDPSession` of the page instead:
+
+- helper calls are `Runtime.callFunctionOn` on the cached objectId of `window.__zephyrion`, with `returnByValue`
+- other code is a plain `Runtime.evaluate` with `returnByValue`
+
+The cached objectId dies with its document, the backend then resolves it again and retries the call once.
+
+Usage::
+
+    backend = await CdpBackend.open(page)
+    interactor.set_cdp_backend(backend)
+    extractor.set_cdp_backend(backend)
+    ...
+    await backend.close()
+"""
+from typing import Any, Sequence, Union
+
+import pyppeteer.page
+import pyppeteer.errors
+from pyppeteer import helper
+from pyppeteer.connection import CDPSession
+from gembox.debug_utils import Debugger
+
+from zephyrion.pypp.js_util.helper_bundle import install_helper_bundle
+
+
+_CALL_HELPER_JS = "function (name, args) { return this.c(name, args); }"
+
+_OBJECT_GROUP = "zephyrion-cdp-backend"
+
+
+class CdpBackend:
+    """
+    Execute javascript through a dedicated CDP session of a page, see the module documentation.
+    """
+
+    def __init__(self, page: pyppeteer.page.Page, session: CDPSession, debug_tool: Debugger = None):
+        """
+        Prefer `CdpBackend.open(page)`.
+
+        :param page: (pyppeteer.page.Page) The page
+        :param session: (CDPSession) A CDP session attached to the page's target
+        :param debug_tool: (Debugger) Debugger instance for debugging
+        """
+        self._page = page
+        self._session = session
+        self._debug_tool = debug_tool if debug_tool is not None else Debugger()
+        self._helpers_id: Union[str, None] = None
+        """objectId of `window.__zephyrion` in the current document"""
+        self._n_resolves = 0
+        self._closed = False
+
+    @classmethod
+    async def open(cls, page: pyppeteer.page.Page, debug_tool: Debugger = None) -> "CdpBackend":
+        """
+        Create a backend with a new CDP session of the page.
+
+        :param page: (pyppeteer.page.Page) The page
+        :param debug_tool: (Debugger) Debugger instance for debugging
+        :return: (CdpBackend) The backend
+        """
+        session = await page.target.createCDPSession()
+        return cls(page=page, session=session, debug_tool=debug_tool)
+
+    @property
+    def session(self) -> CDPSession:
+        """the dedicated CDP session"""
+        return self._session
+
+    @property
+    def n_resolves(self) -> int:
+        """number of times the helper objectId was resolved, i.e. about once per document"""
+        return self._n_resolves
+
+    @property
+    def is_closed(self) -> bool:
+        return self._closed
+
+    async def evaluate(self, js: str) -> Any:
+        """
+        Evaluate an expression in the main frame, and return its value.
+
+        :param js: (str) The expression
+        :return: (Any) The JSON value of the result, None for undefined
+        """
+        response = await self._session.send("Runtime.evaluate", {"expression": js, "returnByValue": True,
+                                                                  "awaitPromise": True, "userGesture": True})
+        return self._value_of(response)
+
+    async def call_helper(self, name: str, args: Sequence[Any] = ()) -> Any:
+        """
+        Call a helper of the in-page helper bundle on its cached objectId.
+
+        :param name: (str) Name of the helper, e.g. "scrollTop"
+        :param args: (Sequence) JSON-serializable arguments of the helper
+        :return: (Any) The JSON value of the result, None for undefined
+        """
+        params = {"functionDeclaration": _CALL_HELPER_JS,
+                  "arguments": [{"value": name}, {"value": list(args)}],
+                  "returnByValue": True, "awaitPromise": False, "userGesture": True}
+        if self._helpers_id is None:
+            await self._resolve_helpers()
+        try:
+            response = await self._session.send("Runtime.callFunctionOn", {"objectId": self._helpers_id, **params})
+        except pyppeteer.errors.NetworkError as e:
+            # the document of the cached object is gone
+            if self._closed:
+                raise
+            self._debug_tool.debug(f"CdpBackend: Helper object is stale ({e}), resolving it again")
+            await self._resolve_helpers()
+            response = await self._session.send("Runtime.callFunctionOn", {"objectId": self._helpers_id, **params})
+        return self._value_of(response)
+
+    async def close(self) -> None:
+        """
+        Detach the CDP session.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._helpers_id = None
+        try:
+            await self._session.detach()
+        except pyppeteer.errors.NetworkError as e:
+            self._debug_tool.debug(f"CdpBackend: Failed to detach session: {e}")
+
+    async def _resolve_helpers(self) -> None:
+        self._helpers_id = None
+        response = await self._session.send("Runtime.evaluate", {"expression": "window.__zephyrion",
+                                                                  "objectGroup": _OBJECT_GROUP})
+        if response["result"].get("type") != "object":
+            await install_helper_bundle(self._page)
+            response = await self._session.send("Runtime.evaluate", {"expression": "window.__zephyrion",
+                                                                      "objectGroup": _OBJECT_GROUP})
+        self._helpers_id = response["result"]["objectId"]
+        self._n_resolves += 1
+
+    @staticmethod
+    def _value_of(response: dict) -> Any:
+        if response.get("exceptionDetails"):
+            raise pyppeteer.errors.ElementHandleError(
+                f"Evaluation failed: {helper.getExceptionMessage(response['exceptionDetails'])}")
+        return helper.valueFromRemoteObject(response["result"])
+
+    def __repr__(self):
+        return f"CdpBackend(n_resolves={self._n_resolves}, closed={self._closed})"
+
+
+__all__ = ["CdpBackend"]
@@ -1,20 +1,59 @@
+import logging
 from functools import wraps
 
+from zephyrion.pypp.js_util.batch import JsBatch
+from zephyrion.pypp.profiler import profile_label
+
 
 def execute_js(f):
     """
     Decorator for executing javascript code.
 
     Return RAW javascript result. Usually a `dict` or `str`.
+    Inside a `js_batch` of the executor, the code is queued and a `BatchStep` is returned instead.
+    CDP calls are labelled with the decorated method for `CdpProfiler`.
     """
+    label = f.__qualname__
+
     @wraps(f)
     async def decorator(self, *args, **kwargs):
         js_code = await f(self, *args, **kwargs)
+        batch = JsBatch.current(self._js_executor)
+        if js_code and batch is not None:
+            return batch.add_js(js_code)
         if js_code:
-            result = await self._js_executor.exec_js(js_code)
-            self.debug_tool.debug(f"executed js code: {js_code}, result: {result}")
+            with profile_label(label):
+                result = await self._js_executor.exec_js(js_code, force_expr=True)
+            # formatting the code and result is costly for large results, only do it when debug logs are on
+            if self.debug_tool.logger.isEnabledFor(logging.DEBUG):
+                self.debug_tool.debug(f"executed js code: {js_code}, result: {result}")
             return result
     return decorator
 
 
-__all__ = ["execute_js"]
+def call_helper(f):
+    """
+    Decorator for calling a helper of the in-page helper bundle.
+
+    The decorated method returns the helper name and its arguments, e.g. `return "click", [selector]`.
+    Return RAW javascript result.
+    Inside a `js_batch` of the executor, the call is queued and a `BatchStep` is returned instead.
+    CDP calls are labelled with the decorated method for `CdpProfiler`.
+    """
+    label = f.__qualname__
+
+    @wraps(f)
+    async def decorator(self, *args, **kwargs):
+        name, helper_args = await f(self, *args, **kwargs)
+        batch = JsBatch.current(self._js_executor)
+        if batch is not None:
+            return batch.add_helper(name, helper_args)
+        with profile_label(label):
+            result = await self._js_executor.call_helper(name, *helper_args)
+        if self.debug_tool.logger.isEnabledFor(logging.DEBUG):
+            self.debug_tool.debug(f"called js helper: {name}{tuple(helper_args)}, result: {result}")
+        return result
+    return decorator
+
+
+__all__ = ["execute_js", "call_helper"]
@@ -0,0 +1,128 @@
+"""
+In-page helper library, installed once per document as `window.__zephyrion`.
+
+Handlers call helpers by name with JSON arguments (`__zephyrion.c("click", ["#submit"])`) instead of sending freshly
+generated javascript for every call: the payload is small, V8 parses the helpers once per document, and selectors are
+never interpolated into code.
+
+The bundle is registered with `evaluateOnNewDocument`, so every document of the page has it before its own scripts
+run. Documents loaded before the registration get it on demand, the first time a helper call misses it.
+"""
+import json
+import weakref
+from typing import Any, Sequence
+
+import pyppeteer.page
+
+
+HELPER_VERSION = 1
+"""version of the helper bundle, a document keeps the newest version installed"""
+
+HELPER_BUNDLE_JS = '''
+(function () {
+    if (window.__zephyrion && window.__zephyrion.v >= %(version)d) {
+        return;
+    }
+    const one = function (selector) {
+        const element = document.querySelector(selector);
+        if (element === null) {
+            throw new Error('zephyrion: no element matches ' + selector);
+        }
+        return element;
+    };
+    const all = function (selector) { return Array.from(document.querySelectorAll(selector)); };
+    const scrollingElement = function () { return document.scrollingElement || document.documentElement; };
+    const helpers = {
+        // query
+        count: function (selector) { return document.querySelectorAll(selector).length; },
+        exists: function (selector) { return document.querySelector(selector) !== null; },
+        text: function (selector) { return one(selector).textContent; },
+        texts: function (selector) { return all(selector).map(function (e) { return e.textContent; }); },
+        attrs: function (selector, names) {
+            if (typeof names === 'string') {
+                return all(selector).map(function (e) { return e.getAttribute(names); });
+            }
+            return all(selector).map(function (e) {
+                const values = {};
+                names.forEach(function (name) { values[name] = e.getAttribute(name); });
+                return values;
+            });
+        },
+        hasClassMany: function (selector, name) {
+            return all(selector).map(function (e) { return e.classList.contains(name); });
+        },
+        // attribute
+        getAttr: function (selector, name) { return one(selector).getAttribute(name); },
+        setAttr: function (selector, name, value) { one(selector).setAttribute(name, value); },
+        // class list
+        classList: function (selector) { return Array.from(one(selector).classList); },
+        addClass: function (selector, name) { one(selector).classList.add(name); },
+        removeClass: function (selector, name) { one(selector).classList.remove(name); },
+        toggleClass: function (selector, name) { return one(selector).classList.toggle(name); },
+        // action
+        click: function (selector) { one(selector).click(); },
+        submit: function (selector) { one(selector).submit(); },
+        focus: function (selector) { one(selector).focus(); },
+        blur: function (selector) { one(selector).blur(); },
+        select: function (selector) { one(selector).select(); },
+        // scroll
+        scrollTo: function (x, y) { window.scrollTo(x, y); },
+        scrollBy: function (x, y) { window.scrollBy(x, y); },
+        scrollToBottom: function () { window.scrollTo(0, document.body.scrollHeight); },
+        scrollToTop: function () { window.scrollTo(0, 0); },
+        scrollHeight: function () { return document.body.scrollHeight; },
+        scrollWidth: function () { return document.body.scrollWidth; },
+        scrollTop: function () { return window.pageYOffset || scrollingElement().scrollTop; },
+        scrollLeft: function () { return window.pageXOffset || scrollingElement().scrollLeft; }
+    };
+    window.__zephyrion = {
+        v: %(version)d,
+        helpers: helpers,
+        c: function (name, args) {
+            const helper = helpers[name];
+            if (helper === undefined) {
+                throw new Error('zephyrion: unknown helper ' + name);
+            }
+            return helper.apply(null, args);
+        }
+    };
+})()
+''' % {"version": HELPER_VERSION}
+"""the bundle, as an expression installing `window.__zephyrion` unless a same or newer version is there"""
+
+_MISSING_MARKER = "__zephyrion is not defined"
+"""part of the error message of a helper call in a document without the bundle"""
+
+_registered_pages: "weakref.WeakSet[pyppeteer.page.Page]" = weakref.WeakSet()
+"""pages whose new documents get the bundle"""
+
+
+def helper_call_js(name: str, args: Sequence[Any] = ()) -> str:
+    """
+    Expression calling a helper of the bundle.
+
+    :param name: (str) Name of the helper, e.g. "click"
+    :param args: (Sequence) JSON-serializable arguments
+    :return: (str) The expression, e.g. `__zephyrion.c("click",["#submit"])`
+    """
+    return f"__zephyrion.c({json.dumps(name)},{json.dumps(list(args), separators=(',', ':'))})"
+
+
+def is_helper_missing(error: Exception) -> bool:
+    """Whether an evaluation error means the current document has no helper bundle."""
+    return _MISSING_MARKER in str(error)
+
+
+async def install_helper_bundle(page: pyppeteer.page.Page) -> None:
+    """
+    Install the helper bundle into the current document of the page, and into every later document.
+
+    :param page: (pyppeteer.page.Page) The page
+    """
+    if page not in _registered_pages:
+        await page.evaluateOnNewDocument(f"function () {{ {HELPER_BUNDLE_JS}; }}")
+        _registered_pages.add(page)
+    await page.evaluate(HELPER_BUNDLE_JS, force_expr=True)
+
+
+__all__ = ["HELPER_VERSION", "HELPER_BUNDLE_JS", "helper_call_js", "is_helper_missing", "install_helper_bundle"]
@@ -1,8 +1,13 @@
 import abc
-import pyppeteer.page
+from typing import Any, Union
 
+import pyppeteer.page
 from gembox.debug_utils import Debugger
 
+from zephyrion.pypp.js_util.batch import JsBatch
+from zephyrion.pypp.js_util.cdp_backend import CdpBackend
+from zephyrion.pypp.js_util.helper_bundle import HELPER_BUNDLE_JS, helper_call_js, is_helper_missing
+
 
 class JsExecutor(abc.ABC):
     """
@@ -10,18 +15,76 @@ class JsExecutor(abc.ABC):
 
     Every `JsExecutor` can execute any javascript code.
     """
+    _cdp_backend: Union[CdpBackend, None] = None
+
+    @property
+    def cdp_backend(self) -> Union[CdpBackend, None]:
+        """
+        The direct CDP backend of the executor, None when the executor goes through `page.evaluate`.
+        """
+        return self._cdp_backend
+
+    def set_cdp_backend(self, backend: Union[CdpBackend, None]) -> None:
+        """
+        Route the executor's javascript through a direct CDP backend, see `cdp_backend`.
+
+        :param backend: (CdpBackend) The backend, None to go back to `page.evaluate`
+        """
+        self._cdp_backend = backend
+
     @abc.abstractmethod
-    async def exec_js(self, js: str):
+    async def exec_js(self, js: str, force_expr: bool = False):
         """
         Execute javascript code.
 
         This interface does not define the return value specifications.
 
         :param js: (str) Javascript code to execute
+        :param force_expr: (bool) Evaluate `js` as an expression, even if it looks like a function (e.g. contains "=>")
         :return:
         """
         raise NotImplementedError()
 
+    async def call_helper(self, name: str, *args: Any) -> Any:
+        """
+        Call a helper of the in-page helper bundle (see `helper_bundle`), installing the bundle if the document lacks it.
+
+        :param name: (str) Name of the helper, e.g. "click"
+        :param args: JSON-serializable arguments of the helper
+        :return: (Any) Result of the helper
+        """
+        if self._cdp_backend is not None and not self._cdp_backend.is_closed:
+            return await self._cdp_backend.call_helper(name, args)
+        js = helper_call_js(name, args)
+        try:
+            return await self.exec_js(js, force_expr=True)
+        except Exception as e:
+            if not is_helper_missing(e):
+                raise
+        await self.install_helpers()
+        return await self.exec_js(js, force_expr=True)
+
+    async def install_helpers(self) -> None:
+        """
+        Install the helper bundle into the current document.
+        """
+        await self.exec_js(HELPER_BUNDLE_JS, force_expr=True)
+
+    def js_batch(self, atomic: bool = False) -> JsBatch:
+        """
+        Batch the handler calls of this executor into a single evaluate, see `batch`.
+
+        usage::
+
+            async with executor.js_batch() as batch:
+                top = await scroll_handler.get_scroll_top()
+            print(await top)
+
+        :param atomic: (bool) Stop at the first failed step, the following steps are skipped
+        :return: (JsBatch) The batch, to use as an async context manager
+        """
+        return JsBatch(executor=self, atomic=atomic)
+
 
 class JsHandler:
     """
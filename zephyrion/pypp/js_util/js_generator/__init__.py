@@ -1,4 +1,5 @@
 from .generator import JsGenerator
+from .schema_compiler import CompiledSchema, compile_schema
 
 
-__all__ = ["JsGenerator"]
+__all__ = ["JsGenerator", "CompiledSchema", "compile_schema"]
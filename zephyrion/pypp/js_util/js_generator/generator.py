@@ -1,16 +1,22 @@
+import json
+
+
 class JsGenerator:
     """
     A Basic Javascript code generator.
+
+    Handlers call the in-page helper bundle (see `helper_bundle`) instead, the generator remains for ad-hoc scripts.
+    Strings are embedded as JSON literals, so selectors and values may contain any quote.
     """
 
     # query related
     @staticmethod
     def get_element(selector: str) -> str:
-        return f'document.querySelector("{selector}")'
+        return f'document.querySelector({json.dumps(selector)})'
 
     @staticmethod
     def get_elements(selector: str) -> str:
-        return f'document.querySelectorAll("{selector}")'
+        return f'document.querySelectorAll({json.dumps(selector)})'
 
     @staticmethod
     def get_text_content(selector: str) -> str:
@@ -19,28 +25,28 @@ class JsGenerator:
     # attr related
     @staticmethod
     def get_attr(selector: str, attr: str) -> str:
-        return f'{JsGenerator.get_element(selector)}.getAttribute("{attr}")'
+        return f'{JsGenerator.get_element(selector)}.getAttribute({json.dumps(attr)})'
 
     @staticmethod
     def set_attr(selector: str, attr: str, value: str) -> str:
-        return f'{JsGenerator.get_element(selector)}.setAttribute("{attr}", "{value}")'
+        return f'{JsGenerator.get_element(selector)}.setAttribute({json.dumps(attr)}, {json.dumps(value)})'
 
     # class list related
     @staticmethod
     def get_class_list(selector: str) -> str:
-        return f'{JsGenerator.get_element(selector)}.classList'
+        return f'Array.from({JsGenerator.get_element(selector)}.classList)'
 
     @staticmethod
     def add_class(selector: str, class_name: str) -> str:
-        return f'{JsGenerator.get_class_list(selector)}.add("{class_name}")'
+        return f'{JsGenerator.get_element(selector)}.classList.add({json.dumps(class_name)})'
 
     @staticmethod
     def remove_class(selector: str, class_name: str) -> str:
-        return f'{JsGenerator.get_class_list(selector)}.remove("{class_name}")'
+        return f'{JsGenerator.get_element(selector)}.classList.remove({json.dumps(class_name)})'
 
     @staticmethod
     def toggle_class(selector: str, class_name: str) -> str:
-        return f'{JsGenerator.get_class_list(selector)}.toggle("{class_name}")'
+        return f'{JsGenerator.get_element(selector)}.classList.toggle({json.dumps(class_name)})'
 
     # action related
     @staticmethod
@@ -0,0 +1,122 @@
+"""
+Compile extraction schemas (see `zephyrion._common.extraction_schema`) into in-page javascript.
+
+Each schema becomes one self-contained function, so extracting every record of a page costs one `evaluate`, whatever
+the number of fields and items. Compiled code is cached by schema.
+"""
+import json
+from functools import lru_cache
+from typing import Any, Dict, List, Union
+
+from zephyrion._common.extraction_schema import normalize_schema, schema_key
+
+
+_HELPERS_JS = r'''
+    const $strip = function (v) { return v === null ? null : v.trim(); };
+    const $lower = function (v) { return v === null ? null : v.toLowerCase(); };
+    const $upper = function (v) { return v === null ? null : v.toUpperCase(); };
+    const $int = function (v) {
+        const m = v === null ? null : v.replace(/[,\s]/g, '').match(/-?\d+/);
+        return m === null ? null : parseInt(m[0], 10);
+    };
+    const $float = function (v) {
+        const m = v === null ? null : v.replace(/[,\s]/g, '').match(/-?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?/);
+        return m === null ? null : parseFloat(m[0]);
+    };
+'''
+"""transforms, named `$<transform>`, all passing null through"""
+
+
+class CompiledSchema:
+    """
+    A schema compiled into javascript.
+    """
+
+    def __init__(self, schema: Dict[str, Any], item_js: str, extract_js: str):
+        """
+        :param schema: (dict) The normalized schema
+        :param item_js: (str) Expression evaluating to a function `(element) => record`
+        :param extract_js: (str) Function `(scope?) => records`, extracting every item under `scope` (default to the
+            document), or a single record if the schema has no root selector
+        """
+        self.schema = schema
+        self.item_js = item_js
+        self.extract_js = extract_js
+
+    @property
+    def selector(self) -> Union[str, None]:
+        """root item selector, None for a single-record schema"""
+        return self.schema["selector"]
+
+    def __repr__(self):
+        return f"CompiledSchema(selector={self.selector!r}, fields={list(self.schema['fields'])})"
+
+
+class _Compiler:
+    """Turn normalized fields into javascript functions, one per (nested) record."""
+
+    def __init__(self):
+        self.functions: List[str] = []
+
+    def record_function(self, fields: Dict[str, Dict[str, Any]]) -> str:
+        """Emit the function building one record from an element, return its name."""
+        lines = []
+        for name, field in fields.items():
+            key = json.dumps(name)
+            if field["many"]:
+                nodes = ("[el]" if field["selector"] is None
+                         else f"el.querySelectorAll({json.dumps(field['selector'])})")
+                lines.append(f"r[{key}] = Array.from({nodes}, function (n) {{ return {self.value(field)}; }});")
+            else:
+                node = "el" if field["selector"] is None else f"el.querySelector({json.dumps(field['selector'])})"
+                lines.append(f"n = {node}; r[{key}] = n === null ? {json.dumps(field['default'])} : {self.value(field)};")
+        name = f"$record{len(self.functions)}"
+        body = "\n        ".join(lines)
+        self.functions.append(f"    const {name} = function (el) {{\n        const r = {{}};\n        let n;\n"
+                              f"        {body}\n        return r;\n    }};\n")
+        return name
+
+    def value(self, field: Dict[str, Any]) -> str:
+        """Expression of the value of a field, given its element `n`."""
+        if field["fields"] is not None:
+            return f"{self.record_function(field['fields'])}(n)"
+        if field["type"] == "html":
+            expression = "n.innerHTML"
+        elif field["type"] == "attr":
+            expression = f"n.getAttribute({json.dumps(field['attr'])})"
+        else:
+            expression = "n.textContent"
+        for transform in field["transform"]:
+            expression = f"${transform}({expression})"
+        return expression
+
+
+@lru_cache(maxsize=256)
+def _compile(key: str) -> CompiledSchema:
+    schema = json.loads(key)
+    compiler = _Compiler()
+    root = compiler.record_function(schema["fields"])
+    item_js = f"(function () {{\n{_HELPERS_JS}{''.join(compiler.functions)}    return {root};\n}})()"
+    if schema["selector"] is None:
+        extract_js = (f"function (scope) {{\n    const item = {item_js};\n"
+                      f"    return item(scope || document.documentElement);\n}}")
+    else:
+        extract_js = (f"function (scope) {{\n    const item = {item_js};\n"
+                      f"    return Array.from((scope || document).querySelectorAll({json.dumps(schema['selector'])}), "
+                      f"function (el) {{ return item(el); }});\n}}")
+    return CompiledSchema(schema=schema, item_js=item_js, extract_js=extract_js)
+
+
+def compile_schema(schema: Union[Dict[str, Any], CompiledSchema]) -> CompiledSchema:
+    """
+    Compile a schema into javascript, or get it from the cache.
+
+    :param schema: (dict, CompiledSchema) The schema, see `zephyrion._common.extraction_schema`
+    :return: (CompiledSchema) The compiled schema
+    """
+    if isinstance(schema, CompiledSchema):
+        return schema
+    return _compile(schema_key(normalize_schema(schema)))
+
+
+__all__ = ["CompiledSchema", "compile_schema"]
@@ -1,5 +1,6 @@
 from zephyrion.pypp.js_util.interface import JsHandler
 from zephyrion.pypp.page_interactor._decorator import wait_for_selector
+from zephyrion.pypp.wait_strategy import WaitStrategy
 
 
 class InputHandler(JsHandler):
@@ -7,16 +8,20 @@ class InputHandler(JsHandler):
     Handler for inputting text in elements.
     """
     @wait_for_selector
-    async def type_input(self, selector: str, text: str) -> None:
+    async def type_input(self, selector: str, text: str, wait: WaitStrategy = None) -> None:
         """
         Type text in an input element.
 
         :param selector: (str) Selector of the input element
         :param text: (str) Text to type
+        :param wait: (WaitStrategy) When the typing is done, None not to wait
         :return: (None)
         """
         self.debug_tool.info(f'Typing {text} in {selector}...')
-        await self._page.type(selector=selector, text=text)
+        if wait is None:
+            await self._page.type(selector=selector, text=text)
+        else:
+            await wait.run(self._page, lambda: self._page.type(selector=selector, text=text))
         self.debug_tool.info(f'{text} typed successfully in {selector}')
 
 
@@ -1,16 +1,238 @@
 import time
+import uuid
 import asyncio
-from typing import List, Callable
+import weakref
+from typing import Any, AsyncIterator, Callable, Dict, Hashable, List, Union
 
 import pyppeteer.page
 import pyppeteer.element_handle
 
-from zephyrion.pypp.js_util.decorator import execute_js
+from zephyrion.pypp.js_util.decorator import call_helper
 from zephyrion.pypp.js_util.interface import JsHandler, JsExecutor
-from zephyrion.pypp.js_util.js_generator import JsGenerator
+from zephyrion.pypp.js_util.js_generator import CompiledSchema, compile_schema
 from zephyrion.pypp.js_util.js_handler.data_handler.common import JsQueryHandler
 
 
+_SCROLL_LOAD_JS = '''
+async (opts, element) => {
+    const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+    const getTop = () => element ? element.scrollTop : (window.pageYOffset || document.documentElement.scrollTop);
+    const countItems = () => opts.selector === null ? 0 : document.querySelectorAll(opts.selector).length;
+    const scrollStep = () => {
+        const target = element || window;
+        if (opts.scrollStep === null) {
+            target.scrollTo(0, element ? element.scrollHeight : document.body.scrollHeight);
+        } else {
+            target.scrollBy(0, opts.scrollStep);
+        }
+    };
+    const report = (extra) => {
+        if (opts.progressBinding !== null && window[opts.progressBinding]) {
+            // fire and forget, never wait for python
+            window[opts.progressBinding](Object.assign({ steps: steps, count: count, top: lastTop }, extra));
+        }
+    };
+    // adaptive mode: watch DOM mutations and in-flight fetch/XHR requests instead of sleeping a fixed time
+    let mutations = 0, lastMutation = 0, observer = null, net = null;
+    if (opts.adaptive) {
+        net = window.__zephyrionNet;
+        if (!net) {
+            net = window.__zephyrionNet = { inflight: 0, activity: 0, lastActivity: 0 };
+            const touch = (delta) => { net.inflight += delta; net.activity += 1; net.lastActivity = Date.now(); };
+            const fetch = window.fetch;
+            window.fetch = function () {
+                touch(1);
+                return fetch.apply(this, arguments).finally(() => touch(-1));
+            };
+            const send = XMLHttpRequest.prototype.send;
+            XMLHttpRequest.prototype.send = function () {
+                touch(1);
+                this.addEventListener('loadend', () => touch(-1), { once: true });
+                return send.apply(this, arguments);
+            };
+        }
+        observer = new MutationObserver((records) => { mutations += records.length; lastMutation = Date.now(); });
+        observer.observe(element || document.body, { childList: true, subtree: true, characterData: true });
+    }
+    const settle = async () => {
+        // wait until nothing is in flight and nothing changed for `settleTime`, at most `maxWait`
+        const t0 = Date.now(), mutations0 = mutations, activity0 = net.activity;
+        while (true) {
+            await sleep(opts.pollInterval);
+            const now = Date.now();
+            const quiet = now - Math.max(t0, lastMutation, net.lastActivity) >= opts.settleTime;
+            if ((net.inflight === 0 && quiet) || now - t0 >= opts.maxWait) {
+                return mutations !== mutations0 || net.activity !== activity0;
+            }
+        }
+    };
+    const start = Date.now();
+    let steps = 0, sameTop = 0, lastTop = null, countCheckCounter = 0;
+    let count = 0, prevCount = 0, loggedCount = 0, sameCount = 0;
+    let reason = null;
+    while (reason === null) {
+        if (opts.selector !== null) {
+            countCheckCounter += 1;
+            if (countCheckCounter >= opts.countCheckInterval) {
+                countCheckCounter = 0;
+                count = countItems();
+                if (count === prevCount) {
+                    sameCount += 1;
+                } else {
+                    sameCount = 0;
+                    prevCount = count;
+                }
+                if (!opts.adaptive && sameCount >= opts.sameCountTh) {
+                    reason = 'count_unchanged';
+                    break;
+                }
+                if (opts.threshold !== null && count >= opts.threshold) {
+                    reason = 'threshold';
+                    break;
+                }
+                if (count - loggedCount >= opts.logInterval) {
+                    loggedCount = count;
+                    report({ event: 'count' });
+                }
+            }
+        }
+        scrollStep();
+        steps += 1;
+        if (opts.adaptive) {
+            const changed = await settle();
+            const top = getTop();
+            // could not scroll any further, and nothing is loading: the end is reached
+            if (top === lastTop && !changed) {
+                reason = 'settled';
+            }
+            lastTop = top;
+        } else {
+            await sleep(opts.loadWait);
+            const top = getTop();
+            if (top === lastTop) {
+                sameTop += 1;
+                if (sameTop >= opts.sameTh) {
+                    reason = 'top_unchanged';
+                }
+            } else {
+                sameTop = 0;
+            }
+            lastTop = top;
+        }
+        if (opts.progressEvery > 0 && steps % opts.progressEvery === 0) {
+            report({ event: 'step' });
+        }
+        if (reason === null && opts.maxDuration !== null && Date.now() - start >= opts.maxDuration) {
+            reason = 'max_duration';
+        }
+    }
+    if (observer !== null) {
+        observer.disconnect();
+    }
+    return { steps: steps, count: countItems(), top: getTop(), reason: reason, duration: Date.now() - start };
+}
+'''
+"""
+In-page scroll-load engine: scrolls, waits and checks the stop conditions without leaving the page.
+
+In adaptive mode, each step waits until DOM mutations and fetch/XHR requests have settled instead of `loadWait`, and the
+loop stops as soon as a step neither moves the scroll position nor triggers any mutation or request.
+"""
+
+_PROGRESS_BINDING = "__zephyrion_scroll_progress"
+
+_HARVEST_INSTALL_JS = '''
+function (id, selector, key, element) {
+    const item = %s;
+    const root = element || document;
+    const state = { buffer: [], pending: new Set(), seen: new WeakSet(), keys: new Set() };
+    state.capture = function (el) {
+        if (state.seen.has(el)) {
+            return;
+        }
+        state.seen.add(el);
+        let value;
+        try {
+            value = item(el);
+        } catch (e) {
+            return;
+        }
+        if (key !== null) {
+            const k = JSON.stringify(value === null || value === undefined ? null : value[key]);
+            if (state.keys.has(k)) {
+                return;
+            }
+            state.keys.add(k);
+        }
+        state.buffer.push(value);
+    };
+    state.drain = function () {
+        // pending items are read late, once the page had time to fill them in
+        state.pending.forEach(state.capture);
+        state.pending.clear();
+        const items = state.buffer;
+        state.buffer = [];
+        return items;
+    };
+    const collect = function (node, onMatch) {
+        if (node.nodeType !== 1) {
+            return;
+        }
+        if (node.matches(selector)) {
+            onMatch(node);
+        }
+        node.querySelectorAll(selector).forEach(onMatch);
+    };
+    state.observer = new MutationObserver(function (records) {
+        for (const record of records) {
+            // added items wait to be filled in, removed items (virtualised lists) are read before they are lost
+            record.addedNodes.forEach(function (node) { collect(node, function (el) { state.pending.add(el); }); });
+            record.removedNodes.forEach(function (node) { collect(node, state.capture); });
+        }
+    });
+    state.observer.observe(element || document.documentElement, { childList: true, subtree: true });
+    root.querySelectorAll(selector).forEach(function (el) { state.pending.add(el); });
+    window.__zephyrionHarvests = window.__zephyrionHarvests || {};
+    window.__zephyrionHarvests[id] = state;
+    return state.drain();
+}
+'''
+"""installs the in-page harvest buffer `id` (format with the per-item function), returns the items already present"""
+
+_HARVEST_STEP_JS = '''
+async (id, scrollStep, loadWait, element) => {
+    const state = (window.__zephyrionHarvests || {})[id];
+    if (!state) {
+        return null;
+    }
+    const target = element || window;
+    if (scrollStep === null) {
+        target.scrollTo(0, element ? element.scrollHeight : document.body.scrollHeight);
+    } else {
+        target.scrollBy(0, scrollStep);
+    }
+    await new Promise((resolve) => setTimeout(resolve, loadWait));
+    const top = element ? element.scrollTop : (window.pageYOffset || document.documentElement.scrollTop);
+    return { items: state.drain(), top: top };
+}
+'''
+"""scrolls one step, waits, then drains the harvest buffer `id`; null if the buffer is gone (e.g. after a navigation)"""
+
+_HARVEST_STOP_JS = '''
+(id) => {
+    const harvests = window.__zephyrionHarvests || {};
+    if (harvests[id]) {
+        harvests[id].observer.disconnect();
+        delete harvests[id];
+    }
+}
+'''
+
+
+_progress_callbacks: "weakref.WeakKeyDictionary[pyppeteer.page.Page, Callable]" = weakref.WeakKeyDictionary()
+"""progress callback of the running in-page scroll-load, by page"""
+
+
 class ScrollHandler(JsHandler):
     def __init__(self, page: pyppeteer.page.Page, js_executor: JsExecutor, debug_tool=None):
         super().__init__(page=page, js_executor=js_executor, debug_tool=debug_tool)
@@ -22,9 +244,9 @@ class ScrollHandler(JsHandler):
         else:
             await self._page.evaluate(f'(element) => {{ element.scrollTo({x}, {y}); }}', element)
 
-    @execute_js
+    @call_helper
     async def _scroll_to(self, x: int, y: int, element: pyppeteer.element_handle.ElementHandle = None):
-        return JsGenerator.scroll_to(x=x, y=y)
+        return "scrollTo", [x, y]
 
     async def scroll_by(self, x_disp: int, y_disp: int, element: pyppeteer.element_handle.ElementHandle = None):
         if element is None:
@@ -32,9 +254,9 @@ class ScrollHandler(JsHandler):
         else:
             await self._page.evaluate(f'(element) => {{ element.scrollBy({x_disp}, {y_disp}); }}', element)
 
-    @execute_js
+    @call_helper
     async def _scroll_by(self, x_disp: int, y_disp: int):
-        return JsGenerator.scroll_by(x_disp=x_disp, y_disp=y_disp)
+        return "scrollBy", [x_disp, y_disp]
 
     async def scroll_to_bottom(self, element: pyppeteer.element_handle.ElementHandle = None):
         if element is None:
@@ -42,9 +264,9 @@ class ScrollHandler(JsHandler):
         else:
             await self._page.evaluate('(element) => { element.scrollTo(0, element.scrollHeight); }', element)
 
-    @execute_js
+    @call_helper
     async def _scroll_to_bottom(self):
-        return JsGenerator.scroll_to_bottom()
+        return "scrollToBottom", []
 
     async def scroll_to_top(self, element: pyppeteer.element_handle.ElementHandle = None):
         if element is None:
@@ -52,9 +274,9 @@ class ScrollHandler(JsHandler):
         else:
             await self._page.evaluate('(element) => { element.scrollTo(0, 0); }', element)
 
-    @execute_js
+    @call_helper
     async def _scroll_to_top(self):
-        return JsGenerator.scroll_to_top()
+        return "scrollToTop", []
 
     async def get_scroll_height(self, element: pyppeteer.element_handle.ElementHandle = None):
         if element is None:
@@ -62,9 +284,9 @@ class ScrollHandler(JsHandler):
         else:
             return await self._page.evaluate('(element) => { return element.scrollHeight; }', element)
 
-    @execute_js
+    @call_helper
     async def _get_scroll_height(self):
-        return JsGenerator.get_scroll_height()
+        return "scrollHeight", []
 
     async def get_scroll_width(self, element: pyppeteer.element_handle.ElementHandle = None):
         if element is None:
@@ -72,9 +294,9 @@ class ScrollHandler(JsHandler):
         else:
             return await self._page.evaluate('(element) => { return element.scrollWidth; }', element)
 
-    @execute_js
+    @call_helper
     async def _get_scroll_width(self):
-        return JsGenerator.get_scroll_width()
+        return "scrollWidth", []
 
     async def get_scroll_top(self, element: pyppeteer.element_handle.ElementHandle = None):
         if element is None:
@@ -82,16 +304,16 @@ class ScrollHandler(JsHandler):
         else:
             return await self._page.evaluate('(element) => { return element.scrollTop; }', element)
 
-    @execute_js
+    @call_helper
     async def _get_scroll_top(self):
-        return JsGenerator.get_scroll_top()
+        return "scrollTop", []
 
     async def get_scroll_left(self):
         return await self._get_scroll_left()
 
-    @execute_js
+    @call_helper
     async def _get_scroll_left(self):
-        return JsGenerator.get_scroll_left()
+        return "scrollLeft", []
 
     async def _scroll_step(self, scroll_step: int = None, element: pyppeteer.element_handle.ElementHandle = None) -> None:
         """
@@ -102,22 +324,35 @@ class ScrollHandler(JsHandler):
         else:
             await self.scroll_by(0, scroll_step, element=element)
 
-    async def scroll_load(self, scroll_step: int = 400, load_wait: int = 40, same_th: int = 20, scroll_step_callbacks: List[Callable] = None, element: pyppeteer.element_handle.ElementHandle = None):
+    async def scroll_load(self, scroll_step: int = 400, load_wait: int = 40, same_th: int = 20, scroll_step_callbacks: List[Callable] = None,
+                          element: pyppeteer.element_handle.ElementHandle = None, progress_callback: Callable[[Dict[str, Any]], Any] = None,
+                          max_duration: int = None, adaptive: bool = False, settle_time: int = 300, max_wait: int = 5000) -> Dict[str, Any]:
         """
         Scroll and load all contents, until no new content is loaded.
 
         :param scroll_step: (int) The number of pixels to scroll each time. If None, scroll to bottom.
         :param load_wait: (int) The time to wait after each scroll, in milliseconds. If none, the method will wait for 100 ms
         :param same_th: (int) The threshold of the number of same scroll top to stop scrolling.
-        :param scroll_step_callbacks: (List[Callable]) A callback function to be called after each scroll.
+        :param scroll_step_callbacks: (List[Callable]) A callback function to be called after each scroll. Callbacks make
+            the loop run from Python, one round trip per step, prefer `progress_callback` when possible.
         :param element: (pyppeteer.element_handle.ElementHandle) The element to scroll. If None, scroll the whole page.
-        :return:
+        :param progress_callback: (Callable) Called with the in-page progress every 10 steps, see `_scroll_load_in_page`
+        :param max_duration: (int) Stop after this many milliseconds, None for no limit
+        :param adaptive: (bool) Wait for the page to settle after each step instead of `load_wait`, see `_scroll_load_in_page`
+        :param settle_time: (int) Adaptive mode only, how long the page must stay quiet to be settled, in milliseconds
+        :param max_wait: (int) Adaptive mode only, maximum wait per step, in milliseconds
+        :return: (dict) Summary: {"steps", "count", "top", "reason", "duration"}
         """
-        return await self._scroll_load_(scroll_step=scroll_step, load_wait=load_wait, same_th=same_th, scroll_step_callbacks=scroll_step_callbacks, element=element)
+        return await self._scroll_load_(scroll_step=scroll_step, load_wait=load_wait, same_th=same_th, scroll_step_callbacks=scroll_step_callbacks,
+                                        element=element, progress_callback=progress_callback,
+                                        progress_every=10 if progress_callback is not None else 0, max_duration=max_duration,
+                                        adaptive=adaptive, settle_time=settle_time, max_wait=max_wait)
 
     async def scroll_load_selector(self, selector: str, threshold: int = None, scroll_step: int = 400,
                                    load_wait: int = 40, same_th: int = 20, scroll_step_callbacks: List[Callable] = None,
-                                   log_interval: int = 100, element: pyppeteer.element_handle.ElementHandle = None) \
+                                   log_interval: int = 100, element: pyppeteer.element_handle.ElementHandle = None,
+                                   progress_callback: Callable[[Dict[str, Any]], Any] = None, max_duration: int = None,
+                                   adaptive: bool = False, settle_time: int = 300, max_wait: int = 5000) \
             -> List[pyppeteer.element_handle.ElementHandle]:
         """
         Scroll and load all contents, until no new content is loaded or enough specific items are collected.
@@ -130,12 +365,18 @@ class ScrollHandler(JsHandler):
         :param scroll_step_callbacks: (Callable) A callback function to be called after each scroll.
         :param log_interval: (int) The interval of logging the number of loaded elements.
         :param element: (pyppeteer.element_handle.ElementHandle) The element to scroll. If None, scroll the whole page.
+        :param progress_callback: (Callable) Called with the in-page progress every `log_interval` new elements
+        :param max_duration: (int) Stop after this many milliseconds, None for no limit
+        :param adaptive: (bool) Wait for the page to settle after each step instead of `load_wait`, see `_scroll_load_in_page`
+        :param settle_time: (int) Adaptive mode only, how long the page must stay quiet to be settled, in milliseconds
+        :param max_wait: (int) Adaptive mode only, maximum wait per step, in milliseconds
         :return: (int) The number of elements matching the selector
         """
         self.debug_tool.info(f'Scrolling and loading {selector}...')
         await self._scroll_load_(selector=selector, threshold=threshold, scroll_step=scroll_step, load_wait=load_wait,
                                  same_th=same_th, scroll_step_callbacks=scroll_step_callbacks, log_interval=log_interval,
-                                 element=element)
+                                 element=element, progress_callback=progress_callback, max_duration=max_duration,
+                                 adaptive=adaptive, settle_time=settle_time, max_wait=max_wait)
         elements = await self._js_query_handler.query_all(selector=selector)
         n_elements = len(elements)
         self.debug_tool.info(f'Loaded {n_elements} elements')
@@ -143,10 +384,170 @@ class ScrollHandler(JsHandler):
 
     async def _scroll_load_(self, selector: str = None, scroll_step: int = None, load_wait: int = 40,
                             same_th: int = 20, threshold: int = None, scroll_step_callbacks: List[Callable] = None,
-                            log_interval: int = 100, count_check_interval: int = 5, element: pyppeteer.element_handle.ElementHandle = None):
+                            log_interval: int = 100, count_check_interval: int = 5, element: pyppeteer.element_handle.ElementHandle = None,
+                            progress_callback: Callable[[Dict[str, Any]], Any] = None, progress_every: int = 0,
+                            max_duration: int = None, adaptive: bool = False, settle_time: int = 300,
+                            max_wait: int = 5000) -> Dict[str, Any]:
         """
         Scroll and load all contents.
 
+        Without `scroll_step_callbacks`, the whole loop runs inside the page as one evaluate call, see `_scroll_load_in_page`.
+        Python callbacks need a round trip per step, so with `scroll_step_callbacks` the loop runs in Python.
+
+        :return: (dict) Summary: {"steps", "count", "top", "reason", "duration"}
+        """
+        if scroll_step_callbacks and adaptive:
+            raise ValueError("adaptive scrolling runs inside the page and does not support scroll_step_callbacks, "
+                             "use progress_callback instead")
+        if scroll_step_callbacks:
+            return await self._scroll_load_python(selector=selector, scroll_step=scroll_step, load_wait=load_wait,
+                                                  same_th=same_th, threshold=threshold, scroll_step_callbacks=scroll_step_callbacks,
+                                                  log_interval=log_interval, count_check_interval=count_check_interval,
+                                                  element=element)
+        return await self._scroll_load_in_page(selector=selector, scroll_step=scroll_step, load_wait=load_wait,
+                                               same_th=same_th, threshold=threshold, log_interval=log_interval,
+                                               count_check_interval=count_check_interval, element=element,
+                                               progress_callback=progress_callback, progress_every=progress_every,
+                                               max_duration=max_duration, adaptive=adaptive, settle_time=settle_time,
+                                               max_wait=max_wait)
+
+    async def _scroll_load_in_page(self, selector: str = None, scroll_step: int = None, load_wait: int = 40,
+                                   same_th: int = 20, threshold: int = None, log_interval: int = 100,
+                                   count_check_interval: int = 5, element: pyppeteer.element_handle.ElementHandle = None,
+                                   progress_callback: Callable[[Dict[str, Any]], Any] = None, progress_every: int = 0,
+                                   max_duration: int = None, adaptive: bool = False, settle_time: int = 300,
+                                   max_wait: int = 5000) -> Dict[str, Any]:
+        """
+        Run the scroll-load loop inside the page, as a single promise-based evaluate call.
+
+        Stop conditions are the same as `_scroll_load_python`. Only the final summary crosses the CDP socket, plus the
+        optional progress reports.
+
+        :param progress_callback: (Callable) Called with {"event", "steps", "count", "top"} every `log_interval` new
+            elements, and every `progress_every` steps if positive. Coroutine functions are scheduled, not awaited.
+        :param progress_every: (int) Report progress every `progress_every` steps, 0 to disable
+        :param max_duration: (int) Stop after this many milliseconds, None for no limit
+        :param adaptive: (bool) Wait for DOM mutations and fetch/XHR requests to settle after each step instead of
+            `load_wait`, and stop once a step changes nothing, instead of after `same_th` unchanged polls
+        :param settle_time: (int) Adaptive mode only, how long the page must stay quiet to be settled, in milliseconds
+        :param max_wait: (int) Adaptive mode only, maximum wait per step, in milliseconds
+        :return: (dict) Summary: {"steps", "count", "top", "reason", "duration"}
+        """
+        progress_binding = None
+        if progress_callback is not None:
+            progress_binding = await self._bind_progress(progress_callback)
+        opts = {"selector": selector, "scrollStep": scroll_step, "loadWait": load_wait, "sameTh": same_th,
+                "threshold": threshold, "logInterval": log_interval, "countCheckInterval": count_check_interval,
+                "sameCountTh": 4, "progressBinding": progress_binding, "progressEvery": progress_every,
+                "maxDuration": max_duration, "adaptive": adaptive, "settleTime": settle_time, "maxWait": max_wait,
+                "pollInterval": 20}
+        self.debug_tool.info(f'Starting scrolling and loading in page...')
+        try:
+            summary = await self._page.evaluate(_SCROLL_LOAD_JS, opts, element)
+        finally:
+            if progress_binding is not None:
+                _progress_callbacks.pop(self._page, None)
+        self.debug_tool.info(f"Scrolling stopped: {summary['reason']}, {summary['steps']} steps, "
+                             f"{summary['count']} elements, {summary['duration']} ms")
+        return summary
+
+    async def scroll_harvest(self, selector: str, extract: Union[Dict[str, Any], CompiledSchema, str] = None,
+                             key: Union[str, Callable[[Any], Hashable]] = None, scroll_step: int = 400,
+                             load_wait: int = 40, same_th: int = 20, max_items: int = None,
+                             element: pyppeteer.element_handle.ElementHandle = None) -> AsyncIterator[Any]:
+        """
+        Scroll and yield items matching the selector as soon as they appear, instead of once scrolling is done.
+
+        A MutationObserver captures items in the page as they are added, and reads items being removed before they are
+        lost, so virtualised feeds, which only keep the visible items in the DOM, are fully harvested. Each scroll step
+        costs one round trip, which also returns the items captured since the previous step.
+
+        Break out of the loop to stop early, preferably with `contextlib.aclosing`, so that the observer is disconnected
+        right away::
+
+            async with contextlib.aclosing(handler.scroll_harvest("article", schema, key="id")) as items:
+                async for item in items:
+                    ...
+
+        :param selector: (str) Selector of the items
+        :param extract: (dict, CompiledSchema, str) Schema of one item (see `DataExtractor.extract`, its root selector is
+            ignored), or the source of a javascript function `(element) => value`. Default to the item's text content
+        :param key: (str, Callable) Dedupe items by this field of the extracted value (checked in the page), or by the
+            result of this Python function. Items are always deduped by element
+        :param scroll_step: (int) The number of pixels to scroll each time. If None, scroll to bottom.
+        :param load_wait: (int) The time to wait after each scroll, in milliseconds
+        :param same_th: (int) Stop after the scroll top is unchanged this many times in a row
+        :param max_items: (int) Stop after yielding this many items, None for no limit
+        :param element: (pyppeteer.element_handle.ElementHandle) The element to scroll. If None, scroll the whole page.
+        :return: (AsyncIterator) The extracted items, in order of capture
+        """
+        if extract is None:
+            item_js = "function (el) { return el.textContent; }"
+        elif isinstance(extract, str):
+            item_js = f"({extract})"
+        else:
+            item_js = compile_schema(extract).item_js
+        page_key = key if isinstance(key, str) else None
+        seen_keys = set()
+        harvest_id = uuid.uuid4().hex
+        n_items, same_count, last_top = 0, 0, None
+
+        self.debug_tool.info(f'Harvesting {selector} while scrolling...')
+        items = await self._page.evaluate(_HARVEST_INSTALL_JS % item_js, harvest_id, selector, page_key, element)
+        try:
+            while True:
+                for item in items:
+                    if callable(key):
+                        item_key = key(item)
+                        if item_key in seen_keys:
+                            continue
+                        seen_keys.add(item_key)
+                    yield item
+                    n_items += 1
+                    if max_items is not None and n_items >= max_items:
+                        self.debug_tool.info(f'Harvested {n_items} items, reached max_items, stopping.')
+                        return
+                if same_count >= same_th:
+                    self.debug_tool.info(f'Top unchanged for {same_count} times, harvested {n_items} items, stopping.')
+                    return
+                step = await self._page.evaluate(_HARVEST_STEP_JS, harvest_id, scroll_step, load_wait, element)
+                if step is None:
+                    self.debug_tool.warn(f'Harvest buffer lost (page navigated?), harvested {n_items} items, stopping.')
+                    return
+                items = step["items"]
+                same_count = same_count + 1 if step["top"] == last_top else 0
+                last_top = step["top"]
+        finally:
+            try:
+                await self._page.evaluate(_HARVEST_STOP_JS, harvest_id)
+            except Exception as e:
+                self.debug_tool.debug(f'Failed to stop harvest {harvest_id}: {e}')
+
+    async def _bind_progress(self, progress_callback: Callable[[Dict[str, Any]], Any]) -> str:
+        """Route the in-page progress reports of this page to `progress_callback`, return the binding name."""
+        _progress_callbacks[self._page] = progress_callback
+        if _PROGRESS_BINDING not in self._page._pageBindings:
+            page = self._page
+
+            def dispatch(progress: Dict[str, Any]) -> None:
+                callback = _progress_callbacks.get(page)
+                if callback is None:
+                    return
+                if asyncio.iscoroutinefunction(callback):
+                    asyncio.ensure_future(callback(progress))
+                else:
+                    callback(progress)
+
+            await self._page.exposeFunction(_PROGRESS_BINDING, dispatch)
+        return _PROGRESS_BINDING
+
+    async def _scroll_load_python(self, selector: str = None, scroll_step: int = None, load_wait: int = 40,
+                                  same_th: int = 20, threshold: int = None, scroll_step_callbacks: List[Callable] = None,
+                                  log_interval: int = 100, count_check_interval: int = 5,
+                                  element: pyppeteer.element_handle.ElementHandle = None) -> Dict[str, Any]:
+        """
+        Scroll and load all contents, step by step from Python.
+
         It's very common to scroll to the bottom and wait for the page to load until no new content is loaded or enough
         specific items are collected.
         Or you just want to load the whole page.
@@ -161,8 +562,10 @@ class ScrollHandler(JsHandler):
         :param log_interval: (int) The interval of logging the number of loaded elements.
         :param count_check_interval: (int) The interval of checking the number of loaded elements.
         :param element: (pyppeteer.element_handle.ElementHandle) The element to scroll. If None, scroll the whole page.
-        :return: (None)
+        :return: (dict) Summary: {"steps", "count", "top", "reason", "duration"}
         """
+        start = time.monotonic()
+        steps, reason = 0, None
         same_count = 0
         last_top = None
         count_check_counter = 0  # New counter for count_check_interval
@@ -188,16 +591,19 @@ class ScrollHandler(JsHandler):
 
                     if same_sel_count >= same_sel_count_th:
                         self.debug_tool.info(f"Same selector count: {same_sel_count}, threshold: {same_sel_count_th}, stopping!!")
+                        reason = 'count_unchanged'
                         break
 
                     if threshold is not None and count >= threshold:
                         self.debug_tool.info(f'Loaded {count} elements, reached threshold {threshold}, stopping.')
+                        reason = 'threshold'
                         break  # Break out of the loop when the threshold is reached
                     elif count - prev_count >= log_interval:
                         self.debug_tool.info(f'Loaded {count} elements so far, threshold: {threshold}.')
                         prev_count = count
 
             await self._scroll_step(scroll_step, element=element)
+            steps += 1
 
             if scroll_step_callbacks:
                 for callback in scroll_step_callbacks:
@@ -213,11 +619,17 @@ class ScrollHandler(JsHandler):
                 same_count += 1
                 if same_count >= same_th:
                     self.debug_tool.info(f'Top unchanged for {same_count} times, stopping.')
+                    reason = 'top_unchanged'
                     break  # Break out of the loop when the same threshold is reached
             else:
                 same_count = 0
 
             last_top = top
 
+        if selector is not None:
+            count = await self._js_query_handler.count(selector=selector)
+        return {"steps": steps, "count": count, "top": await self.get_scroll_top(element=element), "reason": reason,
+                "duration": int((time.monotonic() - start) * 1000)}
+
 
 __all__ = ['ScrollHandler']
@@ -6,8 +6,7 @@ Including:
 - `JsActionHandler`
 """
 from zephyrion.pypp.js_util.interface import JsHandler
-from zephyrion.pypp.js_util.decorator import execute_js
-from zephyrion.pypp.js_util.js_generator import JsGenerator
+from zephyrion.pypp.js_util.decorator import call_helper
 
 
 class JsActionHandler(JsHandler):
@@ -17,37 +16,37 @@ class JsActionHandler(JsHandler):
     async def click(self, selector):
         return await self._click(selector)
 
-    @execute_js
+    @call_helper
     async def _click(self, selector: str):
-        return JsGenerator.click(selector=selector)
+        return "click", [selector]
 
     async def submit(self, selector):
         return await self._submit(selector)
 
-    @execute_js
+    @call_helper
     async def _submit(self, selector: str):
-        return JsGenerator.submit(selector=selector)
+        return "submit", [selector]
 
     async def focus(self, selector):
         return await self._focus(selector)
 
-    @execute_js
+    @call_helper
     async def _focus(self, selector: str):
-        return JsGenerator.focus(selector=selector)
+        return "focus", [selector]
 
     async def blur(self, selector):
         return await self._blur(selector)
 
-    @execute_js
+    @call_helper
     async def _blur(self, selector: str):
-        return JsGenerator.blur(selector=selector)
+        return "blur", [selector]
 
     async def select(self, selector):
         return await self._select(selector)
 
-    @execute_js
+    @call_helper
     async def _select(self, selector: str):
-        return JsGenerator.select(selector=selector)
+        return "select", [selector]
 
 
 __all__ = ["JsActionHandler"]
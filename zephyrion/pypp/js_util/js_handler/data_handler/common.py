@@ -8,12 +8,12 @@ include:
 """
 import json
 
-from typing import List
+from typing import Dict, List, Union
 import pyppeteer.element_handle
 
-from zephyrion.pypp.js_util.decorator import execute_js
+from zephyrion.pypp.handle_arena import HandleArena
+from zephyrion.pypp.js_util.decorator import execute_js, call_helper
 from zephyrion.pypp.js_util.interface import JsHandler
-from zephyrion.pypp.js_util.js_generator import JsGenerator
 
 
 class JsQueryHandler(JsHandler):
@@ -27,6 +27,9 @@ class JsQueryHandler(JsHandler):
         :param selector: (str) Selector of the element to get
         :return: (pyppeteer.element_handle.ElementHandle) Element matching the selector
         """
+        arena = HandleArena.current(self._page)
+        if arena is not None:
+            return await arena.query_one(selector)
         return await self._page.querySelector(selector)
 
     async def query_all(self, selector: str) -> List[pyppeteer.element_handle.ElementHandle]:
@@ -36,20 +39,32 @@ class JsQueryHandler(JsHandler):
         :param selector: (str) Selector of the element to get
         :return: (list) List of elements matching the selector
         """
+        arena = HandleArena.current(self._page)
+        if arena is not None:
+            return await arena.query_all(selector)
         return await self._page.querySelectorAll(selector)
 
+    @call_helper
     async def count(self, selector: str) -> int:
         """
-        Count the number of elements matching the selector.
+        Count the number of elements matching the selector, without sending the elements back.
 
         :param selector: (str) Selector of the element to count
         :return: (int) Number of elements matching the selector
         """
-        elements = await self.query_all(selector)
-        n_elements = 0 if elements is None else len(elements)
-        return n_elements
+        return "count", [selector]
 
-    @execute_js
+    @call_helper
+    async def exists(self, selector: str) -> bool:
+        """
+        Check if any element matches the selector.
+
+        :param selector: (str) Selector of the element to check
+        :return: (bool) True if at least one element matches the selector
+        """
+        return "exists", [selector]
+
+    @call_helper
     async def extract_text(self, selector: str) -> str:
         """
         Get the text content of the first element matching the selector.
@@ -57,15 +72,43 @@ class JsQueryHandler(JsHandler):
         :param selector: (str) Selector of the element to get
         :return: (str) Text content of the first element matching the selector
         """
-        return JsGenerator.get_text_content(selector)
+        return "text", [selector]
 
+    @call_helper
     async def extract_texts(self, selector: str) -> List[str]:
         """
-        Get the text content of all elements matching the selector.
+        Get the text content of all elements matching the selector, in one round trip.
 
         :param selector: (str) Selector of the element to get
-        :return:
+        :return: (list) Text content of each element matching the selector, in document order
         """
+        return "texts", [selector]
+
+    async def extract_attrs(self, selector: str, attrs: Union[str, List[str]]) -> Union[List[str], List[Dict[str, str]]]:
+        """
+        Get attributes of all elements matching the selector, in one round trip.
+
+        :param selector: (str) Selector of the element to get
+        :param attrs: (str, List[str]) Attribute, or list of attributes, to get, e.g. 'href' or ['href', 'title']
+        :return: (list) For a single attribute, its value for each element. For a list, a dict {attr: value} for
+            each element. Missing attributes are None
+        """
+        return await self._extract_attrs(selector=selector, attrs=attrs if isinstance(attrs, str) else list(attrs))
+
+    @call_helper
+    async def _extract_attrs(self, selector: str, attrs: Union[str, List[str]]):
+        return "attrs", [selector, attrs]
+
+    @call_helper
+    async def has_class_many(self, selector: str, class_name: str) -> List[bool]:
+        """
+        Check, for all elements matching the selector, if they have the class, in one round trip.
+
+        :param selector: (str) Selector of the element to check
+        :param class_name: (str) Class to check
+        :return: (list) For each element matching the selector, True if it has the class
+        """
+        return "hasClassMany", [selector, class_name]
 
     @execute_js
     async def has_before_pseudo_elements(self, selector: str) -> str:
@@ -111,9 +154,9 @@ class JsAttrHandler(JsHandler):
         raw_result = await self._get_attr(selector=selector, attr=attr)
         return raw_result
 
-    @execute_js
+    @call_helper
     async def _get_attr(self, selector: str, attr: str):
-        return JsGenerator.get_attr(selector=selector, attr=attr)
+        return "getAttr", [selector, attr]
 
     async def set_attr(self, selector, attr, value) -> None:
         """
@@ -126,9 +169,9 @@ class JsAttrHandler(JsHandler):
         """
         return await self._set_attr(selector=selector, attr=attr, value=value)
 
-    @execute_js
+    @call_helper
     async def _set_attr(self, selector: str, attr: str, value: str):
-        return JsGenerator.set_attr(selector=selector, attr=attr, value=value)
+        return "setAttr", [selector, attr, value]
 
 
 class JsClassHandler(JsHandler):
@@ -142,12 +185,11 @@ class JsClassHandler(JsHandler):
         :param selector: (str) Selector of the element to get
         :return: (list) List of classes
         """
-        cls_dict: dict = await self._get_class_list(selector=selector)
-        return list(cls_dict.values())
+        return await self._get_class_list(selector=selector)
 
-    @execute_js
+    @call_helper
     async def _get_class_list(self, selector: str):
-        return JsGenerator.get_class_list(selector=selector)
+        return "classList", [selector]
 
     async def add_class(self, selector, class_name) -> None:
         """
@@ -159,9 +201,9 @@ class JsClassHandler(JsHandler):
         """
         return await self._add_class(selector=selector, class_name=class_name)
 
-    @execute_js
+    @call_helper
     async def _add_class(self, selector: str, class_name: str):
-        return JsGenerator.add_class(selector=selector, class_name=class_name)
+        return "addClass", [selector, class_name]
 
     async def remove_class(self, selector, class_name) -> None:
         """
@@ -173,9 +215,9 @@ class JsClassHandler(JsHandler):
         """
         return await self._remove_class(selector=selector, class_name=class_name)
 
-    @execute_js
+    @call_helper
     async def _remove_class(self, selector: str, class_name: str):
-        return JsGenerator.remove_class(selector=selector, class_name=class_name)
+        return "removeClass", [selector, class_name]
 
     async def toggle_class(self, selector, class_name) -> None:
         """
@@ -187,9 +229,9 @@ class JsClassHandler(JsHandler):
         """
         return await self._toggle_class(selector=selector, class_name=class_name)
 
-    @execute_js
+    @call_helper
     async def _toggle_class(self, selector: str, class_name: str):
-        return JsGenerator.toggle_class(selector=selector, class_name=class_name)
+        return "toggleClass", [selector, class_name]
 
 
 __all__ = ["JsClassHandler", "JsAttrHandler", "JsQueryHandler"]
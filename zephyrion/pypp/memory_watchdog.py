@@ -0,0 +1,369 @@
+"""
+Keep long crawls' browser memory bounded by recycling the page or the browser.
+
+A page navigated thousands of times grows: detached DOM trees, listeners and closures the site leaks, caches of the
+renderer. `MemoryWatchdog` samples the page's `Performance.getMetrics` (JS heap, DOM nodes) and the resident memory of
+the browser's process tree every `interval` seconds, and counts the main frame's navigations. When a threshold is hit:
+
+- page thresholds (`max_js_heap_mb`, `max_nodes`, `max_rss_mb`, `max_navigations`) recycle the page: it is emptied
+  (`about:blank`), garbage collected, and replaced by a fresh target, see `SinglePageBrowser.recycle_page`
+- `restart_rss_mb`, or `max_rss_mb` still exceeded right after a page recycle, restart the whole browser
+
+Either way the session (cookies, storage of the current origin) is carried over and the current url is loaded again.
+
+Recycling waits for the sections entered with `hold()`, so wrap operations that must not lose their page in it.
+
+Resident memory is read with psutil if installed (`pip install psutil`), else from `/proc` on Linux. It is only
+available when the browser is launched by the manager, not when attached to a running browser.
+"""
+import os
+import time
+import asyncio
+import inspect
+import pathlib
+import contextlib
+from collections import defaultdict
+from typing import Any, AsyncIterator, Callable, Dict, List, Tuple, Union
+
+import pyppeteer.page
+import pyppeteer.frame_manager
+from gembox.debug_utils import Debugger
+
+from .browser_manager import SinglePageBrowser
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+RECYCLE_ACTIONS = ("page", "browser")
+
+_MB = 1024 * 1024
+
+
+def process_tree_rss(pid: int) -> Union[int, None]:
+    """
+    Resident memory of a process and all its descendants, e.g. a browser and its renderers.
+
+    :param pid: (int) Process id of the root
+    :return: (int) Resident memory in bytes, None if unavailable
+    """
+    if psutil is not None:
+        try:
+            root = psutil.Process(pid)
+            processes = [root] + root.children(recursive=True)
+        except psutil.Error:
+            return None
+        total = 0
+        for process in processes:
+            try:
+                total += process.memory_info().rss
+            except psutil.Error:
+                # exited meanwhile
+                continue
+        return total
+    return _proc_tree_rss(pid)
+
+
+def _proc_tree_rss(pid: int) -> Union[int, None]:
+    proc = pathlib.Path("/proc")
+    if not proc.is_dir():
+        return None
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    children: Dict[int, List[int]] = defaultdict(list)
+    rss: Dict[int, int] = {}
+    for entry in proc.iterdir():
+        if not entry.name.isdigit():
+            continue
+        try:
+            stat = (entry / "stat").read_text()
+            statm = (entry / "statm").read_text()
+        except OSError:
+            continue
+        # "pid (comm) state ppid ...", comm may hold spaces and parentheses
+        ppid = int(stat[stat.rindex(")") + 2:].split()[1])
+        children[ppid].append(int(entry.name))
+        rss[int(entry.name)] = int(statm.split()[1]) * page_size
+    if pid not in rss:
+        return None
+    total, stack = 0, [pid]
+    while stack:
+        current = stack.pop()
+        total += rss.get(current, 0)
+        stack.extend(children.get(current, ()))
+    return total
+
+
+class MemorySample:
+    """
+    Memory usage of the browser at one point in time.
+    """
+
+    def __init__(self, js_heap_used: int, js_heap_total: int, nodes: int, documents: int, listeners: int,
+                 rss: Union[int, None], n_navigations: int):
+        """
+        :param js_heap_used: (int) Used JS heap of the page, in bytes
+        :param js_heap_total: (int) Total JS heap of the page, in bytes
+        :param nodes: (int) Number of DOM nodes of the page, detached ones included
+        :param documents: (int) Number of documents of the page
+        :param listeners: (int) Number of JS event listeners of the page
+        :param rss: (int) Resident memory of the browser's process tree, in bytes, None if unavailable
+        :param n_navigations: (int) Navigations of the main frame since the page was opened
+        """
+        self.timestamp = time.time()
+        self.js_heap_used = js_heap_used
+        self.js_heap_total = js_heap_total
+        self.nodes = nodes
+        self.documents = documents
+        self.listeners = listeners
+        self.rss = rss
+        self.n_navigations = n_navigations
+
+    def to_dict(self) -> dict:
+        return {"timestamp": self.timestamp, "js_heap_used": self.js_heap_used, "js_heap_total": self.js_heap_total,
+                "nodes": self.nodes, "documents": self.documents, "listeners": self.listeners, "rss": self.rss,
+                "n_navigations": self.n_navigations}
+
+    def __repr__(self):
+        rss = "n/a" if self.rss is None else f"{self.rss / _MB:.1f}MB"
+        return (f"MemorySample(js_heap_used={self.js_heap_used / _MB:.1f}MB, nodes={self.nodes}, rss={rss}, "
+                f"n_navigations={self.n_navigations})")
+
+
+class MemoryWatchdog:
+    """
+    Watch the browser's memory and recycle the page or the browser past thresholds, see the module documentation.
+
+    Usage::
+
+        watchdog = await agent.enable_memory_watchdog(max_js_heap_mb=512, max_navigations=200, restart_rss_mb=3072)
+        for url in urls:
+            async with watchdog.hold():
+                await agent.go(url)
+                records.extend(await agent.extract(schema))
+    """
+
+    def __init__(self, browser_manager: SinglePageBrowser, interval: float = 10., max_js_heap_mb: float = None,
+                 max_nodes: int = None, max_rss_mb: float = None, restart_rss_mb: float = None,
+                 max_navigations: int = None, keep_session: bool = True,
+                 on_recycle: Callable[[pyppeteer.page.Page], Any] = None, debug_tool: Debugger = None):
+        """
+        :param browser_manager: (SinglePageBrowser) The running browser manager
+        :param interval: (float) Seconds between two samples
+        :param max_js_heap_mb: (float) Recycle the page past this used JS heap, in MB
+        :param max_nodes: (int) Recycle the page past this number of DOM nodes
+        :param max_rss_mb: (float) Recycle the page past this resident memory of the browser, in MB. Restart the browser
+            if it is still exceeded right after a page recycle
+        :param restart_rss_mb: (float) Restart the browser past this resident memory, in MB
+        :param max_navigations: (int) Recycle the page after this many navigations of its main frame
+        :param keep_session: (bool) Carry the session and the current url over to the new page or browser
+        :param on_recycle: (Callable) Called, or awaited, with the new page after each recycle, to rebind whatever
+            held the old one
+        :param debug_tool: (Debugger) Debugger instance for debugging
+        """
+        self._browser_manager = browser_manager
+        self._interval = interval
+        self._max_js_heap = None if max_js_heap_mb is None else max_js_heap_mb * _MB
+        self._max_nodes = max_nodes
+        self._max_rss = None if max_rss_mb is None else max_rss_mb * _MB
+        self._restart_rss = None if restart_rss_mb is None else restart_rss_mb * _MB
+        self._max_navigations = max_navigations
+        self._keep_session = keep_session
+        self._on_recycle = on_recycle
+        self._debug_tool = debug_tool if debug_tool is not None else Debugger()
+        self._task: Union[asyncio.Future, None] = None
+        self._page: Union[pyppeteer.page.Page, None] = None
+        """the page whose navigations are counted"""
+        self._n_navigations = 0
+        self._last_action: Union[str, None] = None
+        """action of the previous check, None if it recycled nothing"""
+        self._last_sample: Union[MemorySample, None] = None
+        self._condition = asyncio.Condition()
+        self._n_holds = 0
+        self._n_pending_recycles = 0
+        """recycles waiting for the `hold()` blocks to end, new blocks wait for them so that they are not starved"""
+        self._recycling = False
+        self._n_recycles = {action: 0 for action in RECYCLE_ACTIONS}
+
+    @property
+    def is_running(self) -> bool:
+        """whether the background sampling is running"""
+        return self._task is not None and not self._task.done()
+
+    @property
+    def n_recycles(self) -> Dict[str, int]:
+        """number of page recycles and browser restarts"""
+        return dict(self._n_recycles)
+
+    @property
+    def last_sample(self) -> Union[MemorySample, None]:
+        """the latest sample, None before the first one"""
+        return self._last_sample
+
+    def start(self) -> "MemoryWatchdog":
+        """
+        Start sampling in the background, every `interval` seconds.
+
+        :return: (MemoryWatchdog) The watchdog itself
+        """
+        if not self.is_running:
+            self._task = asyncio.ensure_future(self._run())
+        return self
+
+    async def stop(self) -> None:
+        """
+        Stop sampling, waiting for a recycle in progress to finish.
+        """
+        task, self._task = self._task, None
+        if task is not None:
+            async with self._condition:
+                await self._condition.wait_for(lambda: not self._recycling)
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+        self._count_navigations(None)
+
+    @contextlib.asynccontextmanager
+    async def hold(self) -> AsyncIterator[None]:
+        """
+        Keep the current page for the duration of the block: a due recycle waits for the block to end, and new blocks
+        wait for the due recycle.
+        """
+        async with self._condition:
+            await self._condition.wait_for(lambda: not self._recycling and self._n_pending_recycles == 0)
+            self._n_holds += 1
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self._n_holds -= 1
+                self._condition.notify_all()
+
+    async def sample(self) -> Union[MemorySample, None]:
+        """
+        Sample the memory usage now.
+
+        :return: (MemorySample) The sample, None if the browser has no page
+        """
+        page = await self._browser_manager.get_page()
+        if page is None:
+            return None
+        self._count_navigations(page)
+        metrics = await page.metrics()
+        rss = None
+        pid = self._browser_manager.browser_pid
+        if pid is not None:
+            # /proc walks are blocking file reads
+            rss = await asyncio.get_running_loop().run_in_executor(None, process_tree_rss, pid)
+        self._last_sample = MemorySample(
+            js_heap_used=int(metrics.get("JSHeapUsedSize", 0)), js_heap_total=int(metrics.get("JSHeapTotalSize", 0)),
+            nodes=int(metrics.get("Nodes", 0)), documents=int(metrics.get("Documents", 0)),
+            listeners=int(metrics.get("JSEventListeners", 0)), rss=rss, n_navigations=self._n_navigations)
+        return self._last_sample
+
+    def decide(self, sample: MemorySample) -> Tuple[Union[str, None], Union[str, None]]:
+        """
+        Decide what a sample calls for.
+
+        :param sample: (MemorySample) The sample
+        :return: (tuple) (action, reason), action being "page", "browser", or None to do nothing
+        """
+        if self._restart_rss is not None and sample.rss is not None and sample.rss > self._restart_rss:
+            return "browser", f"rss {sample.rss / _MB:.0f}MB > {self._restart_rss / _MB:.0f}MB"
+        if self._max_rss is not None and sample.rss is not None and sample.rss > self._max_rss:
+            reason = f"rss {sample.rss / _MB:.0f}MB > {self._max_rss / _MB:.0f}MB"
+            # recycling the page did not help, the memory is held by the browser process itself
+            return ("browser" if self._last_action == "page" else "page"), reason
+        if self._max_js_heap is not None and sample.js_heap_used > self._max_js_heap:
+            return "page", f"js heap {sample.js_heap_used / _MB:.0f}MB > {self._max_js_heap / _MB:.0f}MB"
+        if self._max_nodes is not None and sample.nodes > self._max_nodes:
+            return "page", f"{sample.nodes} nodes > {self._max_nodes}"
+        if self._max_navigations is not None and sample.n_navigations >= self._max_navigations:
+            return "page", f"{sample.n_navigations} navigations"
+        return None, None
+
+    async def check(self) -> Union[str, None]:
+        """
+        Sample the memory usage, and recycle if a threshold is hit.
+
+        :return: (str) The action taken, "page" or "browser", None if none
+        """
+        sample = await self.sample()
+        if sample is None:
+            return None
+        self._debug_tool.debug(f"MemoryWatchdog: {sample}")
+        action, reason = self.decide(sample)
+        if action is not None:
+            await self.recycle(action, reason=reason)
+        self._last_action = action
+        return action
+
+    async def recycle(self, action: str = "page", reason: str = "requested") -> pyppeteer.page.Page:
+        """
+        Recycle the page or restart the browser now, once no `hold()` block is running, so not from inside one.
+
+        :param action: (str) "page" or "browser"
+        :param reason: (str) Why, for the logs
+        :return: (pyppeteer.page.Page) The new page
+        """
+        if action not in RECYCLE_ACTIONS:
+            raise ValueError(f"action should be one of {RECYCLE_ACTIONS}, got {action!r}")
+        async with self._condition:
+            self._n_pending_recycles += 1
+            try:
+                await self._condition.wait_for(lambda: self._n_holds == 0 and not self._recycling)
+            finally:
+                self._n_pending_recycles -= 1
+                self._condition.notify_all()
+            self._recycling = True
+        try:
+            what = "Recycling the page" if action == "page" else "Restarting the browser"
+            self._debug_tool.info(f"MemoryWatchdog: {what} ({reason})")
+            self._count_navigations(None)
+            if action == "page":
+                page = await self._browser_manager.recycle_page(keep_session=self._keep_session)
+            else:
+                await self._browser_manager.restart_browser(keep_session=self._keep_session)
+                page = await self._browser_manager.get_page()
+            self._n_recycles[action] += 1
+            if self._on_recycle is not None:
+                result = self._on_recycle(page)
+                if inspect.isawaitable(result):
+                    await result
+            self._count_navigations(page)
+            return page
+        finally:
+            async with self._condition:
+                self._recycling = False
+                self._condition.notify_all()
+
+    def _count_navigations(self, page: Union[pyppeteer.page.Page, None]) -> None:
+        """Count the navigations of this page from now on, resetting the count if it is another page."""
+        if page is self._page:
+            return
+        if self._page is not None:
+            self._page.remove_listener("framenavigated", self._on_frame_navigated)
+        self._page, self._n_navigations = page, 0
+        if page is not None:
+            page.on("framenavigated", self._on_frame_navigated)
+
+    def _on_frame_navigated(self, frame: pyppeteer.frame_manager.Frame) -> None:
+        if self._page is not None and frame is self._page.mainFrame:
+            self._n_navigations += 1
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self._interval)
+            try:
+                await self.check()
+            except Exception as e:
+                # e.g. the page closed while being sampled, try again next time
+                self._debug_tool.warn(f"MemoryWatchdog: Check failed: {e}")
+
+    def __repr__(self):
+        return (f"MemoryWatchdog(running={self.is_running}, n_recycles={self._n_recycles}, "
+                f"last_sample={self._last_sample})")
+
+
+__all__ = ["MemoryWatchdog", "MemorySample", "process_tree_rss", "RECYCLE_ACTIONS"]
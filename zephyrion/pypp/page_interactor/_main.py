@@ -1,12 +1,17 @@
-from typing import List, Callable
+from typing import Any, AsyncIterator, Callable, Hashable, List, Union
 
 import pyppeteer.page
 import pyppeteer.element_handle
 from gembox.debug_utils import Debugger
 
 from ._config import PageInteractionConfig
+from ..wait_strategy import WaitStrategy, FixedWait
+from ..handle_arena import HandleArena
 from ..js_util.interface import JsExecutor
+from ..js_util.helper_bundle import install_helper_bundle
 from ..js_util.js_handler.action_handler import ClickHandler, InputHandler, ScrollHandler
+from ..js_util.js_handler.action_handler.common import JsActionHandler
+from ..js_util.js_handler.data_handler.common import JsAttrHandler, JsClassHandler
 
 
 class PageInteractor(JsExecutor):
@@ -36,6 +41,9 @@ class PageInteractor(JsExecutor):
         self.click_handler = ClickHandler(page=self._page, js_executor=self, debug_tool=self._debug_tool)
         self.input_handler = InputHandler(page=self._page, js_executor=self, debug_tool=self._debug_tool)
         self.scroll_handler = ScrollHandler(page=self._page, js_executor=self, debug_tool=self._debug_tool)
+        self.action_handler = JsActionHandler(page=self._page, js_executor=self, debug_tool=self._debug_tool)
+        self.attr_handler = JsAttrHandler(page=self._page, js_executor=self, debug_tool=self._debug_tool)
+        self.class_handler = JsClassHandler(page=self._page, js_executor=self, debug_tool=self._debug_tool)
 
     async def set_viewport(self, width: int, height: int):
         """
@@ -47,35 +55,46 @@ class PageInteractor(JsExecutor):
         await self._page.setViewport({'width': width, 'height': height})
 
     async def get_element(self, selector: str) -> pyppeteer.element_handle.ElementHandle:
+        arena = HandleArena.current(self._page)
+        if arena is not None:
+            return await arena.query_one(selector)
         return await self._page.querySelector(selector=selector)
 
     async def get_elements(self, selector: str) -> List[pyppeteer.element_handle.ElementHandle]:
+        arena = HandleArena.current(self._page)
+        if arena is not None:
+            return await arena.query_all(selector)
         return await self._page.querySelectorAll(selector=selector)
 
     # click related
-    async def click(self, selector: str, new_page: bool = False):
+    async def click(self, selector: str, new_page: bool = False, wait: WaitStrategy = None):
         """
         Click on an element.
 
         :param selector: (str) Selector of the element to click
-        :param new_page: (bool) Whether to wait for a new page to load, if True, an extra wait time will be added
+        :param new_page: (bool) Whether to wait for a new page to load, if True and `wait` is None, `config.new_page_wait` is waited
+        :param wait: (WaitStrategy) When the click is done, e.g. `LoadStateWait()` or `SelectorWait(...)`
         :return:
         """
-        await self._page.click(selector=selector, new_page=new_page)
-        if new_page:
-            self._debug_tool.info(f'waiting for new page to load...')
-            await self._page.waitFor(self._config.new_page_wait)
+        if wait is None and new_page:
+            wait = FixedWait(self._config.new_page_wait)
+        if wait is None:
+            await self._page.click(selector)
+        else:
+            self._debug_tool.info(f'waiting for {wait} after clicking...')
+            await wait.run(self._page, lambda: self._page.click(selector))
 
     # type related
-    async def type_input(self, selector: str, text: str):
+    async def type_input(self, selector: str, text: str, wait: WaitStrategy = None):
         """
         Type text into an input element.
 
         :param selector: (str) Selector of the element to type into
         :param text: (str) Text to type
+        :param wait: (WaitStrategy) When the typing is done, e.g. `SelectorWait(...)` for search suggestions
         :return:
         """
-        return await self.input_handler.type_input(selector=selector, text=text)
+        return await self.input_handler.type_input(selector=selector, text=text, wait=wait)
 
     # scroll related
     async def scroll_to_bottom(self, element: pyppeteer.element_handle.ElementHandle = None):
@@ -116,7 +135,9 @@ class PageInteractor(JsExecutor):
         return await self.scroll_handler.scroll_by(x_disp=x_disp, y_disp=y_disp, element=element)
 
     async def scroll_load(self, scroll_step: int = 400, load_wait: int = 40, same_th: int = 20,
-                          scroll_step_callbacks: List[Callable] = None, element: pyppeteer.element_handle.ElementHandle = None):
+                          scroll_step_callbacks: List[Callable] = None, element: pyppeteer.element_handle.ElementHandle = None,
+                          progress_callback: Callable[[dict], Any] = None, max_duration: int = None,
+                          adaptive: bool = False, settle_time: int = 300, max_wait: int = 5000) -> dict:
         """
         Scroll and load all contents, until no new content is loaded.
 
@@ -125,14 +146,23 @@ class PageInteractor(JsExecutor):
         :param same_th: (int) The threshold of the number of same scroll top to stop scrolling.
         :param scroll_step_callbacks: (List[Callable]) A callback function that will be called after each scroll.
         :param element: (ElementHandle) The element to scroll. If None, the method will scroll the page.
-        :return:
+        :param progress_callback: (Callable) Called with the progress of the scrolling, which runs inside the page
+        :param max_duration: (int) Stop after this many milliseconds, None for no limit
+        :param adaptive: (bool) Wait for DOM mutations and requests to settle after each scroll instead of `load_wait`
+        :param settle_time: (int) Adaptive mode only, how long the page must stay quiet to be settled, in milliseconds
+        :param max_wait: (int) Adaptive mode only, maximum wait per scroll, in milliseconds
+        :return: (dict) Summary: {"steps", "count", "top", "reason", "duration"}
         """
         return await self.scroll_handler.scroll_load(scroll_step=scroll_step, load_wait=load_wait, same_th=same_th,
-                                                     scroll_step_callbacks=scroll_step_callbacks, element=element)
+                                                     scroll_step_callbacks=scroll_step_callbacks, element=element,
+                                                     progress_callback=progress_callback, max_duration=max_duration,
+                                                     adaptive=adaptive, settle_time=settle_time, max_wait=max_wait)
 
     async def scroll_load_selector(self, selector: str, threshold: int = None, scroll_step: int = 400,
                                    load_wait: int = 40, same_th: int = 20, scroll_step_callbacks: List[Callable] = None,
-                                   log_interval: int = 100, element: pyppeteer.element_handle.ElementHandle = None) \
+                                   log_interval: int = 100, element: pyppeteer.element_handle.ElementHandle = None,
+                                   progress_callback: Callable[[dict], Any] = None, max_duration: int = None,
+                                   adaptive: bool = False, settle_time: int = 300, max_wait: int = 5000) \
             -> List[pyppeteer.element_handle.ElementHandle]:
         """
         Scroll and load all contents, until no new content is loaded or enough specific items are collected.
@@ -145,12 +175,39 @@ class PageInteractor(JsExecutor):
         :param scroll_step_callbacks: (List[Callable]) A callback function that will be called after each scroll.
         :param log_interval: (int) The interval of logging the number of elements loaded.
         :param element: (ElementHandle) The element to scroll. If None, the method will scroll the page.
+        :param progress_callback: (Callable) Called with the progress of the scrolling, which runs inside the page
+        :param max_duration: (int) Stop after this many milliseconds, None for no limit
+        :param adaptive: (bool) Wait for DOM mutations and requests to settle after each scroll instead of `load_wait`
+        :param settle_time: (int) Adaptive mode only, how long the page must stay quiet to be settled, in milliseconds
+        :param max_wait: (int) Adaptive mode only, maximum wait per scroll, in milliseconds
         :return: (int) The number of elements matching the selector
         """
         return await self.scroll_handler.scroll_load_selector(selector=selector, threshold=threshold,
                                                               scroll_step=scroll_step, load_wait=load_wait,
                                                               same_th=same_th, scroll_step_callbacks=scroll_step_callbacks,
-                                                              log_interval=log_interval, element=element)
+                                                              log_interval=log_interval, element=element,
+                                                              progress_callback=progress_callback, max_duration=max_duration,
+                                                              adaptive=adaptive, settle_time=settle_time, max_wait=max_wait)
+
+    def scroll_harvest(self, selector: str, extract: Union[dict, str] = None, key: Union[str, Callable[[Any], Hashable]] = None,
+                       scroll_step: int = 400, load_wait: int = 40, same_th: int = 20, max_items: int = None,
+                       element: pyppeteer.element_handle.ElementHandle = None) -> AsyncIterator[Any]:
+        """
+        Scroll and yield items matching the selector as soon as they appear, see `ScrollHandler.scroll_harvest`.
+
+        :param selector: (str) Selector of the items
+        :param extract: (dict, str) Schema of one item, or the source of a javascript function `(element) => value`.
+            Default to the item's text content
+        :param key: (str, Callable) Dedupe items by this field of the extracted value, or by the result of this function
+        :param scroll_step: (int) The number of pixels to scroll each time. If None, scroll to bottom.
+        :param load_wait: (int) The time to wait after each scroll, in milliseconds
+        :param same_th: (int) Stop after the scroll top is unchanged this many times in a row
+        :param max_items: (int) Stop after yielding this many items, None for no limit
+        :param element: (ElementHandle) The element to scroll. If None, the method will scroll the page.
+        :return: (AsyncIterator) The extracted items
+        """
+        return self.scroll_handler.scroll_harvest(selector=selector, extract=extract, key=key, scroll_step=scroll_step,
+                                                  load_wait=load_wait, same_th=same_th, max_items=max_items, element=element)
 
     @property
     def url(self) -> str:
@@ -167,13 +224,22 @@ class PageInteractor(JsExecutor):
         """Return the config object."""
         return self._config
 
-    async def exec_js(self, js: str):
+    async def install_helpers(self) -> None:
+        """
+        Install the helper bundle into the current document of the page, and into every later one.
+        """
+        await install_helper_bundle(self._page)
+
+    async def exec_js(self, js: str, force_expr: bool = False):
         """Execute JavaScript code on the page.
 
         :param js: JavaScript code string to be executed.
+        :param force_expr: Evaluate `js` as an expression, even if it looks like a function (e.g. contains "=>").
         :return: Result of the JavaScript execution.
         """
-        return await self._page.evaluate(js)
+        if self._cdp_backend is not None and not self._cdp_backend.is_closed:
+            return await self._cdp_backend.evaluate(js)
+        return await self._page.evaluate(js, force_expr=force_expr)
 
     def __str__(self):
         return f"PageInteractor(url={self.url})"
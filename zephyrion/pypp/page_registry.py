@@ -0,0 +1,90 @@
+from typing import Dict, Union
+
+import pyppeteer.page
+import pyppeteer.target
+import pyppeteer.browser
+
+from .._common.browser_manager import NonSingletonError
+
+
+class PageRegistry:
+    """
+    In-memory registry of the page targets of a browser.
+
+    The registry is kept up to date from the browser's `targetcreated`, `targetdestroyed` and `targetchanged` events,
+    so looking up the page does not need to walk every browser context and target like `Browser.pages()` does.
+    """
+
+    def __init__(self, browser: pyppeteer.browser.Browser):
+        """
+        :param browser: (pyppeteer.browser.Browser) The browser to track
+        """
+        self._browser = browser
+        self._targets: Dict[str, pyppeteer.target.Target] = {}
+        """page targets, by target id"""
+        self._pages: Dict[str, pyppeteer.page.Page] = {}
+        """resolved pages, by target id"""
+        self._listeners = {
+            pyppeteer.browser.Browser.Events.TargetCreated: self._on_target_changed,
+            pyppeteer.browser.Browser.Events.TargetChanged: self._on_target_changed,
+            pyppeteer.browser.Browser.Events.TargetDestroyed: self._on_target_destroyed,
+        }
+
+    @property
+    def n_pages(self) -> int:
+        """number of open pages"""
+        return len(self._targets)
+
+    def attach(self) -> None:
+        """Start tracking the browser, registering the pages that are already open."""
+        for target in self._browser.targets():
+            self._on_target_changed(target)
+        for event, listener in self._listeners.items():
+            self._browser.on(event, listener)
+
+    def detach(self) -> None:
+        """Stop tracking the browser."""
+        for event, listener in self._listeners.items():
+            self._browser.remove_listener(event, listener)
+        self._targets.clear()
+        self._pages.clear()
+
+    def discard(self, page: pyppeteer.page.Page) -> None:
+        """
+        Forget a page right away, without waiting for its `targetdestroyed` event.
+
+        :param page: (pyppeteer.page.Page) The page about to be closed
+        """
+        self._on_target_destroyed(page.target)
+
+    async def get_only_page(self) -> Union[pyppeteer.page.Page, None]:
+        """
+        Get the only open page.
+
+        :return: (pyppeteer.page.Page) The page, None if no page is open
+        :raise NonSingletonError: If more than one page is open
+        """
+        if len(self._targets) == 0:
+            return None
+        if len(self._targets) > 1:
+            raise NonSingletonError(f"Only one page is allowed to be used, but {len(self._targets)} pages are found")
+        target_id, target = next(iter(self._targets.items()))
+        page = self._pages.get(target_id)
+        if page is None:
+            page = await target.page()
+            if page is not None and target_id in self._targets:
+                self._pages[target_id] = page
+        return page
+
+    def _on_target_changed(self, target: pyppeteer.target.Target) -> None:
+        if target.type == "page":
+            self._targets[target._targetId] = target
+        else:
+            self._on_target_destroyed(target)
+
+    def _on_target_destroyed(self, target: pyppeteer.target.Target) -> None:
+        self._targets.pop(target._targetId, None)
+        self._pages.pop(target._targetId, None)
+
+
+__all__ = ["PageRegistry"]
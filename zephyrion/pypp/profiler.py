@@ -0,0 +1,274 @@
+"""
+Opt-in profiler of the CDP round trips of pages.
+
+`CdpProfiler.attach(page)` wraps the page's CDP session, so that every protocol call made through the page (by
+zephyrion or pyppeteer: `evaluate`, `querySelectorAll`, `waitForSelector`, ...) is timed. Calls are grouped by label,
+the zephyrion method running the call (set by the `execute_js` and `call_helper` decorators, or with `profile_label`),
+and by CDP method. Latencies go into log2 histograms.
+
+Payload sizes are only recorded with `count_bytes=True`: pyppeteer does not expose the message frames, so the
+parameters and results are encoded to JSON again to size them, which costs as much as a small call on large results.
+
+Usage::
+
+    profiler = agent.enable_profiling()
+    ...
+    print(profiler.report())
+    profiler.dump_json("profile.json")
+"""
+import json
+import time
+import asyncio
+import pathlib
+import contextlib
+import contextvars
+from typing import Any, Dict, Iterator, List, Tuple, Union
+
+import pyppeteer.page
+from pyppeteer.connection import CDPSession
+from gembox.debug_utils import Debugger
+
+
+UNLABELED = "<unlabeled>"
+"""label of the calls made outside any labelled zephyrion method"""
+
+_current_label: "contextvars.ContextVar[str]" = contextvars.ContextVar("zephyrion_profile_label", default=UNLABELED)
+
+
+@contextlib.contextmanager
+def profile_label(label: str) -> Iterator[None]:
+    """
+    Attribute the CDP calls made inside the block to `label`, e.g. `with profile_label("login"): ...`.
+
+    :param label: (str) The label
+    """
+    token = _current_label.set(label)
+    try:
+        yield
+    finally:
+        _current_label.reset(token)
+
+
+class CallStats:
+    """Counters of a group of CDP calls."""
+
+    def __init__(self):
+        self.n_calls: int = 0
+        self.n_errors: int = 0
+        self.bytes_out: int = 0
+        """size of the JSON parameters sent, 0 unless the profiler counts bytes"""
+        self.bytes_in: int = 0
+        """size of the JSON results received, 0 unless the profiler counts bytes"""
+        self.total_time: float = 0.
+        """in seconds"""
+        self.max_time: float = 0.
+        """in seconds"""
+        self.histogram: Dict[int, int] = {}
+        """number of calls by latency bucket, bucket `k` holds latencies in [2^(k-1), 2^k) microseconds"""
+
+    def record(self, elapsed: float, bytes_out: int, bytes_in: int, error: bool) -> None:
+        self.n_calls += 1
+        self.n_errors += int(error)
+        self.bytes_out += bytes_out
+        self.bytes_in += bytes_in
+        self.total_time += elapsed
+        self.max_time = max(self.max_time, elapsed)
+        bucket = int(elapsed * 1e6).bit_length()
+        self.histogram[bucket] = self.histogram.get(bucket, 0) + 1
+
+    @property
+    def mean_time(self) -> float:
+        """mean latency in seconds"""
+        return self.total_time / self.n_calls if self.n_calls else 0.
+
+    def percentile(self, q: float) -> float:
+        """
+        Estimate a latency percentile from the histogram, as the upper bound of its bucket.
+
+        :param q: (float) The percentile, in [0, 100]
+        :return: (float) The latency in seconds
+        """
+        if not self.n_calls:
+            return 0.
+        rank = q / 100. * self.n_calls
+        seen = 0
+        for bucket in sorted(self.histogram):
+            seen += self.histogram[bucket]
+            if seen >= rank:
+                return min((1 << bucket) / 1e6, self.max_time)
+        return self.max_time
+
+    def to_dict(self) -> dict:
+        return {"n_calls": self.n_calls, "n_errors": self.n_errors, "bytes_out": self.bytes_out,
+                "bytes_in": self.bytes_in, "total_ms": self.total_time * 1e3, "mean_ms": self.mean_time * 1e3,
+                "p50_ms": self.percentile(50) * 1e3, "p90_ms": self.percentile(90) * 1e3,
+                "p99_ms": self.percentile(99) * 1e3, "max_ms": self.max_time * 1e3,
+                "histogram_us": {f"<{1 << k}": n for k, n in sorted(self.histogram.items())}}
+
+
+class CdpProfiler:
+    """
+    Time every CDP call of the attached pages, see the module documentation.
+    """
+
+    def __init__(self, count_bytes: bool = False, debug_tool: Debugger = None):
+        """
+        :param count_bytes: (bool) Also record the JSON size of the parameters and results, at the cost of encoding them
+        :param debug_tool: (Debugger) Debugger instance for debugging
+        """
+        self._count_bytes = count_bytes
+        self._debug_tool = debug_tool if debug_tool is not None else Debugger()
+        self._by_label: Dict[str, CallStats] = {}
+        self._by_method: Dict[str, CallStats] = {}
+        self._by_label_method: Dict[Tuple[str, str], CallStats] = {}
+        self._attached: List[Tuple[Any, Any]] = []
+        """(session, original send) of the attached pages"""
+        self._started_at = time.time()
+
+    @property
+    def by_label(self) -> Dict[str, CallStats]:
+        """stats by zephyrion label"""
+        return dict(self._by_label)
+
+    @property
+    def by_method(self) -> Dict[str, CallStats]:
+        """stats by CDP method"""
+        return dict(self._by_method)
+
+    @property
+    def count_bytes(self) -> bool:
+        """whether payload sizes are recorded"""
+        return self._count_bytes
+
+    @property
+    def n_calls(self) -> int:
+        """total number of CDP calls recorded"""
+        return sum(stats.n_calls for stats in self._by_method.values())
+
+    def attach(self, page: pyppeteer.page.Page) -> "CdpProfiler":
+        """
+        Start recording the CDP calls of a page.
+
+        :param page: (pyppeteer.page.Page) The page
+        :return: (CdpProfiler) self
+        """
+        return self.attach_session(page._client)
+
+    def attach_session(self, session: CDPSession) -> "CdpProfiler":
+        """
+        Start recording the calls of a CDP session, e.g. the dedicated session of a `CdpBackend`.
+
+        :param session: (CDPSession) The session
+        :return: (CdpProfiler) self
+        """
+        if any(s is session for s, _ in self._attached):
+            return self
+        original_send = session.send
+
+        def send(method: str, params: dict = None):
+            label = _current_label.get()
+            start = time.perf_counter()
+            try:
+                future = original_send(method, params)
+            except Exception:
+                self._record(label, method, time.perf_counter() - start, params, None, error=True)
+                raise
+
+            def on_done(f: asyncio.Future) -> None:
+                error = f.cancelled() or f.exception() is not None
+                self._record(label, method, time.perf_counter() - start, params, None if error else f.result(), error)
+
+            future.add_done_callback(on_done)
+            return future
+
+        session.send = send
+        self._attached.append((session, original_send))
+        return self
+
+    def detach(self, page: pyppeteer.page.Page = None) -> None:
+        """
+        Stop recording, the stats are kept.
+
+        :param page: (pyppeteer.page.Page) The page to detach, default to every attached page and session
+        """
+        self.detach_session(page._client if page is not None else None)
+
+    def detach_session(self, session: CDPSession = None) -> None:
+        """
+        Stop recording the calls of a CDP session, the stats are kept.
+
+        :param session: (CDPSession) The session to detach, default to every attached page and session
+        """
+        kept = []
+        for attached, original_send in self._attached:
+            if session is None or attached is session:
+                attached.send = original_send
+            else:
+                kept.append((attached, original_send))
+        self._attached = kept
+
+    def reset(self) -> None:
+        """Clear the stats."""
+        self._by_label.clear()
+        self._by_method.clear()
+        self._by_label_method.clear()
+        self._started_at = time.time()
+
+    def _record(self, label: str, method: str, elapsed: float, params: Union[dict, None], result: Any,
+                error: bool) -> None:
+        bytes_out, bytes_in = 0, 0
+        if self._count_bytes:
+            bytes_out = len(json.dumps(params)) if params else 0
+            bytes_in = len(json.dumps(result)) if result else 0
+        for stats in (self._by_label.setdefault(label, CallStats()),
+                      self._by_method.setdefault(method, CallStats()),
+                      self._by_label_method.setdefault((label, method), CallStats())):
+            stats.record(elapsed, bytes_out, bytes_in, error)
+
+    def to_dict(self) -> dict:
+        return {
+            "started_at": self._started_at,
+            "duration_s": time.time() - self._started_at,
+            "n_calls": self.n_calls,
+            "count_bytes": self._count_bytes,
+            "by_label": {label: stats.to_dict() for label, stats in self._by_label.items()},
+            "by_method": {method: stats.to_dict() for method, stats in self._by_method.items()},
+            "by_label_method": [{"label": label, "method": method, **stats.to_dict()}
+                                for (label, method), stats in self._by_label_method.items()],
+        }
+
+    def dump_json(self, path: Union[str, pathlib.Path]) -> None:
+        """
+        Write the stats to a JSON file.
+
+        :param path: (str, pathlib.Path) Path of the file
+        """
+        pathlib.Path(path).expanduser().write_text(json.dumps(self.to_dict(), indent=2), encoding="utf-8")
+
+    def report(self, top: int = 20) -> str:
+        """
+        Human-readable tables of the labels and CDP methods taking the most time.
+
+        :param top: (int) Number of rows per table
+        :return: (str) The report
+        """
+        lines = [f"CDP profile: {self.n_calls} calls in {time.time() - self._started_at:.1f} s"]
+        for title, groups in (("label", self._by_label), ("CDP method", self._by_method)):
+            lines.append("")
+            header = (f"{title:<48} {'calls':>7} {'errors':>6} {'total ms':>10} {'mean ms':>8} {'p90 ms':>8} "
+                      f"{'max ms':>8}")
+            lines.append(header + (f" {'KB out':>8} {'KB in':>8}" if self._count_bytes else ""))
+            rows = sorted(groups.items(), key=lambda item: item[1].total_time, reverse=True)[:top]
+            for name, stats in rows:
+                row = (f"{name[:48]:<48} {stats.n_calls:>7} {stats.n_errors:>6} {stats.total_time * 1e3:>10.1f} "
+                       f"{stats.mean_time * 1e3:>8.2f} {stats.percentile(90) * 1e3:>8.2f} {stats.max_time * 1e3:>8.2f}")
+                if self._count_bytes:
+                    row += f" {stats.bytes_out / 1024:>8.1f} {stats.bytes_in / 1024:>8.1f}"
+                lines.append(row)
+        return "\n".join(lines)
+
+    def __repr__(self):
+        return f"CdpProfiler(n_calls={self.n_calls}, n_pages={len(self._attached)})"
+
+
+__all__ = ["CdpProfiler", "CallStats", "profile_label", "UNLABELED"]
@@ -0,0 +1,124 @@
+"""
+Capture and restore `SessionSnapshot` on pyppeteer pages, so that a fresh browser skips the login flow.
+
+IndexedDB values go through JSON, so records holding `Blob`, `Date` or other non-JSON values are not restored exactly.
+"""
+from urllib.parse import urlsplit
+
+import pyppeteer.page
+
+from .._common.session_store import SessionSnapshot
+
+
+_CAPTURE_STORAGE_JS = '''
+async () => {
+    const request = (r) => new Promise((resolve, reject) => { r.onsuccess = () => resolve(r.result); r.onerror = () => reject(r.error); });
+    const dump = { localStorage: { ...localStorage }, sessionStorage: { ...sessionStorage }, indexedDB: [] };
+    const infos = indexedDB.databases ? await indexedDB.databases() : [];
+    for (const info of infos) {
+        const db = await request(indexedDB.open(info.name));
+        const stores = [];
+        for (const name of Array.from(db.objectStoreNames)) {
+            const store = db.transaction(name, 'readonly').objectStore(name);
+            const [keys, values] = await Promise.all([request(store.getAllKeys()), request(store.getAll())]);
+            stores.push({ name: name, keyPath: store.keyPath, autoIncrement: store.autoIncrement,
+                          records: keys.map((key, i) => [key, values[i]]) });
+        }
+        dump.indexedDB.push({ name: info.name, version: db.version, stores: stores });
+        db.close();
+    }
+    return dump;
+}
+'''
+
+_RESTORE_STORAGE_JS = '''
+(origin, local, session, databases) => {
+    // runs before any script of every new document, only seed the session's origin, once per tab
+    if (location.origin !== origin || sessionStorage.getItem('__zephyrion_session_restored')) {
+        return;
+    }
+    for (const [k, v] of Object.entries(local)) { localStorage.setItem(k, v); }
+    for (const [k, v] of Object.entries(session)) { sessionStorage.setItem(k, v); }
+    sessionStorage.setItem('__zephyrion_session_restored', '1');
+    for (const database of databases) {
+        const open = indexedDB.open(database.name, database.version);
+        open.onupgradeneeded = () => {
+            for (const store of database.stores) {
+                if (!open.result.objectStoreNames.contains(store.name)) {
+                    open.result.createObjectStore(store.name, { keyPath: store.keyPath, autoIncrement: store.autoIncrement });
+                }
+            }
+        };
+        open.onsuccess = () => {
+            const db = open.result;
+            for (const store of database.stores) {
+                if (!db.objectStoreNames.contains(store.name)) { continue; }
+                const objectStore = db.transaction(store.name, 'readwrite').objectStore(store.name);
+                for (const [key, value] of store.records) {
+                    store.keyPath === null ? objectStore.put(value, key) : objectStore.put(value);
+                }
+            }
+            db.close();
+        };
+    }
+}
+'''
+
+
+def _origin(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def _cookie_param(cookie: dict) -> dict:
+    """
+    Turn a captured cookie into a `Network.setCookies` parameter.
+
+    Host-only cookies (domain without a leading dot) are set by url, setting them by domain would make them domain
+    cookies, sent to every subdomain.
+    """
+    domain = cookie.get("domain", "")
+    if not domain or domain.startswith("."):
+        return cookie
+    param = {k: v for k, v in cookie.items() if k != "domain"}
+    scheme = "https" if cookie.get("secure") else "http"
+    param["url"] = f"{scheme}://{domain}{cookie.get('path', '/')}"
+    return param
+
+
+async def capture_session(page: pyppeteer.page.Page, all_cookies: bool = False) -> SessionSnapshot:
+    """
+    Capture the session of the page's current origin.
+
+    :param page: (pyppeteer.page.Page) A page showing the logged-in site
+    :param all_cookies: (bool) Whether to capture the cookies of every domain, instead of those sent to the current url
+    :return: (SessionSnapshot) The snapshot
+    """
+    if not page.url.startswith("http"):
+        raise ValueError(f"Can only capture the session of an http(s) page, got {page.url}")
+    if all_cookies:
+        cookies = (await page._client.send("Network.getAllCookies"))["cookies"]
+    else:
+        cookies = await page.cookies()
+    storage = await page.evaluate(_CAPTURE_STORAGE_JS)
+    return SessionSnapshot(origin=_origin(page.url), cookies=cookies, local_storage=storage["localStorage"],
+                           session_storage=storage["sessionStorage"], indexed_db=storage["indexedDB"])
+
+
+async def restore_session(page: pyppeteer.page.Page, snapshot: SessionSnapshot) -> None:
+    """
+    Restore a session into a page, **before** its first navigation to the session's origin.
+
+    Expired cookies are skipped. Storage is seeded by a script running before any script of the origin's documents.
+
+    :param page: (pyppeteer.page.Page) The page to restore into
+    :param snapshot: (SessionSnapshot) The snapshot to restore
+    """
+    cookies = snapshot.live_cookies()
+    if cookies:
+        await page._client.send("Network.setCookies", {"cookies": [_cookie_param(c) for c in cookies]})
+    await page.evaluateOnNewDocument(_RESTORE_STORAGE_JS, snapshot.origin, snapshot.local_storage,
+                                     snapshot.session_storage, snapshot.indexed_db)
+
+
+__all__ = ["capture_session", "restore_session"]
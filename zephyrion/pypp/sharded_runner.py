@@ -0,0 +1,214 @@
+import os
+import sys
+import queue
+import asyncio
+import multiprocessing
+from typing import Any, Callable, Awaitable, Dict, Iterable, Iterator, List, NamedTuple, Union
+
+from gembox.debug_utils import Debugger
+
+from ._main import PyppeteerAgent
+
+
+class JobResult(NamedTuple):
+    """Result of one job run by `ShardedAgentRunner`."""
+    index: int
+    """position of the job in the input job list"""
+    job: Any
+    """the job itself"""
+    result: Any
+    """return value of the job function, None if the job failed"""
+    error: Union[str, None]
+    """error message if the job failed, None otherwise"""
+    worker_id: int
+    """id of the worker that ran the job"""
+
+    @property
+    def ok(self) -> bool:
+        """whether the job succeeded"""
+        return self.error is None
+
+
+async def fetch_page_content(agent: PyppeteerAgent, url: str) -> Dict[str, str]:
+    """
+    Default job function: go to `url` and return the final url and the page content.
+
+    :param agent: (PyppeteerAgent) The agent owned by the worker
+    :param url: (str) The url to visit
+    :return: (dict) {"url": final url, "content": page html}
+    """
+    await agent.go(url)
+    page = await agent.browser_manager.get_page()
+    return {"url": page.url, "content": await page.content()}
+
+
+_EXIT_BROWSER_DIED = 3
+
+
+def _worker_main(worker_id: int, job_fn: Callable, in_queue, out_queue, headless: bool, browser_options: dict) -> None:
+    """Entry point of a worker process: run jobs from `in_queue` with its own event loop and browser."""
+    exit_code = asyncio.run(_worker_loop(worker_id, job_fn, in_queue, out_queue, headless, browser_options))
+    sys.exit(exit_code)
+
+
+async def _worker_loop(worker_id: int, job_fn: Callable, in_queue, out_queue, headless: bool, browser_options: dict) -> int:
+    loop = asyncio.get_running_loop()
+    agent = PyppeteerAgent(headless=headless, browser_options=browser_options)
+    await agent.start()
+    browser_died = []
+    agent.browser_manager.on_disconnected(lambda: browser_died.append(True))
+    try:
+        while True:
+            # `in_queue.get` blocks, run it off the loop so that the browser connection keeps being served
+            item = await loop.run_in_executor(None, in_queue.get)
+            if item is None:
+                return 0
+            index, job = item
+            out_queue.put(("started", worker_id, index, None, None))
+            try:
+                result = await job_fn(agent, job)
+                out_queue.put(("done", worker_id, index, result, None))
+            except Exception as e:
+                if browser_died:
+                    # the supervisor re-schedules the in-flight job on a fresh worker
+                    return _EXIT_BROWSER_DIED
+                out_queue.put(("done", worker_id, index, None, f"{type(e).__name__}: {e}"))
+            if browser_died:
+                return _EXIT_BROWSER_DIED
+    finally:
+        if not browser_died:
+            await agent.stop()
+
+
+class ShardedAgentRunner:
+    """
+    Supervisor running jobs over `n_workers` processes, each owning one event loop and one `PyppeteerAgent`.
+
+    The job list is split round-robin into one shard per worker. Results are streamed back through a queue as soon as
+    they are produced, so they are **not** yielded in input order. A worker whose browser dies (or whose process dies)
+    is restarted, and the remaining jobs of its shard are handed to the new worker.
+
+    The job function must be picklable, i.e. a module-level `async def job_fn(agent, job)`.
+
+    Usage::
+
+        runner = ShardedAgentRunner(n_workers=16)
+        for job_result in runner.run(urls):
+            print(job_result.index, job_result.ok)
+    """
+
+    def __init__(self, job_fn: Callable[[PyppeteerAgent, Any], Awaitable[Any]] = fetch_page_content,
+                 n_workers: int = None, headless: bool = True, browser_options: dict = None, max_restarts: int = 3,
+                 max_job_retries: int = 1, poll_interval: float = 0.5, debug_tool: Debugger = None):
+        """
+        :param job_fn: (Callable) Module-level coroutine function `job_fn(agent, job)`, default to `fetch_page_content`
+        :param n_workers: (int) Number of worker processes, default to the number of CPU cores
+        :param headless: (bool) Whether to run the browsers in headless mode
+        :param browser_options: (dict) Extra options passed to `pyppeteer.launch`
+        :param max_restarts: (int) Maximum number of restarts per worker, after which its remaining jobs fail
+        :param max_job_retries: (int) How many times a job that was running when its browser died is retried
+        :param poll_interval: (float) Interval of checking worker liveness, in seconds
+        :param debug_tool: (Debugger) Debugger instance for debugging
+        """
+        self._job_fn = job_fn
+        self._n_workers: int = n_workers if n_workers is not None else (os.cpu_count() or 1)
+        if self._n_workers < 1:
+            raise ValueError(f"n_workers should be a positive integer, got {self._n_workers}")
+        self._headless = headless
+        self._browser_options: dict = browser_options if browser_options is not None else {}
+        self._max_restarts = max_restarts
+        self._max_job_retries = max_job_retries
+        self._poll_interval = poll_interval
+        self._debug_tool = debug_tool if debug_tool is not None else Debugger()
+        self._mp = multiprocessing.get_context("spawn")
+
+    @property
+    def n_workers(self) -> int:
+        """number of worker processes"""
+        return self._n_workers
+
+    def run(self, jobs: Iterable[Any]) -> Iterator[JobResult]:
+        """
+        Run all jobs, yielding each `JobResult` as soon as it is produced.
+
+        :param jobs: (Iterable) Jobs to run, e.g. a list of urls
+        :return: (Iterator[JobResult]) Results, in completion order
+        """
+        jobs = list(jobs)
+        out_queue = self._mp.Queue()
+        n_workers = min(self._n_workers, len(jobs))
+        # pending[worker_id]: index -> job, for the jobs of the shard that are not done yet
+        pending: List[Dict[int, Any]] = [{i: jobs[i] for i in range(w, len(jobs), n_workers)} for w in range(n_workers)]
+        in_flight: List[Union[int, None]] = [None] * n_workers
+        retries: Dict[int, int] = {}
+        restarts = [0] * n_workers
+        suspects = set()
+        workers = [self._spawn(w, pending[w], out_queue) for w in range(n_workers)]
+        self._debug_tool.info(f"ShardedAgentRunner: Running {len(jobs)} jobs over {n_workers} workers...")
+
+        try:
+            while any(pending):
+                try:
+                    message = out_queue.get(timeout=self._poll_interval)
+                except queue.Empty:
+                    message = None
+                if message is not None:
+                    kind, worker_id, index, result, error = message
+                    if kind == "started":
+                        in_flight[worker_id] = index
+                    elif index in pending[worker_id]:
+                        in_flight[worker_id] = None
+                        yield JobResult(index, pending[worker_id].pop(index), result, error, worker_id)
+                    continue
+                # a dead worker may still have results in the pipe, so only handle it after a second empty poll
+                for worker_id, (process, _) in enumerate(workers):
+                    if process.is_alive() or not pending[worker_id]:
+                        suspects.discard(worker_id)
+                        continue
+                    if worker_id not in suspects:
+                        suspects.add(worker_id)
+                        continue
+                    suspects.discard(worker_id)
+                    self._debug_tool.warn(f"ShardedAgentRunner: Worker {worker_id} died with exit code "
+                                          f"{process.exitcode}, {len(pending[worker_id])} jobs left.")
+                    for job_result in self._fail_in_flight(worker_id, pending, in_flight, retries):
+                        yield job_result
+                    if restarts[worker_id] >= self._max_restarts:
+                        for index in sorted(pending[worker_id]):
+                            yield JobResult(index, pending[worker_id].pop(index), None, "worker restarted too many times", worker_id)
+                        continue
+                    restarts[worker_id] += 1
+                    workers[worker_id] = self._spawn(worker_id, pending[worker_id], out_queue)
+        finally:
+            for process, in_queue in workers:
+                if process.is_alive():
+                    in_queue.put(None)
+            for process, _ in workers:
+                process.join(timeout=10)
+                if process.is_alive():
+                    process.kill()
+        self._debug_tool.info(f"ShardedAgentRunner: All jobs done.")
+
+    def _fail_in_flight(self, worker_id: int, pending: List[Dict[int, Any]], in_flight: List[Union[int, None]],
+                        retries: Dict[int, int]) -> Iterator[JobResult]:
+        """Count a retry for the job that was running when the worker died, fail it once out of retries."""
+        index = in_flight[worker_id]
+        in_flight[worker_id] = None
+        if index is None or index not in pending[worker_id]:
+            return
+        retries[index] = retries.get(index, 0) + 1
+        if retries[index] > self._max_job_retries:
+            yield JobResult(index, pending[worker_id].pop(index), None, "browser died while running the job", worker_id)
+
+    def _spawn(self, worker_id: int, shard: Dict[int, Any], out_queue):
+        in_queue = self._mp.Queue()
+        for index in sorted(shard):
+            in_queue.put((index, shard[index]))
+        in_queue.put(None)
+        process = self._mp.Process(target=_worker_main, daemon=True,
+                                   args=(worker_id, self._job_fn, in_queue, out_queue, self._headless, self._browser_options))
+        process.start()
+        return process, in_queue
+
+
+__all__ = ["ShardedAgentRunner", "JobResult", "fetch_page_content"]
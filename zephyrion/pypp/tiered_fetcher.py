@@ -0,0 +1,269 @@
+"""
+Tiered fetching: a plain HTTP GET first, the browser only when the page needs it.
+
+A rendered navigation costs far more than a raw GET, and many pages are server-rendered. `TieredFetcher` first fetches
+a url with a pooled keep-alive aiohttp session, and checks the response:
+
+- the status is 2xx and the body is HTML
+- the url matches no `SiteRule` with `needs_js`
+- the `required_selector` of the matching rule (or of the call) is found in the HTML
+
+When a check fails, the url is navigated to with the agent instead, one browser fetch at a time since the agent has a
+single page. Both tiers give a `FetchResult` holding the HTML, queried with the same methods, through
+`OfflineExtractor`.
+
+Requires aiohttp (`pip install aiohttp`) for the HTTP tier, and lxml and cssselect for selector probes and extraction.
+"""
+import time
+import asyncio
+from typing import Any, Dict, Iterable, List, Pattern, Set, Union
+from urllib.parse import urlsplit
+
+from gembox.debug_utils import Debugger
+
+from .._common.request_policy import UrlPattern
+from .._common.offline_extractor import OfflineExtractor
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+TIERS = ("http", "browser")
+
+
+class SiteRule:
+    """
+    How the pages matching a url pattern are fetched.
+    """
+
+    def __init__(self, pattern: Union[str, Pattern], needs_js: bool = False, required_selector: str = None):
+        """
+        :param pattern: (str, re.Pattern) Url pattern, see `UrlPattern`
+        :param needs_js: (bool) Always fetch with the browser
+        :param required_selector: (str) Selector that a complete page has, an HTTP response without it is fetched again
+            with the browser
+        """
+        self.pattern = UrlPattern(pattern)
+        self.needs_js = needs_js
+        self.required_selector = required_selector
+
+    def matches(self, url: str) -> bool:
+        return self.pattern.matches(url)
+
+    def __repr__(self):
+        return f"SiteRule({self.pattern!r}, needs_js={self.needs_js}, required_selector={self.required_selector!r})"
+
+
+class FetchResult:
+    """
+    A fetched page, from either tier.
+    """
+
+    def __init__(self, url: str, final_url: str, html: str, tier: str, status: int = None, elapsed: float = 0.,
+                 escalation_reason: str = None, offline: OfflineExtractor = None):
+        """
+        :param url: (str) The requested url
+        :param final_url: (str) The url after redirects
+        :param html: (str) The HTML of the page
+        :param tier: (str) "http" or "browser"
+        :param status: (int) HTTP status, None for browser fetches
+        :param elapsed: (float) Fetch time in seconds, including a failed HTTP attempt
+        :param escalation_reason: (str) Why the HTTP tier was not enough, None if it was not tried or was enough
+        :param offline: (OfflineExtractor) Extractor used by the query methods
+        """
+        self.url = url
+        self.final_url = final_url
+        self.html = html
+        self.tier = tier
+        self.status = status
+        self.elapsed = elapsed
+        self.escalation_reason = escalation_reason
+        self._offline = offline
+
+    async def get_texts(self, selector: str) -> List[str]:
+        """See `OfflineExtractor.get_texts`."""
+        return await self._offline.get_texts(self.html, selector)
+
+    async def get_attrs(self, selector: str, attrs: Union[str, List[str]]) -> List[Union[str, None, Dict[str, Any]]]:
+        """See `OfflineExtractor.get_attrs`."""
+        return await self._offline.get_attrs(self.html, selector, attrs)
+
+    async def count(self, selector: str) -> int:
+        """See `OfflineExtractor.count`."""
+        return await self._offline.count(self.html, selector)
+
+    async def exists(self, selector: str) -> bool:
+        """See `OfflineExtractor.exists`."""
+        return await self._offline.exists(self.html, selector)
+
+    async def extract(self, schema: Dict[str, Any]) -> Union[List[Dict[str, Any]], Dict[str, Any]]:
+        """See `OfflineExtractor.extract`."""
+        return await self._offline.extract(self.html, schema)
+
+    def __repr__(self):
+        return (f"FetchResult({self.url!r}, tier={self.tier!r}, status={self.status}, "
+                f"elapsed={self.elapsed:.3f}, escalation_reason={self.escalation_reason!r})")
+
+
+class TieredFetcher:
+    """
+    Fetch pages over plain HTTP, falling back to the agent's browser, see the module documentation.
+
+    Usage::
+
+        rules = [SiteRule("https://shop.example.com/*", required_selector="li.product"),
+                 SiteRule("https://app.example.com/*", needs_js=True)]
+        async with TieredFetcher(agent, rules=rules) as fetcher:
+            result = await fetcher.fetch("https://shop.example.com/page/1")
+            products = await result.extract(schema)
+    """
+
+    def __init__(self, agent, rules: Iterable[SiteRule] = None, offline: OfflineExtractor = None,
+                 headers: Dict[str, str] = None, timeout: float = 15., max_connections: int = 32,
+                 remember_escalations: bool = False, debug_tool: Debugger = None):
+        """
+        :param agent: (PyppeteerAgent) Started agent, used for the browser tier
+        :param rules: (Iterable[SiteRule]) Site rules, the first matching rule applies
+        :param offline: (OfflineExtractor) Extractor for probes and results, default to a new thread pool extractor
+        :param headers: (dict) Headers of the HTTP requests, e.g. a browser-like User-Agent
+        :param timeout: (float) Total timeout of an HTTP request, in seconds
+        :param max_connections: (int) Maximum number of pooled HTTP connections
+        :param remember_escalations: (bool) Fetch every later page of a host that needed the browser once with the
+            browser directly, for sites that are client-rendered throughout
+        :param debug_tool: (Debugger) Debugger instance for debugging
+        """
+        if aiohttp is None:
+            raise ImportError("TieredFetcher requires aiohttp, install it with `pip install aiohttp`")
+        self._agent = agent
+        self._rules: List[SiteRule] = list(rules or [])
+        self._own_offline = offline is None
+        self._offline = offline if offline is not None else OfflineExtractor()
+        self._headers = dict(headers or {})
+        self._timeout = timeout
+        self._max_connections = max_connections
+        self._remember_escalations = remember_escalations
+        self._debug_tool = debug_tool if debug_tool is not None else Debugger()
+        self._session: Union["aiohttp.ClientSession", None] = None
+        self._js_hosts: Set[str] = set()
+        self._n_fetches = {tier: 0 for tier in TIERS}
+        self._n_escalations = 0
+        self._browser_lock = asyncio.Lock()
+        """the agent has one page, concurrent browser fetches would navigate it under each other"""
+
+    @property
+    def n_fetches(self) -> Dict[str, int]:
+        """number of pages fetched by each tier"""
+        return dict(self._n_fetches)
+
+    @property
+    def n_escalations(self) -> int:
+        """number of HTTP fetches that had to be done again with the browser"""
+        return self._n_escalations
+
+    @property
+    def js_hosts(self) -> Set[str]:
+        """hosts remembered as needing the browser"""
+        return set(self._js_hosts)
+
+    def add_rule(self, rule: SiteRule) -> None:
+        """
+        :param rule: (SiteRule) Rule to append, it applies after the existing ones
+        """
+        self._rules.append(rule)
+
+    def rule_for(self, url: str) -> Union[SiteRule, None]:
+        """
+        :param url: (str) The url
+        :return: (SiteRule) The first rule matching the url, None if none matches
+        """
+        return next((rule for rule in self._rules if rule.matches(url)), None)
+
+    async def fetch(self, url: str, required_selector: str = None, force_browser: bool = False) -> FetchResult:
+        """
+        Fetch a page with the cheapest tier that gives a complete page.
+
+        :param url: (str) The url
+        :param required_selector: (str) Selector that a complete page has, overrides the one of the matching rule
+        :param force_browser: (bool) Skip the HTTP tier
+        :return: (FetchResult) The page
+        """
+        start = time.perf_counter()
+        rule = self.rule_for(url)
+        if required_selector is None and rule is not None:
+            required_selector = rule.required_selector
+        host = (urlsplit(url).hostname or "").lower()
+
+        reason = None
+        if force_browser or (rule is not None and rule.needs_js) or host in self._js_hosts:
+            self._debug_tool.debug(f"TieredFetcher: Fetching {url} with the browser directly")
+        else:
+            result = await self._fetch_http(url, required_selector, start)
+            if result.escalation_reason is None:
+                self._n_fetches["http"] += 1
+                return result
+            reason = result.escalation_reason
+            self._n_escalations += 1
+            if self._remember_escalations:
+                self._js_hosts.add(host)
+            self._debug_tool.info(f"TieredFetcher: Escalating {url} to the browser: {reason}")
+
+        async with self._browser_lock:
+            await self._agent.go(url)
+            html = await self._agent.get_html()
+            final_url = self._agent.url
+        self._n_fetches["browser"] += 1
+        return FetchResult(url=url, final_url=final_url, html=html, tier="browser",
+                           elapsed=time.perf_counter() - start, escalation_reason=reason, offline=self._offline)
+
+    async def _fetch_http(self, url: str, required_selector: Union[str, None], start: float) -> FetchResult:
+        """Fetch over HTTP, the result has an escalation reason if the page is not usable."""
+        def result(html: str = "", status: int = None, final_url: str = url, reason: str = None) -> FetchResult:
+            return FetchResult(url=url, final_url=final_url, html=html, tier="http", status=status,
+                               elapsed=time.perf_counter() - start, escalation_reason=reason, offline=self._offline)
+
+        try:
+            async with self._get_session().get(url) as response:
+                status, final_url = response.status, str(response.url)
+                if not 200 <= status < 300:
+                    return result(status=status, final_url=final_url, reason=f"status {status}")
+                if "html" not in response.headers.get("Content-Type", "html"):
+                    return result(status=status, final_url=final_url,
+                                  reason=f"content type {response.headers.get('Content-Type')}")
+                html = await response.text(errors="replace")
+        except Exception as e:
+            return result(reason=f"{type(e).__name__}: {e}")
+        if required_selector is not None and not await self._offline.exists(html, required_selector):
+            return result(html=html, status=status, final_url=final_url,
+                          reason=f"required selector {required_selector!r} not found")
+        return result(html=html, status=status, final_url=final_url)
+
+    def _get_session(self) -> "aiohttp.ClientSession":
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                headers=self._headers, timeout=aiohttp.ClientTimeout(total=self._timeout),
+                connector=aiohttp.TCPConnector(limit=self._max_connections, keepalive_timeout=30))
+        return self._session
+
+    async def close(self) -> None:
+        """
+        Close the HTTP session, and the offline extractor if the fetcher created it. The agent is left running.
+        """
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        if self._own_offline:
+            self._offline.close()
+
+    async def __aenter__(self) -> "TieredFetcher":
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    def __repr__(self):
+        return f"TieredFetcher(n_fetches={self._n_fetches}, n_escalations={self._n_escalations})"
+
+
+__all__ = ["TieredFetcher", "SiteRule", "FetchResult", "TIERS"]
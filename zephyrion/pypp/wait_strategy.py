@@ -0,0 +1,227 @@
+"""
+Wait strategies, deciding when an action (navigation, click, typing) is done.
+
+Every strategy is armed **before** the action runs, so that no event fired by the action is missed, then waited for
+after the action. Strategies hold no per-run state, one instance can be reused for any number of actions.
+
+- `FixedWait`: sleep a fixed time, the legacy behaviour
+- `LoadStateWait`: wait for a lifecycle event, e.g. `domcontentloaded`
+- `NetworkIdleWait`: wait until the number of in-flight requests stays under a limit for an idle window
+- `SelectorWait`: wait until a selector appears
+- `UrlChangeWait`: wait until the url of the page changes
+"""
+import abc
+import time
+import asyncio
+from typing import Any, Awaitable, Callable
+
+import pyppeteer.page
+import pyppeteer.errors
+
+
+class WaitStrategy(abc.ABC):
+    """
+    Base class of the wait strategies.
+    """
+    wait_until: str = "domcontentloaded"
+    """lifecycle event a navigation (`goto`, `goBack`) waits for, before the strategy's own condition is waited for"""
+
+    async def run(self, page: pyppeteer.page.Page, action: Callable[[], Awaitable[Any]], navigation: bool = False) -> Any:
+        """
+        Arm the strategy, run the action, then wait until the strategy is satisfied.
+
+        :param page: (pyppeteer.page.Page) The page the action runs on
+        :param action: (Callable) Coroutine function running the action
+        :param navigation: (bool) Whether the action is a navigation already waiting for `wait_until`
+        :return: (Any) The result of the action
+        """
+        state = self._arm(page, navigation)
+        try:
+            result = await action()
+            await self._wait(page, state)
+        finally:
+            self._disarm(page, state)
+        return result
+
+    def _arm(self, page: pyppeteer.page.Page, navigation: bool) -> Any:
+        """Start listening before the action, return the state passed to `_wait` and `_disarm`."""
+        return None
+
+    @abc.abstractmethod
+    async def _wait(self, page: pyppeteer.page.Page, state: Any) -> None:
+        raise NotImplementedError
+
+    def _disarm(self, page: pyppeteer.page.Page, state: Any) -> None:
+        pass
+
+
+class FixedWait(WaitStrategy):
+    """Sleep a fixed time after the action."""
+    wait_until = "load"
+
+    def __init__(self, wait_time: float = 1000.):
+        """
+        :param wait_time: (float) Time to sleep, in milliseconds
+        """
+        self.wait_time = wait_time
+
+    async def _wait(self, page: pyppeteer.page.Page, state: Any) -> None:
+        await asyncio.sleep(self.wait_time / 1000.)
+
+    def __repr__(self):
+        return f"FixedWait({self.wait_time})"
+
+
+class LoadStateWait(WaitStrategy):
+    """Wait for a lifecycle event: `load`, `domcontentloaded`, `networkidle0` or `networkidle2`."""
+
+    def __init__(self, wait_until: str = "domcontentloaded", timeout: float = 30000.):
+        """
+        :param wait_until: (str) The lifecycle event to wait for
+        :param timeout: (float) Maximum wait time, in milliseconds
+        """
+        self.wait_until = wait_until
+        self.timeout = timeout
+
+    def _arm(self, page: pyppeteer.page.Page, navigation: bool) -> Any:
+        if navigation:
+            return None
+        # the action may trigger a navigation, listen for it before the action starts
+        return asyncio.ensure_future(page.waitForNavigation(waitUntil=self.wait_until, timeout=self.timeout))
+
+    async def _wait(self, page: pyppeteer.page.Page, state: Any) -> None:
+        if state is not None:
+            await state
+
+    def _disarm(self, page: pyppeteer.page.Page, state: Any) -> None:
+        if state is not None and not state.done():
+            state.cancel()
+
+    def __repr__(self):
+        return f"LoadStateWait({self.wait_until!r})"
+
+
+class NetworkIdleWait(WaitStrategy):
+    """Wait until at most `max_inflight` requests are in flight for `idle_time` milliseconds."""
+
+    def __init__(self, idle_time: float = 500., max_inflight: int = 0, timeout: float = 30000.):
+        """
+        :param idle_time: (float) Length of the idle window, in milliseconds
+        :param max_inflight: (int) Maximum number of in-flight requests still counted as idle
+        :param timeout: (float) Maximum wait time, in milliseconds
+        """
+        self.idle_time = idle_time
+        self.max_inflight = max_inflight
+        self.timeout = timeout
+
+    class _State:
+        def __init__(self):
+            self.inflight = set()
+            self.changed = asyncio.Event()
+            self.listeners = {}
+
+    def _arm(self, page: pyppeteer.page.Page, navigation: bool) -> Any:
+        state = self._State()
+
+        def on_start(request):
+            state.inflight.add(request)
+            state.changed.set()
+
+        def on_done(request):
+            state.inflight.discard(request)
+            state.changed.set()
+
+        state.listeners = {"request": on_start, "requestfinished": on_done, "requestfailed": on_done}
+        for event, listener in state.listeners.items():
+            page.on(event, listener)
+        return state
+
+    async def _wait(self, page: pyppeteer.page.Page, state: Any) -> None:
+        deadline = time.monotonic() + self.timeout / 1000.
+        while True:
+            state.changed.clear()
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise pyppeteer.errors.TimeoutError(f"Network not idle after {self.timeout} ms, "
+                                                    f"{len(state.inflight)} requests in flight")
+            window = self.idle_time / 1000. if len(state.inflight) <= self.max_inflight else remaining
+            try:
+                await asyncio.wait_for(state.changed.wait(), timeout=min(window, remaining))
+            except asyncio.TimeoutError:
+                if len(state.inflight) <= self.max_inflight:
+                    return
+
+    def _disarm(self, page: pyppeteer.page.Page, state: Any) -> None:
+        for event, listener in state.listeners.items():
+            page.remove_listener(event, listener)
+
+    def __repr__(self):
+        return f"NetworkIdleWait(idle_time={self.idle_time}, max_inflight={self.max_inflight})"
+
+
+class SelectorWait(WaitStrategy):
+    """Wait until an element matching the selector is in the page."""
+
+    def __init__(self, selector: str, visible: bool = False, timeout: float = 30000.):
+        """
+        :param selector: (str) The selector to wait for
+        :param visible: (bool) Whether the element must also be visible
+        :param timeout: (float) Maximum wait time, in milliseconds
+        """
+        self.selector = selector
+        self.visible = visible
+        self.timeout = timeout
+
+    async def _wait(self, page: pyppeteer.page.Page, state: Any) -> None:
+        await page.waitForSelector(self.selector, visible=self.visible, timeout=self.timeout)
+
+    def __repr__(self):
+        return f"SelectorWait({self.selector!r})"
+
+
+class UrlChangeWait(WaitStrategy):
+    """Wait until the url of the page differs from the url before the action, e.g. after a client-side route change."""
+
+    def __init__(self, timeout: float = 30000.):
+        """
+        :param timeout: (float) Maximum wait time, in milliseconds
+        """
+        self.timeout = timeout
+
+    class _State:
+        def __init__(self, url: str):
+            self.url = url
+            self.changed = asyncio.Event()
+            self.listener = None
+
+    def _arm(self, page: pyppeteer.page.Page, navigation: bool) -> Any:
+        state = self._State(page.url)
+
+        def on_frame_navigated(frame):
+            if frame is page.mainFrame and frame.url != state.url:
+                state.changed.set()
+
+        state.listener = on_frame_navigated
+        page.on("framenavigated", on_frame_navigated)
+        return state
+
+    async def _wait(self, page: pyppeteer.page.Page, state: Any) -> None:
+        if page.url != state.url:
+            return
+        # `history.pushState` does not always fire `framenavigated`, so also poll `location.href` in the page
+        tasks = [asyncio.ensure_future(state.changed.wait()),
+                 asyncio.ensure_future(page.waitForFunction("(url) => location.href !== url", {"timeout": self.timeout}, state.url))]
+        done, pending = await asyncio.wait(tasks, timeout=self.timeout / 1000., return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        if not any(task.exception() is None for task in done):
+            raise pyppeteer.errors.TimeoutError(f"Url still {state.url} after {self.timeout} ms")
+
+    def _disarm(self, page: pyppeteer.page.Page, state: Any) -> None:
+        page.remove_listener("framenavigated", state.listener)
+
+    def __repr__(self):
+        return f"UrlChangeWait()"
+
+
+__all__ = ["WaitStrategy", "FixedWait", "LoadStateWait", "NetworkIdleWait", "SelectorWait", "UrlChangeWait"]